@@ -0,0 +1,110 @@
+#!/usr/bin/python
+"""
+Measurement of a single benchmark scenario.
+Timings and memory are taken in separate runs, because tracing the allocations slows down the interpreter.
+"""
+
+import tracemalloc
+from time import perf_counter
+
+from numpy import abs as absolute, array, percentile
+
+from benchmarks.scenarios import REFERENCE_DTYPE
+
+
+class Measurement:
+    percentiles = (50, 90, 99)
+
+    def __init__(self, scenario, queries=200, add_rows=2000, seed=0):
+        """
+        :param scenario: The scenario to be measured.
+        :param queries: Number of candidates queried with calculate and calculate_many.
+        :param add_rows: Maximum number of samples added one by one with add_data, the others are added with
+         add_data_many.
+        :param seed: Seed of the generated samples and candidates.
+        """
+        self.scenario = scenario
+        self.queries = queries
+        self.add_rows = add_rows
+        self.seed = seed
+
+    def run(self):
+        """
+        :return: Dict of the results, which can be serialized to JSON.
+        """
+        samples = self.scenario.parameters['samples']
+        data = self.scenario.data(samples, self.seed)
+        candidates = self.scenario.candidates(self.queries, self.seed + 1)
+        single_rows = min(samples, self.add_rows)
+
+        recycler = self.scenario.recycler()
+        add_data = self._timed_calls(recycler.add_data, zip(*self._rows(data, 0, single_rows)))
+        add_data_many = self._timed(recycler.add_data_many, *self._rows(data, single_rows, samples))
+        calculate = self._timed_calls(recycler.calculate, ((candidate, ) for candidate in candidates))
+        calculate_many = self._timed(recycler.calculate_many, candidates)
+
+        result = {'scenario': self.scenario.describe(),
+                  'add_data': self._summary(add_data),
+                  'add_data_many': self._throughput(samples - single_rows, add_data_many),
+                  'calculate': self._summary(calculate),
+                  'calculate_many': self._throughput(len(candidates), calculate_many),
+                  'peak_memory_bytes': self._peak_memory(data, candidates),
+                  'storage_bytes': recycler.nbytes}
+        if not self.scenario.is_reference():
+            result['accuracy'] = self._accuracy(recycler, data, candidates)
+        return result
+
+    def _accuracy(self, recycler, data, candidates):
+        """
+        Compares the results and the storage with a recycler, which keeps the same samples in the reference dtype.
+        """
+        reference = self.scenario.recycler(REFERENCE_DTYPE)
+        reference.add_data_many(*data)
+        errors = absolute(recycler.calculate_many(candidates) - reference.calculate_many(candidates))
+        return {'reference_dtype': REFERENCE_DTYPE,
+                'storage_saved_bytes': reference.nbytes - recycler.nbytes,
+                'max_abs_error': float(errors.max()) if errors.size else 0.0,
+                'mean_abs_error': float(errors.mean()) if errors.size else 0.0}
+
+    def _peak_memory(self, data, candidates):
+        tracemalloc.start()
+        try:
+            recycler = self.scenario.recycler()
+            recycler.add_data_many(*data)
+            recycler.calculate_many(candidates)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    @classmethod
+    def _rows(cls, data, start, stop):
+        return [[None] * (stop - start) if block is None else block[start:stop] for block in data]
+
+    @classmethod
+    def _timed(cls, function, *args):
+        start = perf_counter()
+        function(*args)
+        return perf_counter() - start
+
+    @classmethod
+    def _timed_calls(cls, function, calls):
+        durations = []
+        for args in calls:
+            start = perf_counter()
+            function(*args)
+            durations.append(perf_counter() - start)
+        return array(durations)
+
+    @classmethod
+    def _throughput(cls, count, duration):
+        return {'count': count, 'seconds': duration, 'per_second': count / duration if count and duration else None}
+
+    @classmethod
+    def _summary(cls, durations):
+        summary = cls._throughput(len(durations), float(durations.sum()))
+        if len(durations):
+            summary['latency_seconds'] = dict(
+                {'p{}'.format(level): float(value)
+                 for level, value in zip(cls.percentiles, percentile(durations, cls.percentiles))},
+                mean=float(durations.mean()), max=float(durations.max()))
+        return summary
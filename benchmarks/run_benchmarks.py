@@ -0,0 +1,57 @@
+#!/usr/bin/python
+"""
+Runs the benchmark suite and writes the results as JSON.
+
+    python -m benchmarks.run_benchmarks --axes samples metric --max-samples 100000 --output results.json
+
+Every axis sweeps one parameter of the base scenario or compares the scenarios of a case (see
+benchmarks.scenarios.Scenario). Each result contains the scenario, throughput and latency percentiles of add_data and
+calculate, throughput of add_data_many and calculate_many, the peak memory allocated while building the recycler and
+answering the queries and the bytes of the stored samples. Scenarios storing the samples in a smaller dtype also
+report the bytes saved and the errors of the results compared to double precision.
+"""
+
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from datetime import datetime, timezone
+
+import numpy
+
+from benchmarks.measure import Measurement
+from benchmarks.scenarios import Scenario
+
+
+def parse_arguments(arguments):
+    parser = ArgumentParser(description='Benchmarks of the result recycler')
+    parser.add_argument('--axes', nargs='+', choices=sorted(list(Scenario.sweeps) + list(Scenario.cases)),
+                        help='parameters to be swept and cases (all)')
+    parser.add_argument('--max-samples', type=int, help='upper bound for the number of samples')
+    parser.add_argument('--queries', type=int, default=200, help='number of queried candidates (200)')
+    parser.add_argument('--add-rows', type=int, default=2000, help='samples added one by one (2000)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated data (0)')
+    parser.add_argument('--output', help='file of the JSON results (stdout)')
+    return parser.parse_args(arguments)
+
+
+def main(arguments=None):
+    arguments = parse_arguments(sys.argv[1:] if arguments is None else arguments)
+    results = []
+    for scenario in Scenario.sweep(arguments.axes, arguments.max_samples):
+        print('{}: {}'.format(scenario.axis, scenario.label()), file=sys.stderr)
+        results.append(Measurement(scenario, arguments.queries, arguments.add_rows, arguments.seed).run())
+    report = {'environment': {'python': platform.python_version(), 'numpy': numpy.__version__,
+                              'platform': platform.platform(), 'processor': platform.processor(),
+                              'date': datetime.now(timezone.utc).isoformat()},
+              'settings': {'queries': arguments.queries, 'add_rows': arguments.add_rows, 'seed': arguments.seed},
+              'results': results}
+    if arguments.output is None:
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(arguments.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+"""
+Scenarios of the benchmark suite.
+Each scenario describes a result recycler (approach, metric, index, storage dtype) and the data it is fed with (number
+of samples, dimensions, information level and container layout). The sweeps vary one parameter of the base scenario at
+a time, the cases compare scenarios deviating in several parameters.
+"""
+
+from numpy.random import default_rng
+
+import resultrecycler as rr
+from resultrecycler.approach.basic import Fixed
+
+
+APPROACHES = {
+    'Fixed': Fixed,
+    'NearestNeighbor': rr.NearestNeighbor,
+    'AffineHull': rr.AffineHull,
+    'DelaunayHull': rr.DelaunayHull,
+    'WeightedSumApproach': rr.WeightedSumApproach,
+    'FirstDerivative': rr.FirstDerivative,
+    'SecondDerivative': rr.SecondDerivative,
+}
+
+METRICS = {
+    'SumMetric': rr.SumMetric,
+    'EuclidianMetric': rr.EuclidianMetric,
+    'CubicMetric': rr.CubicMetric,
+    'MaxMetric': rr.MaxMetric,
+    'PMetric4': lambda: rr.PMetric(4),
+}
+
+INDICES = {
+    'BruteForce': rr.BruteForce,
+    'KDTree': rr.KDTree,
+}
+
+INFORMATION = ('values', 'jacobian', 'hessian')
+
+LAYOUTS = ('list', 'tuple', 'ndarray', 'dict')
+
+DTYPES = ('float64', 'float32', 'float16')
+
+REFERENCE_DTYPE = 'float64'
+
+REQUIRED_INFORMATION = {'FirstDerivative': 'jacobian', 'SecondDerivative': 'hessian'}
+
+
+class Scenario:
+    base = {'samples': 10 ** 4, 'coordinate_dim': 3, 'value_dim': 2, 'information': 'values', 'approach': None,
+            'metric': 'EuclidianMetric', 'index': 'BruteForce', 'layout': 'list', 'dtype': REFERENCE_DTYPE}
+
+    sweeps = {
+        'samples': [10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6],
+        'coordinate_dim': [1, 2, 5, 10, 20],
+        'value_dim': [1, 5, 20],
+        'information': list(INFORMATION),
+        'approach': list(APPROACHES),
+        'metric': list(METRICS),
+        'index': list(INDICES),
+        'layout': list(LAYOUTS),
+        'dtype': list(DTYPES),
+    }
+
+    cases = {
+        # The kd-tree against the scan, where the tree hardly excludes buckets any more.
+        'index_dimensions': [{'index': index, 'coordinate_dim': dim, 'samples': 10 ** 5}
+                             for dim in (3, 8, 12) for index in INDICES],
+    }
+
+    def __init__(self, axis, **parameters):
+        """
+        :param axis: Name of the swept parameter or the case.
+        :param parameters: Parameters deviating from the base scenario.
+        """
+        self.axis = axis
+        self.deviations = parameters
+        self.parameters = dict(self.base, **parameters)
+        required = REQUIRED_INFORMATION.get(self.parameters['approach'])
+        if required is not None and INFORMATION.index(required) > INFORMATION.index(self.parameters['information']):
+            self.parameters['information'] = required
+
+    @classmethod
+    def sweep(cls, axes=None, max_samples=None):
+        """
+        :param axes: Names of the parameters to be swept and the cases, all if nothing else given.
+        :param max_samples: Upper bound for the number of samples. Larger sample counts of the sample sweep are
+         skipped, the other sweeps and the cases use at most max_samples samples.
+        :return: List of scenarios.
+        """
+        scenarios = []
+        for axis in (list(cls.sweeps) + list(cls.cases) if axes is None else axes):
+            for deviations in (cls.cases[axis] if axis in cls.cases else [{axis: value} for value in cls.sweeps[axis]]):
+                scenario = cls(axis, **deviations)
+                if max_samples is not None and scenario.parameters['samples'] > max_samples:
+                    if axis == 'samples':
+                        continue
+                    scenario.parameters['samples'] = max_samples
+                scenarios.append(scenario)
+        return scenarios
+
+    def recycler(self, dtype=None):
+        """
+        :param dtype: Storage dtype overriding the one of the scenario, e.g. for a reference recycler.
+        """
+        approach = self.parameters['approach']
+        dtype = self.parameters['dtype'] if dtype is None else dtype
+        return rr.ResultRecycler(metric=METRICS[self.parameters['metric']](),
+                                 approach_class=None if approach is None else APPROACHES[approach],
+                                 index=INDICES[self.parameters['index']](),
+                                 dtypes=rr.DtypePolicy(dtype, dtype, dtype))
+
+    def is_reference(self):
+        """
+        :return: Whether the samples are stored in the reference dtype, so there is no loss of accuracy to measure.
+        """
+        return self.parameters['dtype'] == REFERENCE_DTYPE
+
+    def data(self, count, seed):
+        """
+        :return: Coordinates, values, jacobians and hessians of count samples in the layout of the scenario. Missing
+         information is None.
+        """
+        rng = default_rng(seed)
+        dim_c = self.parameters['coordinate_dim']
+        dim_v = self.parameters['value_dim']
+        information = INFORMATION.index(self.parameters['information'])
+        coordinates = rng.random((count, dim_c))
+        values = rng.random((count, dim_v))
+        jacobians = rng.random((count, dim_v, dim_c)) if information >= 1 else None
+        hessians = rng.random((count, dim_v, dim_c, dim_c)) if information >= 2 else None
+        if hessians is not None:
+            hessians = (hessians + hessians.transpose(0, 1, 3, 2)) / 2
+        return self._arrange(coordinates, values, jacobians, hessians)
+
+    def candidates(self, count, seed):
+        return self.data(count, seed)[0]
+
+    def _arrange(self, coordinates, values, jacobians, hessians):
+        layout = self.parameters['layout']
+        if layout == 'ndarray':
+            return coordinates, values, jacobians, hessians
+        if layout == 'dict':
+            keys_c = ['c{}'.format(column) for column in range(coordinates.shape[1])]
+            keys_v = ['v{}'.format(column) for column in range(values.shape[1])]
+            return ([dict(zip(keys_c, row)) for row in coordinates.tolist()],
+                    [dict(zip(keys_v, row)) for row in values.tolist()],
+                    None if jacobians is None else
+                    [{key_v: dict(zip(keys_c, line)) for key_v, line in zip(keys_v, row)}
+                     for row in jacobians.tolist()],
+                    None if hessians is None else
+                    [{key_v: {(key_1, key_2): matrix[index_1][index_2]
+                              for index_1, key_1 in enumerate(keys_c) for index_2, key_2 in enumerate(keys_c)}
+                      for key_v, matrix in zip(keys_v, row)} for row in hessians.tolist()])
+        container = tuple if layout == 'tuple' else list
+        return tuple(None if block is None else [self._nested(row, container) for row in block.tolist()]
+                     for block in (coordinates, values, jacobians, hessians))
+
+    @classmethod
+    def _nested(cls, row, container):
+        if isinstance(row, list):
+            return container(cls._nested(item, container) for item in row)
+        return row
+
+    def label(self):
+        """
+        :return: Short description of the parameters deviating from the base scenario.
+        """
+        if list(self.deviations) == [self.axis]:
+            return str(self.parameters[self.axis])
+        return ', '.join('{}={}'.format(name, self.parameters[name]) for name in self.deviations)
+
+    def describe(self):
+        return dict(self.parameters, axis=self.axis)
@@ -1,8 +1,16 @@
 #!/usr/bin/python
 
-from .approach import Approach, NearestNeighbor, AffineHull, FirstDerivative, SecondDerivative, WeightedSumApproach
+from .approach import (Approach, NearestNeighbor, AffineHull, DelaunayHull, FirstDerivative, SecondDerivative,
+                       WeightedSumApproach)
+from .async_recycler import AsyncResultRecycler
+from .client import ResultRecyclerClient
+from .config import DtypePolicy
 from .data import SampleData
+from .eviction import EvictionPolicy, OldestFirst, LeastRecentlyUsed, DensityThinning
+from .index import Index, BruteForce, KDTree, HitIndex
+from .instrumentation import Instrumentation
 from .limits import RawLimit
+from .loaders import Columns, CsvReader, JsonlReader, NpzReader
 from .metrics import Metric, PMetric, SumMetric, EuclidianMetric, CubicMetric, MaxMetric
 from .result_recycler import ResultRecycler
 
@@ -11,14 +19,33 @@ __all__ = [
     Approach,
     NearestNeighbor,
     AffineHull,
+    DelaunayHull,
     FirstDerivative,
     SecondDerivative,
     WeightedSumApproach,
 
     SampleData,
+    DtypePolicy,
+
+    EvictionPolicy,
+    OldestFirst,
+    LeastRecentlyUsed,
+    DensityThinning,
+
+    Index,
+    BruteForce,
+    KDTree,
+    HitIndex,
+
+    Instrumentation,
 
     RawLimit,
 
+    Columns,
+    CsvReader,
+    JsonlReader,
+    NpzReader,
+
     Metric,
     PMetric,
     SumMetric,
@@ -27,4 +54,6 @@ __all__ = [
     MaxMetric,
 
     ResultRecycler,
+    AsyncResultRecycler,
+    ResultRecyclerClient,
     ]
@@ -3,6 +3,7 @@
 from resultrecycler.approach.affinehull import AffineHull
 from resultrecycler.approach.basic import Approach, Fixed, NearestNeighbor
 from resultrecycler.approach.chooser import ApproachChooser
+from resultrecycler.approach.delaunay import DelaunayHull
 from resultrecycler.approach.derivative import FirstDerivative, SecondDerivative
 from resultrecycler.approach.weightedsum import WeightedSumApproach
 
@@ -13,6 +14,7 @@ __all__ = [
     Fixed,
     NearestNeighbor,
     AffineHull,
+    DelaunayHull,
     FirstDerivative,
     SecondDerivative,
     WeightedSumApproach,
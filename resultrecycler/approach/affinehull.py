@@ -1,8 +1,7 @@
 #!/usr/bin/python
 
-from numpy import array, dot, zeros, argmax, allclose
-from numpy.core.umath import equal, absolute
-from numpy.linalg import solve
+from numpy import allclose, array_equal, asarray, concatenate, dot, float64, zeros
+from numpy.linalg import norm
 from .basic import Approach, NearestNeighbor
 
 
@@ -20,36 +19,53 @@ class AffineHull(Approach):
         super().__init__()
         self.fallback_approach = NearestNeighbor()
 
-    def guess(self, data, candidate):
+    def guess(self, data, neighbors, candidate):
         approach_base = AffineBase()
         sample_indices = []
-        i = 0
-        try:
+        nearest_indices = iter(neighbors)
+        exhausted = False
+        with self.instrumentation.stage('affine_hull_search'):
             while approach_base.is_affine_independent(candidate.coordinates):
-                next_nearest = data[i].coordinates
+                index = next(nearest_indices, None)
+                if index is None:
+                    exhausted = True
+                    break
+                next_nearest = data.coordinates[index]
                 if approach_base.is_affine_independent(next_nearest):
                     approach_base.add(next_nearest)
-                    sample_indices.append(i)
-                i += 1
-        except IndexError:
-            return self.fallback_approach.guess(data, candidate)
-        coefficients = approach_base.affine_coefficients(candidate.coordinates)
+                    sample_indices.append(index)
+        self.instrumentation.count('affine_independence_tests', approach_base.evaluations)
+        if exhausted:
+            self.instrumentation.count('nearest_neighbor_fallbacks')
+            return self.fallback_approach.guess(data, neighbors, candidate)
+        with self.instrumentation.stage('affine_hull_solve'):
+            coefficients = approach_base.affine_coefficients(candidate.coordinates)
+        self.instrumentation.count('linear_solves')
         result = 0
         for i in range(len(coefficients)):
-            values = data[sample_indices[i]].values
+            values = data.values[sample_indices[i]]
             result += (values * coefficients[i])
         return result
 
 
 class AffineBase:
+    """
+    Affine base spanned by affinely independent points.
+    The differences of the points to the first point are kept as an incrementally updated QR factorization (Gram-Schmidt
+    with one reorthogonalization), so testing a candidate costs O(m k) and its affine coefficients are found by a
+    triangular solve in O(k^2), with m coordinates and k points.
+    Points are processed in double precision, whatever the dtype they are stored in.
+    """
     def __init__(self):
         self.points = []
+        self._origin = None
+        self._q = None
+        self._r = None
         self._current_candidate = None
-        self._current_affine_coefficients = None
-        self.independence_indices = []
-        self.point_matrix = None
-        self.base_matrix = None
-        self._current_affine_combination = None
+        self._current_candidate_dependent = None
+        self._current_projection = None
+        self._current_residual = None
+        self.evaluations = 0
 
     def is_affine_independent(self, candidate):
         return not self.is_affine_dependent(candidate)
@@ -60,59 +76,65 @@ class AffineBase:
 
     def affine_coefficients(self, candidate):
         self._evaluate(candidate)
-        return self._current_affine_coefficients
+        if self.dim() == 0:
+            return None
+        coefficients = self._back_substitution(self._r[:self._rank(), :self._rank()], self._current_projection)
+        return concatenate(([1 - coefficients.sum()], coefficients))
 
     def _evaluate(self, candidate):
+        candidate = asarray(candidate, dtype=float64)
         if self._is_current_candidate(candidate):
             return
         self._current_candidate = candidate
+        self.evaluations += 1
         if self.dim() == 0:
             self._current_candidate_dependent = False
-            self._current_affine_coefficients = None
         else:
-            self._compute_and_verify_coefficients()
+            self._project_and_verify()
 
     def _is_current_candidate(self, candidate):
-        return self._current_candidate is not None and all(equal(candidate, self._current_candidate))
-
-    def _compute_and_verify_coefficients(self):
-        prunedCandidate = self._pruned_with_affine_coefficient(self._current_candidate)
-        self._current_affine_coefficients = solve(self.base_matrix, prunedCandidate)
-        self._current_affine_combination = dot(self.point_matrix, self._current_affine_coefficients)
-        self._current_candidate_dependent = allclose(self._current_affine_combination, self._current_candidate)
-
-    def _pruned_with_affine_coefficient(self, vector):
-        modified_vector = zeros(self.dim())
-        modified_vector[0] = 1
-        for i in range(1, self.dim()):
-            modified_vector[i] = vector[self.independence_indices[i - 1]]
-        return modified_vector
+        return self._current_candidate is not None and array_equal(candidate, self._current_candidate)
+
+    def _project_and_verify(self):
+        base = self._q[:, :self._rank()]
+        difference = self._current_candidate - self._origin
+        self._current_projection = dot(base.T, difference)
+        affine_combination = self._origin + dot(base, self._current_projection)
+        self._current_residual = self._current_candidate - affine_combination
+        self._current_candidate_dependent = (self._rank() == len(self._origin) or
+                                             allclose(affine_combination, self._current_candidate))
+
+    @classmethod
+    def _back_substitution(cls, upper, vector):
+        solution = zeros(len(vector))
+        for i in range(len(vector) - 1, -1, -1):
+            solution[i] = (vector[i] - dot(upper[i, i + 1:], solution[i + 1:])) / upper[i, i]
+        return solution
 
     def add(self, vector):
         self._evaluate(vector)
         if self._current_candidate_dependent:
             raise Exception
-        if self.dim() > 0:
-            self._add_independent_index()
-        self._add_to_points(self._current_candidate)
-        self._update_base()
-
-    def _add_independent_index(self):
-        affine_approximation = self._current_affine_combination
-        independent_index = argmax(absolute(affine_approximation - self._current_candidate))
-        self.independence_indices.append(independent_index)
-
-    def _add_to_points(self, candidate):
-        self.points.append(candidate)
-        self.point_matrix = array(self.points).T
-
-    def _update_base(self):
-        new_base = zeros((self.dim(), self.dim()))
-        i = 0
-        for p in self.points:
-            new_base[:, i] = self._pruned_with_affine_coefficient(p)
-            i += 1
-        self.base_matrix = new_base
+        if self.dim() == 0:
+            self._origin = self._current_candidate
+            self._q = zeros((len(vector), len(vector)))
+            self._r = zeros((len(vector), len(vector)))
+        else:
+            self._append_column()
+        self.points.append(self._current_candidate)
+        self._current_candidate = None
+
+    def _append_column(self):
+        rank = self._rank()
+        base = self._q[:, :rank]
+        correction = dot(base.T, self._current_residual)
+        residual = self._current_residual - dot(base, correction)
+        self._r[:rank, rank] = self._current_projection + correction
+        self._r[rank, rank] = norm(residual)
+        self._q[:, rank] = residual / self._r[rank, rank]
+
+    def _rank(self):
+        return len(self.points) - 1
 
     def __len__(self):
         return len(self.points)
@@ -1,30 +1,55 @@
 #!/usr/bin/python
 
-from numpy import ones
+from numpy import array, ones
 
 from ..config import Information
+from ..instrumentation import DISABLED
 
 
 class Approach:
     """
     Base class for approaches.
+    Approaches with observes_samples set are informed about added and removed samples like an index (see Index).
     """
+    instrumentation = DISABLED
+    observes_samples = False
+
     def __init__(self):
         """
         The required_information field at the first evaluation to ensure data fulfills the required properties.
         """
         self.required_information = Information.ValueOnly
 
-    def guess(self, data, candidate):
+    def guess(self, data, neighbors, candidate):
         """
         This method is the entry for the actual guess approach.
-        :param data: Contains an ordered list of available sample data. At least one sample is always present, when this
-        method is called
+        :param data: Contains the sample store with all available sample data. At least one sample is always present,
+        when this method is called
+        :param neighbors: Contains the row indices of the sample store ordered by their distance to the candidate.
         :param candidate: Contains the data of the item, for which the guess is currently evaluated.
         :return: The actual guess produced by this approach
         """
         raise NotImplementedError('Guess method of {} is not implemented'.format(self.__name__))
 
+    def guess_many(self, data, neighbors, candidates):
+        """
+        Batched form of guess. Evaluates guess for each candidate, if not overridden by a vectorized implementation.
+        :param data: Contains the sample store with all available sample data.
+        :param neighbors: Contains the neighbors of each candidate.
+        :param candidates: Contains the candidates of the batch query.
+        :return: The guesses stacked with one row per candidate
+        """
+        return array([self.guess(data, candidate_neighbors, candidate)
+                      for candidate_neighbors, candidate in zip(neighbors, candidates)]).reshape(
+            len(candidates), data.values.shape[1])
+
+    @classmethod
+    def pivots(cls, neighbors):
+        """
+        :return: Row indices of the closest sample of each candidate.
+        """
+        return array([candidate_neighbors[0] for candidate_neighbors in neighbors], dtype=int)
+
 
 class Fixed(Approach):
     """
@@ -34,7 +59,10 @@ class Fixed(Approach):
     fixed_value = 0
 
     def guess(self, data, *_):
-        return ones(len(data[0].values)) * self.fixed_value
+        return ones(data.values.shape[1]) * self.fixed_value
+
+    def guess_many(self, data, neighbors, *_):
+        return ones((len(neighbors), data.values.shape[1])) * self.fixed_value
 
 
 class NearestNeighbor(Approach):
@@ -43,5 +71,8 @@ class NearestNeighbor(Approach):
     """
     name = 'Nearest Neighbor Approach'
 
-    def guess(self, data, *_):
-        return data[0].values
+    def guess(self, data, neighbors, *_):
+        return data.values[neighbors[0]].copy()
+
+    def guess_many(self, data, neighbors, *_):
+        return data.values[self.pivots(neighbors)]
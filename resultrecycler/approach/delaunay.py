@@ -0,0 +1,435 @@
+#!/usr/bin/python
+
+from math import sqrt
+from threading import Lock
+
+from numpy import argmax, argmin, asarray, concatenate, dot, einsum, empty, eye, float64, full, int64, repeat, zeros
+from numpy.linalg import LinAlgError, inv, norm
+from numpy.random import default_rng
+
+from .affinehull import AffineHull
+
+
+class DegenerateSimplexError(ArithmeticError):
+    def __init__(self, *args, **kwargs):
+        super().__init__('Insertion would produce a degenerate simplex', *args, **kwargs)
+
+
+class DelaunayTriangulation:
+    """
+    Incremental Delaunay triangulation (Bowyer-Watson) of points in few dimensions.
+    All points lie inside an enclosing simplex much larger than their bounds, whose corners are the first vertices. A
+    point is inserted by locating its simplex with a walk, removing the simplices whose circumsphere contains it and
+    connecting it to the boundary of this cavity. Each simplex keeps its neighbors (the neighbor at position i shares
+    the facet opposite of corner i), the inverse of its edge matrix for barycentric coordinates and its circumsphere.
+    Simplices are positively oriented, so the barycentric coordinate of a point opposite of a facet tells on which side
+    of the facet it lies. The triangulation must not be used any more after an insertion raised DegenerateSimplexError.
+    """
+    enclosing_factor = 100.0
+    tolerance = 1e-10
+    max_repairs = 16
+    initial_capacity = 16
+
+    def __init__(self, dim, center, radius):
+        """
+        :param dim: Number of coordinates of the points.
+        :param center: Center of the ball, which contains the points to be inserted.
+        :param radius: Radius of this ball.
+        """
+        self.dim = dim
+        self.scale = float(radius) if radius > 0 else 1.0
+        self._points = empty((self.initial_capacity, dim))
+        self._incident = full(self.initial_capacity, -1, dtype=int64)
+        self._point_count = 0
+        self._vertices = empty((self.initial_capacity, dim + 1), dtype=int64)
+        self._neighbors = empty((self.initial_capacity, dim + 1), dtype=int64)
+        self._inverse = empty((self.initial_capacity, dim, dim))
+        self._origin = empty((self.initial_capacity, dim))
+        self._center = empty((self.initial_capacity, dim))
+        self._radius = empty(self.initial_capacity)
+        self._alive = zeros(self.initial_capacity, dtype=bool)
+        self._simplex_count = 0
+        self._free = []
+        self._last = 0
+        size = self.enclosing_factor * self.scale * sqrt(dim)
+        corners = full((dim + 1, dim), asarray(center, dtype=float64) - size)
+        corners[:dim] += (dim + 1) * size * eye(dim)
+        for corner in corners:
+            self._add_point(corner)
+        self._enclosing = inv((corners[:-1] - corners[-1]).T), corners[-1]
+        simplex = self._allocate()
+        self._vertices[simplex] = range(dim + 1)
+        self._neighbors[simplex] = -1
+        self._alive[simplex] = True
+        self._set_geometry([simplex])
+        self._incident[:dim + 1] = simplex
+
+    def __len__(self):
+        """
+        :return: Number of vertices including the corners of the enclosing simplex.
+        """
+        return self._point_count
+
+    def encloses(self, point):
+        """
+        :return: Whether point lies well inside the enclosing simplex, so it can be inserted.
+        """
+        inverse, origin = self._enclosing
+        coordinates = dot(inverse, asarray(point, dtype=float64) - origin)
+        return coordinates.min() > self.tolerance and coordinates.sum() < 1 - self.tolerance
+
+    def corners(self, simplex):
+        """
+        :return: Vertices of the simplex.
+        """
+        return self._vertices[simplex]
+
+    def incident(self, vertex):
+        """
+        :return: A simplex with the vertex as corner.
+        """
+        return self._incident[vertex]
+
+    def locate(self, point, start=None):
+        """
+        Walks from simplex start towards the point, always crossing the facet the point lies furthest behind.
+        Walks in a Delaunay triangulation do not cycle, so all simplices are scanned only if rounding makes it cycle.
+        :param point: Point to be located.
+        :param start: Simplex to start from. The simplex found last, if nothing else given.
+        :return: The simplex containing the point, the barycentric coordinates of the point in this simplex and the
+         number of steps walked. None, if the point lies outside the enclosing simplex.
+        """
+        simplex = start if start is not None and start >= 0 and self._alive[start] else self._last
+        for steps in range(self._simplex_count):
+            coordinates = self._barycentric(simplex, point)
+            facet = argmin(coordinates)
+            if coordinates[facet] >= -self.tolerance:
+                self._last = simplex
+                return simplex, coordinates, steps
+            simplex = self._neighbors[simplex, facet]
+            if simplex < 0:
+                return None
+        return self._scan(point)
+
+    def _scan(self, point):
+        simplices = self._alive[:self._simplex_count].nonzero()[0]
+        coordinates = self._barycentric_many(simplices, point)
+        position = argmax(coordinates.min(axis=1))
+        if coordinates[position].min() < -self.tolerance:
+            return None
+        return simplices[position], coordinates[position], self._simplex_count
+
+    def insert(self, point):
+        """
+        :param point: Point inside the enclosing simplex.
+        :return: Vertex of the point. A point coinciding with a vertex is not inserted again; the existing vertex is
+         returned instead.
+        """
+        point = asarray(point, dtype=float64)
+        located = self.locate(point)
+        if located is None:
+            raise ValueError('Point {} lies outside the enclosing simplex'.format(point))
+        simplex = located[0]
+        corners = self._vertices[simplex]
+        distances = norm(self._points[corners] - point, axis=1)
+        closest = argmin(distances)
+        if distances[closest] <= self.tolerance * self.scale:
+            return corners[closest]
+        cavity = self._cavity(point, simplex)
+        facets = self._boundary(point, simplex, cavity)
+        vertex = self._add_point(point)
+        self._fill(vertex, cavity, facets)
+        return vertex
+
+    def _cavity(self, point, simplex):
+        """
+        :return: The simplex containing the point and all simplices connected to it, whose circumsphere contains point.
+        """
+        cavity = {simplex}
+        pending = [simplex]
+        while pending:
+            for neighbor in self._neighbors[pending.pop()].tolist():
+                if neighbor >= 0 and neighbor not in cavity and self._in_circumsphere(neighbor, point):
+                    cavity.add(neighbor)
+                    pending.append(neighbor)
+        return cavity
+
+    def _boundary(self, point, simplex, cavity):
+        """
+        Finds the facets of the cavity boundary. Rounding might leave the cavity not star-shaped around the point,
+        which shows as a boundary facet the point does not lie strictly in front of. The cavity is repaired by dropping
+        the simplex behind such a facet or, if the point lies on the facet, by adding the simplex beyond it.
+        :return: List of the simplex of the cavity, the position of the facet in it, the simplex beyond the facet
+         (-1 for the hull of the enclosing simplex) and the position of the facet in that simplex.
+        """
+        for _ in range(self.max_repairs):
+            simplices = list(cavity)
+            coordinates = self._barycentric_many(simplices, point)
+            facets = []
+            flawed = []
+            for position, current in enumerate(simplices):
+                for facet, neighbor in enumerate(self._neighbors[current].tolist()):
+                    if neighbor in cavity:
+                        continue
+                    if coordinates[position, facet] > self.tolerance:
+                        facets.append((current, facet, neighbor))
+                    else:
+                        flawed.append((current, neighbor, coordinates[position, facet]))
+            if not flawed:
+                return [(current, facet, neighbor, -1 if neighbor < 0 else self._position(neighbor, current))
+                        for current, facet, neighbor in facets]
+            for current, neighbor, coordinate in flawed:
+                if coordinate < -self.tolerance and current != simplex:
+                    cavity.discard(current)
+                elif neighbor >= 0:
+                    cavity.add(neighbor)
+                else:
+                    raise DegenerateSimplexError()
+        raise DegenerateSimplexError()
+
+    def _position(self, simplex, neighbor):
+        return self._neighbors[simplex].tolist().index(neighbor)
+
+    def _fill(self, vertex, cavity, facets):
+        """
+        Replaces the cavity by the simplices connecting its boundary facets with the new vertex. The new simplices
+        reuse the slots of the cavity.
+        """
+        for current in cavity:
+            self._alive[current] = False
+        self._free.extend(cavity)
+        replaced = self._vertices[[current for current, *_ in facets]].tolist()
+        simplices = [self._allocate() for _ in facets]
+        ridges = {}
+        for simplex, corners, (_, facet, neighbor, back) in zip(simplices, replaced, facets):
+            corners[facet] = vertex
+            self._vertices[simplex] = corners
+            self._neighbors[simplex] = -1
+            self._neighbors[simplex, facet] = neighbor
+            if neighbor >= 0:
+                self._neighbors[neighbor, back] = simplex
+            for position in range(self.dim + 1):
+                if position == facet:
+                    continue
+                ridge = frozenset(corners[:position] + corners[position + 1:])
+                other = ridges.pop(ridge, None)
+                if other is None:
+                    ridges[ridge] = (simplex, position)
+                else:
+                    self._neighbors[simplex, position] = other[0]
+                    self._neighbors[other] = simplex
+        if ridges:
+            raise DegenerateSimplexError()
+        for simplex in simplices:
+            self._alive[simplex] = True
+        self._set_geometry(simplices)
+        self._incident[self._vertices[simplices].ravel()] = repeat(simplices, self.dim + 1)
+        self._last = simplices[0]
+
+    def _in_circumsphere(self, simplex, point):
+        offset = point - self._center[simplex]
+        return dot(offset, offset) < self._radius[simplex] * (1 - self.tolerance)
+
+    def _barycentric(self, simplex, point):
+        coordinates = dot(self._inverse[simplex], point - self._origin[simplex])
+        return concatenate((coordinates, [1 - coordinates.sum()]))
+
+    def _barycentric_many(self, simplices, point):
+        coordinates = einsum('kij,kj->ki', self._inverse[simplices], point - self._origin[simplices])
+        return concatenate((coordinates, 1 - coordinates.sum(axis=1, keepdims=True)), axis=1)
+
+    def _set_geometry(self, simplices):
+        """
+        Computes the inverse edge matrices and circumspheres of the simplices. With the edges e_i = v_i - v_n as
+        columns of the matrix T, the barycentric coordinates of x are T^-1 (x - v_n) and the center c of the
+        circumsphere solves 2 T^t (c - v_n) = (|e_i|^2).
+        """
+        simplices = asarray(simplices, dtype=int64)
+        corners = self._points[self._vertices[simplices]]
+        origin = corners[:, -1]
+        edges = corners[:, :-1] - origin[:, None]
+        try:
+            inverse = inv(edges.transpose(0, 2, 1))
+        except LinAlgError:
+            raise DegenerateSimplexError()
+        offset = 0.5 * einsum('kji,kj->ki', inverse, (edges ** 2).sum(axis=2))
+        self._inverse[simplices] = inverse
+        self._origin[simplices] = origin
+        self._center[simplices] = origin + offset
+        self._radius[simplices] = (offset ** 2).sum(axis=1)
+
+    def _add_point(self, point):
+        if self._point_count == len(self._points):
+            self._points = self._grown(self._points)
+            self._incident = self._grown(self._incident, -1)
+        vertex = self._point_count
+        self._points[vertex] = point
+        self._point_count += 1
+        return vertex
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        if self._simplex_count == len(self._vertices):
+            self._vertices = self._grown(self._vertices)
+            self._neighbors = self._grown(self._neighbors)
+            self._inverse = self._grown(self._inverse)
+            self._origin = self._grown(self._origin)
+            self._center = self._grown(self._center)
+            self._radius = self._grown(self._radius)
+            self._alive = self._grown(self._alive, False)
+        simplex = self._simplex_count
+        self._simplex_count += 1
+        return simplex
+
+    @classmethod
+    def _grown(cls, block, fill=None):
+        grown = empty((2 * len(block), ) + block.shape[1:], dtype=block.dtype)
+        grown[:len(block)] = block
+        if fill is not None:
+            grown[len(block):] = fill
+        return grown
+
+
+class DelaunayHull(AffineHull):
+    """
+    Engine of AffineHull for few coordinates, which keeps an incremental Delaunay triangulation of the samples instead
+    of searching affinely independent samples among the nearest ones on each query. The simplex containing the
+    candidate is found by a walk starting at a simplex of the nearest sample and the values of its corners are weighted
+    by the barycentric coordinates of the candidate. Candidates outside the convex hull of the samples get the values of
+    the nearest sample.
+    The triangulation is built on the coordinates scaled by the weights of the metric and is updated with every added
+    sample. Removing samples (e.g. by eviction) or a failed insertion rebuilds it at the next query. With more than
+    max_dimension coordinates and while the approach is not bound to a sample store, it guesses like AffineHull.
+    Updates are guarded by a lock and a rebuilt triangulation is only published once it is complete, so queries running
+    in parallel threads (calculate_many with an executor) wait for it instead of guessing like AffineHull meanwhile.
+    """
+    observes_samples = True
+    max_dimension = 4
+
+    def __init__(self):
+        super().__init__()
+        self.data = None
+        self.metric = None
+        self._triangulation = None
+        self._row_vertices = None
+        self._vertex_rows = None
+        self._stale = False
+        self._lock = Lock()
+
+    def init_index(self, data, metric):
+        """
+        :param data: The sample store to be triangulated. It might already contain samples.
+        :param metric: The metric with initialized weights.
+        """
+        self.bind(data, metric)
+        self._stale = True
+
+    def bind(self, data, metric):
+        """
+        Binds the approach to the sample store and the metric without triangulating the samples again.
+        """
+        self.data = data
+        self.metric = metric
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['data'] = None
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def add(self, row):
+        self.add_many([row])
+
+    def add_many(self, rows):
+        with self._lock:
+            triangulation = self._triangulation
+            if self._stale or triangulation is None:
+                return
+            points = self.metric.scale(self.data.coordinates[rows])
+            if not all(triangulation.encloses(point) for point in points):
+                self._stale = True
+                return
+            with self.instrumentation.stage('delaunay_insert'):
+                if not self._insert(triangulation, rows, points):
+                    self._triangulation = None
+                    self._stale = True
+
+    def remove(self, row):
+        with self._lock:
+            self._stale = True
+
+    def move(self, old_row, new_row):
+        # The triangulation is rebuilt after the removal preceding each move.
+        pass
+
+    def guess(self, data, neighbors, candidate):
+        if self._stale:
+            with self._lock:
+                if self._stale:
+                    with self.instrumentation.stage('delaunay_build'):
+                        self._rebuild()
+        triangulation = self._triangulation
+        if triangulation is None or data is not self.data:
+            return super().guess(data, neighbors, candidate)
+        with self.instrumentation.stage('delaunay_location'):
+            start = triangulation.incident(self._row_vertices[neighbors[0]])
+            located = triangulation.locate(self.metric.scale(candidate.coordinates), start)
+        if located is not None:
+            self.instrumentation.count('delaunay_walk_steps', located[2])
+        rows = None if located is None else self._vertex_rows[triangulation.corners(located[0])]
+        if rows is None or rows.min() < 0:
+            self.instrumentation.count('nearest_neighbor_fallbacks')
+            return self.fallback_approach.guess(data, neighbors, candidate)
+        return dot(located[1], data.values[rows])
+
+    def _rebuild(self):
+        """
+        Triangulates all samples in random order, which keeps the expected walks and cavities of the insertions short.
+        The triangulation is published, when it is complete. Is called with the lock held.
+        """
+        triangulation = None
+        dim = self.data.coordinates.shape[1]
+        if len(self.data) and dim <= self.max_dimension:
+            points = self.metric.scale(self.data.coordinates)
+            center = (points.max(axis=0) + points.min(axis=0)) / 2
+            triangulation = DelaunayTriangulation(dim, center, 2 * norm(points - center, axis=1).max())
+            self._row_vertices = full(len(self.data), -1, dtype=int64)
+            self._vertex_rows = full(dim + 1, -1, dtype=int64)
+            order = default_rng(0).permutation(len(self.data))
+            if not self._insert(triangulation, order, points[order]):
+                triangulation = None
+        self._triangulation = triangulation
+        self._stale = False
+
+    def _insert(self, triangulation, rows, points):
+        """
+        Inserts the samples into the triangulation. Is called with the lock held.
+        :return: Whether all samples were inserted. The triangulation can not be used any more otherwise.
+        """
+        rows = asarray(rows, dtype=int64)
+        if len(rows) and rows.max() >= len(self._row_vertices):
+            self._row_vertices = self._resized(self._row_vertices, max(2 * len(self._row_vertices), rows.max() + 1))
+        try:
+            for row, point in zip(rows.tolist(), points):
+                count = len(triangulation)
+                vertex = triangulation.insert(point)
+                if len(triangulation) > count:
+                    if vertex >= len(self._vertex_rows):
+                        self._vertex_rows = self._resized(self._vertex_rows, 2 * len(self._vertex_rows))
+                    self._vertex_rows[vertex] = row
+                self._row_vertices[row] = vertex
+        except DegenerateSimplexError:
+            self.instrumentation.count('delaunay_failures')
+            return False
+        return True
+
+    @classmethod
+    def _resized(cls, block, size):
+        resized = full(size, -1, dtype=block.dtype)
+        resized[:len(block)] = block
+        return resized
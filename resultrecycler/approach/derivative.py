@@ -1,9 +1,10 @@
 #!/usr/bin/python
 
-from numpy import dot
+from numpy import dot, einsum, float64, subtract
 
 from .basic import Approach
 from ..config import Information
+from ..converter.derivative import upper_triangle
 
 
 class FirstDerivative(Approach):
@@ -14,10 +15,23 @@ class FirstDerivative(Approach):
         super().__init__()
         self.required_information = Information.FirstDerivative
 
-    def guess(self, data, candidate):
-        pivot = data[0]
-        delta = candidate.coordinates - pivot.coordinates
-        return pivot.values + dot(pivot.jacobian, delta)
+    def guess(self, data, neighbors, candidate):
+        pivot = neighbors[0]
+        delta = self._delta(candidate.coordinates, data.coordinates[pivot])
+        return data.values[pivot] + dot(data.jacobians[pivot], delta)
+
+    def guess_many(self, data, neighbors, candidates):
+        pivots = self.pivots(neighbors)
+        delta = self._delta(candidates.coordinates, data.coordinates[pivots])
+        return data.values[pivots] + einsum('kvc,kc->kv', data.jacobians[pivots], delta)
+
+    @classmethod
+    def _delta(cls, candidate_coordinates, pivot_coordinates):
+        """
+        :return: Difference of the coordinates in double precision, so the polynomial is evaluated in double precision
+         for coordinates and derivatives of smaller dtypes.
+        """
+        return subtract(candidate_coordinates, pivot_coordinates, dtype=float64)
 
 
 class SecondDerivative(FirstDerivative):
@@ -28,7 +42,29 @@ class SecondDerivative(FirstDerivative):
         super().__init__()
         self.required_information = Information.SecondDerivative
 
-    def guess(self, data, candidate):
-        pivot = data[0]
-        delta = candidate.coordinates - pivot.coordinates
-        return pivot.values + dot(pivot.jacobian, delta) + dot(dot(pivot.hessian, delta), delta) * 0.5
+    def guess(self, data, neighbors, candidate):
+        pivot = neighbors[0]
+        delta = self._delta(candidate.coordinates, data.coordinates[pivot])
+        if data.packed_hessians:
+            curvature = dot(data.hessians[pivot], self._packed_products(delta))
+        else:
+            curvature = dot(dot(data.hessians[pivot], delta), delta)
+        return data.values[pivot] + dot(data.jacobians[pivot], delta) + curvature * 0.5
+
+    def guess_many(self, data, neighbors, candidates):
+        pivots = self.pivots(neighbors)
+        delta = self._delta(candidates.coordinates, data.coordinates[pivots])
+        if data.packed_hessians:
+            curvature = einsum('kvp,kp->kv', data.hessians[pivots], self._packed_products(delta))
+        else:
+            curvature = einsum('kvcd,kc,kd->kv', data.hessians[pivots], delta, delta)
+        return data.values[pivots] + einsum('kvc,kc->kv', data.jacobians[pivots], delta) + curvature * 0.5
+
+    @classmethod
+    def _packed_products(cls, delta):
+        """
+        :return: The products of the coordinate differences matching the packed hessian entries, so the quadratic form
+         is a single dot product with the packed hessian.
+        """
+        rows, columns, weights = upper_triangle(delta.shape[-1])
+        return weights * delta[..., rows] * delta[..., columns]
@@ -1,6 +1,6 @@
 #!/usr/bin/python
 
-from numpy import zeros
+from numpy import array, einsum, zeros
 
 from .basic import Approach
 
@@ -16,23 +16,35 @@ class WeightedSumApproach(Approach):
         self.value_dimension = None
         self.max_samples = None
 
-    def _get_normalized_weights(self, data):
-        non_normalised_weights = self._get_non_normalized_weights(data)
+    def _get_normalized_weights(self, neighbors, indices):
+        non_normalised_weights = self._get_non_normalized_weights(neighbors, indices)
         return non_normalised_weights / sum(non_normalised_weights)
 
-    def _get_non_normalized_weights(self, data):
-        number_of_relevant_samples = min(len(data), self.max_samples)
-        relevant_weights = zeros(number_of_relevant_samples)
-        for key, dat in enumerate(data[:number_of_relevant_samples]):
-            relevant_weights[key] = 1 / dat.current_distance
-        return relevant_weights
+    @classmethod
+    def _get_non_normalized_weights(cls, neighbors, indices):
+        return 1 / neighbors.distance(indices)
 
-    def guess(self, data, candidate):
+    def _init_dimensions(self, data):
         if self.value_dimension is None:
-            self.value_dimension = len(data[0].values)
-            self.max_samples = len(data[0].coordinates) + 1
+            self.max_samples = data.coordinates.shape[1] + 1
+            self.value_dimension = data.values.shape[1]
+
+    def guess(self, data, neighbors, candidate):
+        self._init_dimensions(data)
         result = zeros(self.value_dimension)
-        normalized_weights = self._get_normalized_weights(data)
-        for key, weight in enumerate(normalized_weights):
-            result += (data[key].values * weight)
+        indices = neighbors.first(self.max_samples)
+        normalized_weights = self._get_normalized_weights(neighbors, indices)
+        for index, weight in zip(indices, normalized_weights):
+            result += (data.values[index] * weight)
         return result
+
+    def guess_many(self, data, neighbors, candidates):
+        self._init_dimensions(data)
+        shape = (len(neighbors), min(len(data), self.max_samples))
+        indices = array([candidate_neighbors.first(self.max_samples) for candidate_neighbors in neighbors],
+                        dtype=int).reshape(shape)
+        non_normalised_weights = array([self._get_non_normalized_weights(candidate_neighbors, candidate_indices)
+                                        for candidate_neighbors, candidate_indices in zip(neighbors, indices)]).reshape(
+            shape)
+        normalized_weights = non_normalised_weights / non_normalised_weights.sum(axis=1, keepdims=True)
+        return einsum('ks,ksv->kv', normalized_weights, data.values[indices])
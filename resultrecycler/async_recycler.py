@@ -0,0 +1,126 @@
+#!/usr/bin/python
+
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .result_recycler import ResultRecycler
+
+
+class AsyncResultRecycler:
+    """
+    Asyncio front-end of a result recycler. The numeric work runs on a single worker thread, so the event loop is not
+    blocked by it.
+    Queries arriving within batch_window seconds of each other are combined into one call of calculate_many. All
+    operations take effect in the order they were started: a query sees every sample, whose add_data was started before
+    it, and none of the samples added later. Queries collected in a batch are sent to the worker before any later
+    ingestion.
+    The wrapped result recycler must not be used directly while operations are outstanding.
+    """
+    batch_window = 0.001
+    max_batch_size = 1024
+
+    def __init__(self, recycler=None, batch_window=None, max_batch_size=None):
+        """
+        :param recycler: Object of ResultRecycler doing the work. A default result recycler is used, if nothing else
+         given.
+        :param batch_window: Seconds to wait for further queries after the first one of a batch.
+        :param max_batch_size: Number of queries, after which a batch is sent without waiting for the window to end.
+        """
+        self.recycler = ResultRecycler() if recycler is None else recycler
+        if batch_window is not None:
+            self.batch_window = batch_window
+        if max_batch_size is not None:
+            self.max_batch_size = max_batch_size
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='resultrecycler')
+        self._pending = []
+        self._flush_handle = None
+
+    async def calculate(self, new_coordinates):
+        """
+        Async form of ResultRecycler.calculate.
+        """
+        loop = get_running_loop()
+        future = loop.create_future()
+        self._pending.append((new_coordinates, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def calculate_many(self, candidates):
+        """
+        Async form of ResultRecycler.calculate_many. The candidates are evaluated as one batch of their own.
+        """
+        return await self._run(self.recycler.calculate_many, candidates)
+
+    async def add_data(self, sample_data_or_coordinates, values=None, jacobian=None, hessian=None):
+        """
+        Async form of ResultRecycler.add_data.
+        """
+        await self._run(self.recycler.add_data, sample_data_or_coordinates, values, jacobian, hessian)
+
+    async def add_data_many(self, coordinates, values, jacobians=None, hessians=None):
+        """
+        Async form of ResultRecycler.add_data_many.
+        """
+        await self._run(self.recycler.add_data_many, coordinates, values, jacobians, hessians)
+
+    async def close(self):
+        """
+        Waits for all outstanding operations and stops the worker thread.
+        """
+        await self._run(lambda: None)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    def _run(self, function, *args):
+        self._flush()
+        return get_running_loop().run_in_executor(self._executor, partial(function, *args))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        candidates = [candidate for candidate, _ in pending]
+        work = get_running_loop().run_in_executor(self._executor, self._calculate_batch, candidates)
+        work.add_done_callback(partial(self._resolve, [future for _, future in pending]))
+
+    def _calculate_batch(self, candidates):
+        """
+        :return: Pairs of result and error for each candidate. Candidates, which can not be converted, receive their
+         error and the other ones are evaluated in one call of calculate_many (see ResultRecycler.convert_candidates).
+        """
+        batch, errors = self.recycler.convert_candidates(candidates)
+        try:
+            results = iter(self.recycler.calculate_many(batch))
+        except Exception as error:
+            return [(None, error if own is None else own) for own in errors]
+        return [(next(results), None) if error is None else (None, error) for error in errors]
+
+    @classmethod
+    def _resolve(cls, futures, work):
+        if work.cancelled():
+            outcomes = [(None, None)] * len(futures)
+        elif work.exception() is not None:
+            outcomes = [(None, work.exception())] * len(futures)
+        else:
+            outcomes = work.result()
+        for future, (result, error) in zip(futures, outcomes):
+            if future.done():
+                continue
+            if work.cancelled():
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
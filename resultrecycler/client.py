@@ -0,0 +1,172 @@
+#!/usr/bin/python
+
+from socket import AF_UNIX, SOCK_STREAM, socket
+from struct import Struct
+
+from numpy import dtype, frombuffer, generic, ndarray
+
+
+class RemoteError(Exception):
+    def __init__(self, message, *args, **kwargs):
+        super().__init__('Server failed: {}'.format(message), *args, **kwargs)
+
+
+class Codec:
+    """
+    Compact binary encoding of the requests and responses of the query server. Each message is framed by its length.
+    Only plain data (None, numbers, strings, lists, tuples, dicts and numeric arrays) is encoded, so decoding a message
+    never runs code of the sender like unpickling would.
+    """
+    frame = Struct('!I')
+    count = Struct('!I')
+    integer = Struct('!q')
+    real = Struct('!d')
+
+    @classmethod
+    def encode(cls, obj):
+        parts = []
+        cls._encode(obj, parts)
+        payload = b''.join(parts)
+        return cls.frame.pack(len(payload)) + payload
+
+    @classmethod
+    def _encode(cls, obj, parts):
+        if isinstance(obj, generic):
+            obj = obj.item()
+        if obj is None:
+            parts.append(b'N')
+        elif isinstance(obj, int):
+            parts.append(b'i' + cls.integer.pack(obj))
+        elif isinstance(obj, float):
+            parts.append(b'd' + cls.real.pack(obj))
+        elif isinstance(obj, str):
+            data = obj.encode()
+            parts.append(b's' + cls.count.pack(len(data)) + data)
+        elif isinstance(obj, ndarray):
+            if obj.dtype.kind not in 'biuf':
+                raise TypeError('Unsupported array type {}'.format(obj.dtype))
+            kind = obj.dtype.str.encode()
+            parts.append(b'a' + bytes([len(kind)]) + kind + bytes([obj.ndim]) +
+                         b''.join(cls.count.pack(dim) for dim in obj.shape))
+            parts.append(obj.tobytes())
+        elif isinstance(obj, (list, tuple)):
+            parts.append((b'l' if isinstance(obj, list) else b't') + cls.count.pack(len(obj)))
+            for item in obj:
+                cls._encode(item, parts)
+        elif isinstance(obj, dict):
+            parts.append(b'm' + cls.count.pack(len(obj)))
+            for key, value in obj.items():
+                cls._encode(key, parts)
+                cls._encode(value, parts)
+        else:
+            raise TypeError('Unsupported type {} in message'.format(type(obj)))
+
+    @classmethod
+    def decode(cls, payload):
+        """
+        :param payload: Message without its frame.
+        """
+        obj, end = cls._decode(memoryview(payload), 0)
+        if end != len(payload):
+            raise ValueError('Trailing data in message')
+        return obj
+
+    @classmethod
+    def _decode(cls, data, position):
+        tag = bytes(data[position:position + 1])
+        position += 1
+        if tag == b'N':
+            return None, position
+        if tag == b'i':
+            return cls.integer.unpack_from(data, position)[0], position + cls.integer.size
+        if tag == b'd':
+            return cls.real.unpack_from(data, position)[0], position + cls.real.size
+        if tag in (b's', b'l', b't', b'm'):
+            length = cls.count.unpack_from(data, position)[0]
+            position += cls.count.size
+            if tag == b's':
+                return str(data[position:position + length], 'utf-8'), position + length
+            items = []
+            for _ in range(length * 2 if tag == b'm' else length):
+                item, position = cls._decode(data, position)
+                items.append(item)
+            if tag == b'm':
+                return dict(zip(items[::2], items[1::2])), position
+            return (items if tag == b'l' else tuple(items)), position
+        if tag == b'a':
+            kind_length = data[position]
+            kind = dtype(str(data[position + 1:position + 1 + kind_length], 'ascii'))
+            if kind.kind not in 'biuf':
+                raise TypeError('Unsupported array type {}'.format(kind))
+            position += 1 + kind_length
+            ndim = data[position]
+            shape = tuple(cls.count.unpack_from(data, position + 1 + axis * cls.count.size)[0] for axis in range(ndim))
+            position += 1 + ndim * cls.count.size
+            size = kind.itemsize
+            for dim in shape:
+                size *= dim
+            block = frombuffer(data[position:position + size], dtype=kind).reshape(shape).copy()
+            return block, position + size
+        raise ValueError('Unknown tag {} in message'.format(tag))
+
+
+class ResultRecyclerClient:
+    """
+    Client of a result recycler served by `python -m resultrecycler.serve`. Offers the calculate and add_data methods of
+    ResultRecycler; each call waits for the answer of the server.
+    """
+    def __init__(self, path, timeout=None):
+        """
+        :param path: Path of the unix domain socket of the server.
+        :param timeout: Seconds to wait for an answer. Waits forever, if nothing else given.
+        """
+        self._socket = socket(AF_UNIX, SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(path)
+        self._request_id = 0
+
+    def calculate(self, new_coordinates):
+        return self._call('calculate', new_coordinates)
+
+    def calculate_many(self, candidates):
+        return self._call('calculate_many', candidates)
+
+    def add_data(self, sample_data_or_coordinates, values=None, jacobian=None, hessian=None):
+        if hasattr(sample_data_or_coordinates, 'coordinates') and hasattr(sample_data_or_coordinates, 'values'):
+            sample_data = sample_data_or_coordinates
+            sample_data_or_coordinates, values = sample_data.coordinates, sample_data.values
+            jacobian = getattr(sample_data, 'jacobian', None)
+            hessian = getattr(sample_data, 'hessian', None)
+        self._call('add_data', sample_data_or_coordinates, values, jacobian, hessian)
+
+    def add_data_many(self, coordinates, values, jacobians=None, hessians=None):
+        self._call('add_data_many', coordinates, values, jacobians, hessians)
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _call(self, method, *args):
+        self._request_id += 1
+        self._socket.sendall(Codec.encode((self._request_id, method, list(args))))
+        size = Codec.frame.unpack(self._receive(Codec.frame.size))[0]
+        request_id, succeeded, result = Codec.decode(self._receive(size))
+        if request_id != self._request_id:
+            raise RemoteError('answer {} to request {}'.format(request_id, self._request_id))
+        if not succeeded:
+            raise RemoteError(result)
+        return result
+
+    def _receive(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError('Connection closed by the server')
+            data += chunk
+        return data
@@ -3,8 +3,11 @@
 from enum import Enum
 from functools import total_ordering
 
+from numpy import dtype, float64, zeros
+
 from .converter import VectorConverter, DerivativeConverter
-from .data import ValueData, JacobianData, HessianData, CandidateData
+from .converter.typecheck import ConverterType, TypeCheck, UnsupportedTypeError
+from .data import ValueData, JacobianData, HessianData, CandidateData, CandidateBatch, SampleBatch
 
 
 @total_ordering
@@ -19,25 +22,98 @@ class Information(Enum):
         return
 
 
+class DtypePolicy:
+    """
+    Floating point types the coordinates, values and derivatives (jacobians and hessians) are converted to and stored
+    in. Smaller types save memory at the cost of precision; distances and taylor polynomials are still evaluated in
+    double precision.
+    """
+    def __init__(self, coordinates=float64, values=float64, derivatives=float64):
+        self.coordinates = self._floating(coordinates)
+        self.values = self._floating(values)
+        self.derivatives = self._floating(derivatives)
+
+    @classmethod
+    def _floating(cls, type_):
+        if dtype(type_).kind != 'f':
+            raise UnsupportedTypeError('dtype', type_)
+        return dtype(type_)
+
+
 class Config:
-    def __init__(self, init_data):
+    lazy_derivatives = False
+
+    def __init__(self, init_data, packed_hessians=False, dtypes=None, lazy_derivatives=False):
+        """
+        :param init_data: The first sample, which defines the layout of all samples.
+        :param packed_hessians: Whether to store only the upper triangle of the hessians.
+        :param dtypes: DtypePolicy of the converted data. Everything is kept in double precision, if nothing else
+         given.
+        :param lazy_derivatives: Whether to keep jacobians and hessians, which are not given as arrays, in their
+         original format until a sample is used by an approach.
+        """
+        self.lazy_derivatives = lazy_derivatives
+        dtypes = DtypePolicy() if dtypes is None else dtypes
         self._init_information(init_data)
         self.candidate_class = CandidateData
+        self.candidate_batch_class = CandidateBatch
         self.data_class = ValueData
+        self.batch_class = SampleBatch
         self.coordinate_converter = VectorConverter.select(init_data.coordinates, 'coordinates')
+        self.coordinate_converter.dtype = dtypes.coordinates
         self.value_converter = VectorConverter.select(init_data.values, 'values')
+        self.value_converter.dtype = dtypes.values
         self.jacobian_converter = None
         self.hessian_converter = None
         if self.information in (Information.FirstDerivative, Information.SecondDerivative):
             self.data_class = JacobianData
-            self.jacobian_converter = DerivativeConverter.select(init_data.jacobian, self.coordinate_converter,
-                                                                 self.value_converter)
+            self.jacobian_converter = DerivativeConverter.select(self._jacobian_layout(init_data.jacobian),
+                                                                 self.coordinate_converter, self.value_converter)
+            self.jacobian_converter.dtype = dtypes.derivatives
             if self.information is Information.SecondDerivative:
                 self.data_class = HessianData
                 self.hessian_converter = self.jacobian_converter
-        self.candidate_class.prepare(coordinate_converter=self.coordinate_converter, value_converter=self.value_converter)
-        self.data_class.prepare(coordinate_converter=self.coordinate_converter, value_converter=self.value_converter,
-                                jacobian_converter=self.jacobian_converter, hessian_converter=self.hessian_converter)
+                if packed_hessians:
+                    self.hessian_converter.pack_hessians()
+
+    def candidate(self, coordinates):
+        """
+        :return: The converted candidate for the given coordinates.
+        """
+        return self.candidate_class(coordinates, self)
+
+    def candidates(self, candidates):
+        """
+        :return: The converted candidates of a batch query.
+        """
+        return self.candidate_batch_class(candidates, self)
+
+    def sample(self, sample_data):
+        """
+        :return: The converted sample data.
+        """
+        return self.data_class(sample_data, self)
+
+    def samples(self, coordinates, values, jacobians=None, hessians=None):
+        """
+        :return: The converted samples of a bulk ingestion.
+        """
+        return self.batch_class(coordinates, values, jacobians, hessians, self)
+
+    def _jacobian_layout(self, jacobian):
+        """
+        Arrays do not tell the keys of a jacobian, they are ordered like the converted coordinates and values. So the
+        layout is taken from the coordinates and values instead.
+        """
+        if not TypeCheck.is_ndarray(jacobian) or ConverterType.keys not in (self.coordinate_converter.type,
+                                                                             self.value_converter.type):
+            return jacobian
+        coordinates = self.coordinate_converter.export(zeros(self.coordinate_converter.dim))
+        if self.value_converter.type is ConverterType.keys:
+            return {key: coordinates for key in self.value_converter.keys}
+        if self.value_converter.type is ConverterType.scalar:
+            return coordinates
+        return [coordinates] * self.value_converter.dim
 
     def _init_information(self, init_data):
         if hasattr(init_data, 'hessian') and init_data.hessian is not None:
@@ -1,10 +1,27 @@
 #!/usr/bin/python
 
-from numpy import array
+from functools import lru_cache
+
+from numpy import array, float64, prod, triu_indices, where
 from .typecheck import ConverterType, TypeCheck, WrongDimensionError, DifferentKeyError, UnsupportedTypeError
 
 
+@lru_cache(maxsize=None)
+def upper_triangle(dim):
+    """
+    :param dim: Number of coordinates.
+    :return: Row and column indices of the upper triangle of a dim x dim matrix (row by row) and the weight of each
+     entry in a quadratic form: 1 on the diagonal, 2 above it.
+    """
+    rows, columns = triu_indices(dim)
+    return rows, columns, where(rows == columns, 1.0, 2.0)
+
+
 class DerivativeConverter:
+    keyed = False
+    packed = False
+    dtype = float64
+
     def __init__(self, dim_c, dim_v, keys_c, keys_v, coordinate_converter, value_converter, **_):
         self.dim_c = dim_c
         self.dim_v = dim_v
@@ -14,19 +31,68 @@ class DerivativeConverter:
         self.hess_shape = (self.dim_v, self.dim_c, self.dim_c)
         self.validate(coordinate_converter, value_converter)
 
+    @property
+    def full_hess_shape(self):
+        return self.dim_v, self.dim_c, self.dim_c
+
+    def pack_hessians(self):
+        """
+        Switches to packed hessians: only the upper triangle of each symmetrized hessian is kept row by row, which
+        needs m (m + 1) / 2 instead of m^2 entries per value. Quadratic forms are unchanged by the symmetrization.
+        """
+        self.packed = True
+        self.hess_shape = (self.dim_v, len(upper_triangle(self.dim_c)[0]))
+
     def read(self, value_reader, data):
         raise NotImplementedError('Read function for coordinate vector not implemented')
 
     def read_jac(self, jacobian):
-        ret = array(self.read(self.read_jac_values, jacobian), ndmin=2)
+        if self.keyed and TypeCheck.is_ndarray(jacobian):
+            return array(jacobian, dtype=self.dtype).reshape(self.jac_shape)
+        ret = array(self.read(self.read_jac_values, jacobian), dtype=self.dtype, ndmin=2)
         ret.shape = self.jac_shape
         return ret
 
     def read_hess(self, hessian):
-        ret = array(self.read(self.read_hess_values, hessian), ndmin=3)
-        ret.shape = self.hess_shape
+        return self._packed(self._read_full_hess(hessian))
+
+    def _read_full_hess(self, hessian):
+        if self.keyed and TypeCheck.is_ndarray(hessian):
+            return array(hessian, dtype=self.dtype).reshape(self.full_hess_shape)
+        ret = array(self.read(self.read_hess_values, hessian), dtype=self.dtype, ndmin=3)
+        ret.shape = self.full_hess_shape
         return ret
 
+    def _packed(self, hessians):
+        if not self.packed:
+            return hessians
+        rows, columns, _ = upper_triangle(self.dim_c)
+        return (hessians[..., rows, columns] + hessians[..., columns, rows]) * 0.5
+
+    def read_jac_many(self, jacobians):
+        """
+        :param jacobians: Either an array with one jacobian per sample or a sequence of jacobians in the format of
+         read_jac.
+        :return: The jacobians stacked in an array with one row per sample.
+        """
+        return self._read_many(jacobians, self.read_jac, self.jac_shape)
+
+    def read_hess_many(self, hessians):
+        """
+        :param hessians: Either an array with one hessian per sample or a sequence of hessians in the format of
+         read_hess.
+        :return: The hessians stacked in an array with one row per sample.
+        """
+        return self._packed(self._read_many(hessians, self._read_full_hess, self.full_hess_shape))
+
+    def _read_many(self, data, reader, shape):
+        if not self.keyed or TypeCheck.is_ndarray(data):
+            block = array(data, dtype=self.dtype)
+            if block.ndim == 0 or block.size != len(block) * prod(shape):
+                raise WrongDimensionError('Batch', 'derivative', block.shape[1:], shape)
+            return block.reshape((len(block), ) + shape)
+        return array([reader(item) for item in data], dtype=self.dtype).reshape((-1, ) + shape)
+
     def read_values(self, values):
         return values
 
@@ -85,6 +151,8 @@ class EnumCoordinatesConverter(DerivativeConverter):
         super().__init__(dim_c=dim_c, keys_c=tuple(range(dim_c)), **kwargs)
 
 class KeyCoordinatesConverter(DerivativeConverter):
+    keyed = True
+
     def __init__(self, dict_c, **kwargs):
         super().__init__(dim_c=len(dict_c.keys()), keys_c=tuple(sorted(dict_c.keys())), **kwargs)
 
@@ -112,6 +180,8 @@ class EnumValuesConverter(DerivativeConverter):
 
 
 class KeyValuesConverter(DerivativeConverter):
+    keyed = True
+
     def __init__(self, dict_v, **kwargs):
         super().__init__(dim_v=len(dict_v.keys()), keys_v=tuple(sorted(dict_v.keys())), **kwargs)
 
@@ -1,10 +1,20 @@
 #!/usr/bin/python
 
-from numpy import array
-from .typecheck import TypeCheck, UnsupportedTypeError, ConverterType
+from numpy import array, float64
+from .typecheck import TypeCheck, UnsupportedTypeError, ConverterType, WrongDimensionError
+
+
+def _validated(block, dim):
+    if block.ndim != 2 or block.shape[1] != dim:
+        raise WrongDimensionError('Batch', 'vector', block.shape[1:], (dim, ))
+    return block
 
 
 class VectorConverter:
+    """
+    Selects the converter matching the container of the first vector. All converters read vectors into arrays of their
+    dtype, which is set by the configuration of the result recycler.
+    """
     @classmethod
     def select(cls, init_data, data_name):
         if TypeCheck.is_scalar(init_data):
@@ -23,14 +33,20 @@ class VectorConverter:
 
 class ScalarConverter:
     type = ConverterType.scalar
+    dtype = float64
 
     def __init__(self, _):
         self.dim = 1
         self.keys = tuple(range(1))
 
-    @classmethod
-    def read(cls, value):
-        return array(value, ndmin=1)
+    def read(self, value):
+        return array(value, dtype=self.dtype, ndmin=1)
+
+    def read_many(self, values):
+        block = array(values, dtype=self.dtype, ndmin=1)
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        return _validated(block, 1)
 
     @classmethod
     def export(cls, value):
@@ -39,20 +55,23 @@ class ScalarConverter:
 
 class EnumerableConverter:
     type = ConverterType.enumerable
+    dtype = float64
 
     def __init__(self, init_data):
         self.dim = len(init_data)
         self.keys = tuple(range(self.dim))
 
+    def read(self, values):
+        return array(values, dtype=self.dtype)
+
+    def read_many(self, values):
+        return _validated(array(values, dtype=self.dtype, ndmin=2), self.dim)
+
 
 class NdArrayConverter(EnumerableConverter):
     def __init__(self, init_data):
         super().__init__(init_data)
 
-    @classmethod
-    def read(cls, values):
-        return array(values)
-
     @classmethod
     def export(cls, values):
         return array(values)
@@ -62,10 +81,6 @@ class ListConverter(EnumerableConverter):
     def __init__(self, init_data):
         super().__init__(init_data)
 
-    @classmethod
-    def read(cls, values):
-        return array(values)
-
     @classmethod
     def export(cls, values):
         return list(values)
@@ -75,10 +90,6 @@ class TupleConverter(EnumerableConverter):
     def __init__(self, init_data):
         super().__init__(init_data)
 
-    @classmethod
-    def read(cls, values):
-        return array(values)
-
     @classmethod
     def export(cls, values):
         return tuple(values)
@@ -86,13 +97,26 @@ class TupleConverter(EnumerableConverter):
 
 class DictConverter:
     type = ConverterType.keys
+    dtype = float64
 
     def __init__(self, init_data):
         self.keys = tuple(sorted(init_data.keys()))
         self.dim = len(self.keys)
 
     def read(self, values):
-        return array([values[key] for key in self.keys])
+        return array([values[key] for key in self.keys], dtype=self.dtype)
+
+    def read_many(self, values):
+        """
+        :param values: Either an array with one row per vector (columns ordered by key), a sequence of dicts or a dict
+         of columns with one entry per key.
+        """
+        if TypeCheck.is_ndarray(values):
+            return _validated(array(values, dtype=self.dtype, ndmin=2), self.dim)
+        if TypeCheck.is_dict(values):
+            return _validated(array([values[key] for key in self.keys], dtype=self.dtype).T, self.dim)
+        return _validated(array([[value[key] for key in self.keys] for value in values], dtype=self.dtype, ndmin=2),
+                          self.dim)
 
     def export(self, values):
         return {key: values[index] for index, key in enumerate(self.keys)}
@@ -1,5 +1,11 @@
 #!/usr/bin/python
 
+from copy import copy
+
+from numpy import empty
+
+from .converter.typecheck import TypeCheck, WrongDimensionError
+
 
 class SampleData:
     """
@@ -24,51 +30,183 @@ class SampleData:
 
 
 class PureData:
-    coordinate_converter = None
-    value_converter = None
+    """
+    Base class for converted data. The converters are taken from the configuration of the owning result recycler, so
+    result recyclers with different data layouts do not interfere.
+    """
+    def __init__(self, config):
+        self.config = config
 
-    @classmethod
-    def prepare(cls, coordinate_converter, value_converter, **_):
-        cls.coordinate_converter = coordinate_converter
-        cls.value_converter = value_converter
+    def _lazy(self, derivatives):
+        """Arrays of derivatives are converted at once, which is as cheap as keeping them."""
+        return self.config.lazy_derivatives and not TypeCheck.is_ndarray(derivatives)
 
 
 class CandidateData(PureData):
+    def __init__(self, coordinates, config):
+        super().__init__(config)
+        self.coordinates = config.coordinate_converter.read(coordinates)
+
+
+class CandidateBatch(PureData):
+    """
+    Candidates of a batch query, their coordinates are stored with one row per candidate.
+    """
+    def __init__(self, candidates, config):
+        super().__init__(config)
+        self.coordinates = config.coordinate_converter.read_many(candidates)
+
+    @classmethod
+    def of(cls, coordinates, config):
+        """
+        :param coordinates: Converted coordinates with one row per candidate.
+        :return: Batch of these candidates.
+        """
+        batch = cls.__new__(cls)
+        PureData.__init__(batch, config)
+        batch.coordinates = coordinates
+        return batch
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def __getitem__(self, position):
+        return ConvertedCandidate(self.coordinates[position])
+
+    def split(self, size):
+        """
+        :param size: Maximum number of candidates per part.
+        :return: List of consecutive parts of this batch.
+        """
+        parts = []
+        for start in range(0, len(self), size):
+            part = copy(self)
+            part.coordinates = self.coordinates[start:start + size]
+            parts.append(part)
+        return parts
+
+    def select(self, mask):
+        """
+        :param mask: Boolean array with one entry per candidate.
+        :return: Batch of the candidates selected by mask.
+        """
+        part = copy(self)
+        part.coordinates = self.coordinates[mask]
+        return part
+
+
+class ConvertedCandidate:
+    """
+    Single candidate of a batch query.
+    """
     def __init__(self, coordinates):
-        self.coordinates = self.coordinate_converter.read(coordinates)
+        self.coordinates = coordinates
 
 
-class ValueData(PureData):
-    def __init__(self, sample_data):
-        self.coordinates = self.coordinate_converter.read(sample_data.coordinates)
-        self.values = self.value_converter.read(sample_data.values)
-        self.current_distance = 0
+class SampleBatch(PureData):
+    """
+    Samples of a bulk ingestion, each field is stored with one row per sample.
+    """
+    def __init__(self, coordinates, values, jacobians, hessians, config):
+        super().__init__(config)
+        self.coordinates = config.coordinate_converter.read_many(coordinates)
+        self.values = config.value_converter.read_many(values)
+        if config.jacobian_converter is not None:
+            jacobians = self._required(jacobians, 'jacobian')
+            self.jacobian = (self._raw(jacobians) if self._lazy(jacobians) else
+                             config.jacobian_converter.read_jac_many(jacobians))
+        if config.hessian_converter is not None:
+            hessians = self._required(hessians, 'hessian')
+            self.hessian = (self._raw(hessians) if self._lazy(hessians) else
+                            config.hessian_converter.read_hess_many(hessians))
+        for field in ('values', 'jacobian', 'hessian'):
+            if hasattr(self, field) and len(getattr(self, field)) != len(self):
+                raise WrongDimensionError('Batch', '{} count'.format(field), len(getattr(self, field)), len(self))
+
+    def __len__(self):
+        return len(self.coordinates)
 
-    def __lt__(self, other):
-        return self.current_distance < other.current_distance
+    @classmethod
+    def _raw(cls, derivatives):
+        return RawDerivatives([cls.row(derivatives, position) for position in range(cls.length(derivatives))])
 
+    @classmethod
+    def _required(cls, data, field):
+        if data is None:
+            raise AttributeError('Batch has no attribute `{}`'.format(field))
+        return data
 
-class JacobianData(ValueData):
-    jacobian_converter = None
+    @classmethod
+    def length(cls, data):
+        """
+        :param data: Field of a bulk ingestion: an array, a sequence or a dict of columns.
+        :return: Number of samples in data.
+        """
+        if TypeCheck.is_dict(data):
+            return len(data[next(iter(data))]) if data else 0
+        return len(data)
+
+    @classmethod
+    def row(cls, data, position):
+        """
+        :return: The field of a single sample in the format of SampleData.
+        """
+        if data is None:
+            return None
+        if TypeCheck.is_dict(data):
+            return {key: cls._plain(column[position]) for key, column in data.items()}
+        return cls._plain(data[position])
 
     @classmethod
-    def prepare(cls, jacobian_converter, **kwargs):
-        super().prepare(**kwargs)
-        cls.jacobian_converter = jacobian_converter
+    def rows(cls, data, start, stop):
+        """
+        :return: The field of the consecutive samples from start to stop.
+        """
+        if data is None:
+            return None
+        if TypeCheck.is_dict(data):
+            return {key: column[start:stop] for key, column in data.items()}
+        return data[start:stop]
 
-    def __init__(self, sample_data):
-        super().__init__(sample_data)
-        self.jacobian = self.jacobian_converter.read_jac(sample_data.jacobian)
+    @classmethod
+    def _plain(cls, value):
+        """Numpy scalars are not recognized as scalars by the converters."""
+        return value.item() if hasattr(value, 'ndim') and not value.ndim else value
+
+
+class ValueData(PureData):
+    def __init__(self, sample_data, config):
+        super().__init__(config)
+        self.coordinates = config.coordinate_converter.read(sample_data.coordinates)
+        self.values = config.value_converter.read(sample_data.values)
+
+
+class JacobianData(ValueData):
+    def __init__(self, sample_data, config):
+        super().__init__(sample_data, config)
+        if self._lazy(sample_data.jacobian):
+            self.jacobian = RawDerivatives([sample_data.jacobian])
+        else:
+            self.jacobian = config.jacobian_converter.read_jac(sample_data.jacobian)
 
 
 class HessianData(JacobianData):
-    hessian_converter = None
+    def __init__(self, sample_data, config):
+        super().__init__(sample_data, config)
+        if self._lazy(sample_data.hessian):
+            self.hessian = RawDerivatives([sample_data.hessian])
+        else:
+            self.hessian = config.hessian_converter.read_hess(sample_data.hessian)
 
-    @classmethod
-    def prepare(cls, hessian_converter, **kwargs):
-        super().prepare(**kwargs)
-        cls.hessian_converter = hessian_converter
 
-    def __init__(self, sample_data):
-        super().__init__(sample_data)
-        self.hessian = self.hessian_converter.read_hess(sample_data.hessian)
+class RawDerivatives:
+    """
+    Jacobians or hessians of samples in their original format. The sample store converts them on first use.
+    """
+    def __init__(self, raws):
+        self.raws = empty(len(raws), dtype=object)
+        for position, raw in enumerate(raws):
+            self.raws[position] = raw
+
+    def __len__(self):
+        return len(self.raws)
@@ -0,0 +1,174 @@
+#!/usr/bin/python
+
+from numpy import argmin, empty, flatnonzero, inf, int64
+
+from .instrumentation import DISABLED
+
+
+class EvictionPolicy:
+    """
+    Base class for eviction policies.
+    A policy chooses the sample to be removed, once the result recycler holds more samples than its capacity. Like an
+    index, it is informed about every sample added to or removed from the sample store. Removing a sample moves the
+    last sample of the store into its row.
+    """
+    instrumentation = DISABLED
+
+    def __init__(self):
+        self.data = None
+        self.metric = None
+
+    def init_policy(self, data, metric):
+        """
+        :param data: The sample store. It might already contain samples.
+        :param metric: The metric with initialized weights.
+        """
+        self.bind(data, metric)
+        self.add_many(range(len(data)))
+
+    def bind(self, data, metric):
+        """
+        Binds the policy to the sample store and the metric without adding the samples. Used for policies restored from
+        a snapshot.
+        """
+        self.data = data
+        self.metric = metric
+
+    def add(self, row):
+        """
+        Is called after a sample has been added to the store.
+        :param row: Row index of the new sample.
+        """
+        pass
+
+    def add_many(self, rows):
+        """
+        Is called after many samples have been added to the store at once.
+        :param rows: Row indices of the new samples in ascending order.
+        """
+        for row in rows:
+            self.add(row)
+
+    def remove(self, row):
+        """
+        Is called before a sample is removed from the store.
+        :param row: Row index of the removed sample.
+        """
+        pass
+
+    def move(self, old_row, new_row):
+        """
+        Is called after the store moved a sample into the row of a removed one.
+        :param old_row: Former row index of the sample.
+        :param new_row: Current row index of the sample.
+        """
+        pass
+
+    def used(self, rows):
+        """
+        Is called with the row indices of the samples a query was answered with.
+        """
+        pass
+
+    def choose(self):
+        """
+        :return: Row index of the sample to be removed next.
+        """
+        raise NotImplementedError('Choice of {} is not implemented'.format(type(self).__name__))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['data'] = None
+        return state
+
+    @classmethod
+    def _grown(cls, rows, size):
+        if size <= len(rows):
+            return rows
+        new_rows = empty((max(2 * len(rows), size), ) + rows.shape[1:], dtype=rows.dtype)
+        new_rows[:len(rows)] = rows
+        return new_rows
+
+
+class OldestFirst(EvictionPolicy):
+    """
+    Removes the sample, which was added first.
+    """
+    def __init__(self):
+        super().__init__()
+        self._clock = 0
+        self._stamps = empty(0, dtype=int64)
+
+    def add(self, row):
+        self._stamps = self._grown(self._stamps, row + 1)
+        self._stamps[row] = self._clock
+        self._clock += 1
+
+    def move(self, old_row, new_row):
+        self._stamps[new_row] = self._stamps[old_row]
+
+    def choose(self):
+        return int(argmin(self._stamps[:len(self.data)]))
+
+
+class LeastRecentlyUsed(OldestFirst):
+    """
+    Removes the sample, which was neither added nor used as pivot (closest sample) of a query for the longest time.
+    """
+    def used(self, rows):
+        self._stamps[rows] = self._clock
+        self._clock += 1
+
+
+class DensityThinning(EvictionPolicy):
+    """
+    Removes a sample of the closest pair of samples under the metric, so the remaining samples stay spread over the
+    explored region. The distance to the closest other sample is kept for every sample; only samples which lose their
+    closest sample are searched again.
+    """
+    def __init__(self):
+        super().__init__()
+        self._distances = empty(0)
+        self._nearest = empty(0, dtype=int64)
+        self._outdated = set()
+
+    def add(self, row):
+        self._distances = self._grown(self._distances, row + 1)
+        self._nearest = self._grown(self._nearest, row + 1)
+        self._distances[row] = inf
+        self._nearest[row] = -1
+        if not row:
+            return
+        distances = self.metric.rank_many(self.data.coordinates[:row], self.data.coordinates[row])
+        closer = flatnonzero(distances < self._distances[:row])
+        self._distances[closer] = distances[closer]
+        self._nearest[closer] = row
+        nearest = argmin(distances)
+        self._distances[row] = distances[nearest]
+        self._nearest[row] = nearest
+
+    def remove(self, row):
+        self._outdated.discard(row)
+        self._outdated.update(flatnonzero(self._nearest[:len(self.data)] == row).tolist())
+
+    def move(self, old_row, new_row):
+        self._distances[new_row] = self._distances[old_row]
+        self._nearest[new_row] = self._nearest[old_row]
+        self._nearest[flatnonzero(self._nearest[:len(self.data)] == old_row)] = new_row
+        if old_row in self._outdated:
+            self._outdated.remove(old_row)
+            self._outdated.add(new_row)
+
+    def choose(self):
+        self._update_outdated()
+        return int(argmin(self._distances[:len(self.data)]))
+
+    def _update_outdated(self):
+        coordinates = self.data.coordinates
+        for row in self._outdated:
+            distances = self.metric.rank_many(coordinates, coordinates[row])
+            distances[row] = inf
+            nearest = argmin(distances)
+            self._distances[row] = distances[nearest]
+            self._nearest[row] = nearest if distances[nearest] < inf else -1
+        self._outdated = set()
@@ -0,0 +1,14 @@
+#!/usr/bin/python
+
+from resultrecycler.index.basic import Index, BruteForce
+from resultrecycler.index.hits import HitIndex
+from resultrecycler.index.kdtree import KDTree, UnsupportedMetricError
+
+
+__all__ = [
+    Index,
+    BruteForce,
+    KDTree,
+    UnsupportedMetricError,
+    HitIndex,
+]
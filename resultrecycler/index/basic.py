@@ -0,0 +1,169 @@
+#!/usr/bin/python
+
+from numpy import asarray, empty
+
+from ..instrumentation import DISABLED
+
+
+class Index:
+    """
+    Base class for neighbor indices.
+    An index answers the neighbor queries of the result recycler. It is bound to the sample store and the metric once
+    the result recycler is configured and is informed about every sample added to the store afterwards.
+    """
+    instrumentation = DISABLED
+
+    def __init__(self):
+        self.data = None
+        self.metric = None
+
+    def init_index(self, data, metric):
+        """
+        :param data: The sample store to be indexed. It might already contain samples.
+        :param metric: The metric with initialized weights.
+        """
+        self.bind(data, metric)
+
+    def bind(self, data, metric):
+        """
+        Binds the index to the sample store and the metric without indexing the samples. Used for indices restored from
+        a snapshot, which already cover all samples of the store.
+        """
+        self.data = data
+        self.metric = metric
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['data'] = None
+        return state
+
+    @property
+    def nbytes(self):
+        """
+        :return: Number of bytes of the arrays, which the index keeps next to the sample store.
+        """
+        return 0
+
+    def add(self, row):
+        """
+        Is called after a sample has been added to the store.
+        :param row: Row index of the new sample.
+        """
+        pass
+
+    def add_many(self, rows):
+        """
+        Is called after many samples have been added to the store at once.
+        :param rows: Row indices of the new samples.
+        """
+        for row in rows:
+            self.add(row)
+
+    def remove(self, row):
+        """
+        Is called before a sample is removed from the store.
+        :param row: Row index of the removed sample.
+        """
+        pass
+
+    def move(self, old_row, new_row):
+        """
+        Is called after the store moved a sample into the row of a removed one.
+        :param old_row: Former row index of the sample.
+        :param new_row: Current row index of the sample.
+        """
+        pass
+
+    def query(self, candidate):
+        """
+        :param candidate: The candidate, whose neighbors are requested.
+        :return: Neighbors of the candidate in the sample store, closest first.
+        """
+        raise NotImplementedError('Query of {} is not implemented'.format(type(self).__name__))
+
+    def query_many(self, candidates):
+        """
+        :param candidates: The candidates of a batch query.
+        :return: List of the neighbors of each candidate in the sample store.
+        """
+        return [self.query(candidate) for candidate in candidates]
+
+
+class BruteForce(Index):
+    """
+    Scans all samples on every query.
+    For ranked metrics, the distances are ranked on the coordinates scaled by the weights of the metric, so queries
+    neither scale the samples again nor take roots. The coordinates of unweighted metrics are ranked in place, so the
+    rows of a loaded, memory-mapped or shared store are not copied. For weighted metrics, the index keeps a scaled copy
+    of the coordinates, which is built on the first query after binding and counted by nbytes.
+    """
+    def __init__(self):
+        super().__init__()
+        self._scaled = None
+
+    def bind(self, data, metric):
+        super().bind(data, metric)
+        self._scaled = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['_scaled'] = None
+        return state
+
+    @property
+    def nbytes(self):
+        return 0 if self._scaled is None else self._scaled.nbytes
+
+    def _scaled_coordinates(self):
+        """
+        :return: The coordinates of all samples scaled by the metric, None if the metric is not ranked.
+        """
+        if not self.metric.is_ranked():
+            return None
+        if not self.metric.is_weighted():
+            return self.data.coordinates
+        if self._scaled is None:
+            scaled = empty((max(len(self.data), 1), self.data.coordinates.shape[1]))
+            scaled[:len(self.data)] = self.metric.scale(self.data.coordinates)
+            self._scaled = scaled
+        return self._scaled[:len(self.data)]
+
+    def add(self, row):
+        self.add_many([row])
+
+    def add_many(self, rows):
+        if self._scaled is None:
+            return
+        rows = asarray(rows, dtype=int)
+        if len(rows) and rows.max() >= len(self._scaled):
+            grown = empty((max(2 * len(self._scaled), rows.max() + 1), self._scaled.shape[1]))
+            grown[:len(self._scaled)] = self._scaled
+            self._scaled = grown
+        self._scaled[rows] = self.metric.scale(self.data.coordinates[rows])
+
+    def move(self, old_row, new_row):
+        if self._scaled is not None:
+            self._scaled[new_row] = self._scaled[old_row]
+
+    def query(self, candidate):
+        with self.instrumentation.stage('distances'):
+            scaled = self._scaled_coordinates()
+            if scaled is None:
+                neighbors = self.metric.calc_distances(candidate, self.data)
+            else:
+                neighbors = self.metric.scaled_distances(scaled, candidate)
+        self.instrumentation.count('samples_scanned', len(self.data))
+        neighbors.instrumentation = self.instrumentation
+        return neighbors
+
+    def query_many(self, candidates):
+        with self.instrumentation.stage('distances'):
+            scaled = self._scaled_coordinates()
+            if scaled is None:
+                neighbors = self.metric.calc_distances_many(candidates, self.data)
+            else:
+                neighbors = self.metric.scaled_distances_many(scaled, candidates)
+        self.instrumentation.count('samples_scanned', len(self.data) * len(candidates))
+        for candidate_neighbors in neighbors:
+            candidate_neighbors.instrumentation = self.instrumentation
+        return neighbors
@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+from threading import Lock
+
+from numpy import asarray, floor, full, int64
+
+from ..instrumentation import DISABLED
+
+
+class HitIndex:
+    """
+    Hash index over the sample coordinates, which finds candidates that were already evaluated.
+    Coordinates are either matched exactly or quantized into cells of width tolerance per coordinate, so that all
+    coordinates within the same cell match. If several samples share a key, the first one added is found.
+    The number of hits and misses of all lookups is counted.
+    The keys are not pickled (e.g. into snapshots or for other processes), all samples are hashed again on the first
+    lookup.
+    """
+    instrumentation = DISABLED
+
+    def __init__(self, tolerance=None):
+        """
+        :param tolerance: Width of the cells the coordinates are quantized to. Coordinates are matched exactly, if
+         nothing else given.
+        """
+        self.tolerance = tolerance
+        self.data = None
+        self.hits = 0
+        self.misses = 0
+        self._rows = {}
+        self._counter_lock = Lock()
+
+    def init_index(self, data, metric):
+        """
+        :param data: The sample store to be indexed. It might already contain samples.
+        :param metric: The metric with initialized weights (unused, coordinates are hashed unweighted).
+        """
+        self.bind(data, metric)
+        self._rows = {}
+        self.add_many(range(len(data)))
+
+    def bind(self, data, metric):
+        """
+        Binds the index to the sample store without indexing the samples again.
+        """
+        self.data = data
+
+    def add(self, row):
+        if self._rows is not None:
+            self._rows.setdefault(self._key(self.data.coordinates[row]), []).append(row)
+
+    def add_many(self, rows):
+        if self._rows is None:
+            return
+        for row, key in zip(rows, self._keys(self.data.coordinates[asarray(rows, dtype=int)])):
+            self._rows.setdefault(key, []).append(row)
+
+    def remove(self, row):
+        key = self._key(self.data.coordinates[row])
+        rows = self._indexed()[key]
+        rows.remove(row)
+        if not rows:
+            del self._rows[key]
+
+    def move(self, old_row, new_row):
+        rows = self._indexed()[self._key(self.data.coordinates[new_row])]
+        rows[rows.index(old_row)] = new_row
+
+    def find(self, candidate):
+        """
+        :param candidate: The converted candidate.
+        :return: Row index of the sample matching the candidate or None.
+        """
+        rows = self._indexed().get(self._key(candidate.coordinates))
+        self._count(0 if rows is None else 1, 1)
+        return None if rows is None else rows[0]
+
+    def find_many(self, candidates):
+        """
+        :param candidates: The candidates of a batch query.
+        :return: Array of the row indices of the samples matching the candidates, -1 for candidates without match.
+        """
+        indexed = self._indexed()
+        rows = full(len(candidates), -1)
+        for position, key in enumerate(self._keys(candidates.coordinates)):
+            rows[position] = indexed.get(key, [-1])[0]
+        self._count(int((rows >= 0).sum()), len(rows))
+        return rows
+
+    def _indexed(self):
+        """
+        :return: Dict of the rows of the samples by their key, which is rebuilt after unpickling.
+        """
+        indexed = self._rows
+        if indexed is None:
+            indexed = {}
+            for row, key in enumerate(self._keys(self.data.coordinates)):
+                indexed.setdefault(key, []).append(row)
+            self._rows = indexed
+        return indexed
+
+    def reset_counters(self):
+        with self._counter_lock:
+            self.hits = 0
+            self.misses = 0
+
+    def _count(self, hits, lookups):
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += lookups - hits
+
+    def _key(self, coordinates):
+        return self._keys(coordinates[None, :])[0]
+
+    def _keys(self, coordinates):
+        # Adding zero turns -0.0 into 0.0, so both share their key
+        coordinates = asarray(coordinates, dtype=float) + 0.0
+        if self.tolerance is not None:
+            coordinates = floor(coordinates / self.tolerance).astype(int64)
+        return [row.tobytes() for row in coordinates]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['data'] = None
+        state['_rows'] = None
+        del state['_counter_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._counter_lock = Lock()
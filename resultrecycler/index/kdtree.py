@@ -0,0 +1,259 @@
+#!/usr/bin/python
+
+from heapq import heappop, heappush
+from itertools import count
+from threading import Lock
+
+from numpy import arange, argmax, array, maximum, minimum, partition
+
+from .basic import Index
+from ..metrics import MaxMetric, PMetric
+
+
+class UnsupportedMetricError(AttributeError):
+    def __init__(self, index, metric):
+        super().__init__('Metric {} is not supported by {}'.format(type(metric).__name__, type(index).__name__))
+
+
+class KDTree(Index):
+    """
+    Kd-tree over the sample coordinates.
+    Samples are inserted incrementally into buckets of at most leaf_size samples. Full buckets are split along the
+    coordinate with the largest weighted spread, subtrees which became unbalanced by the insertions are rebuilt.
+    Queries visit the buckets in the order of their lower distance bound, so neighbors are returned in exactly the
+    order of a brute force scan (equal distances ordered by row index).
+    Samples added in batches (add_data_many, samples of other processes) are indexed on the next query, removal or
+    addition of a single sample. Unless they are outnumbered by the indexed samples, the whole tree is rebuilt by
+    median splits then, so loading many chunks builds the tree once.
+    Removed samples only leave their bucket, the bounds of the buckets are kept until the subtree is rebuilt.
+    The nodes are not pickled (e.g. into snapshots or for other processes), the tree is rebuilt on its first use.
+    Supports the metrics of the PMetric family and MaxMetric including their weights.
+    The buckets are visited in Python, so the tree only pays off for many samples in few dimensions (e.g. 10^5 uniformly
+    spread samples in up to 5 dimensions). With more dimensions, the lower bounds hardly exclude buckets and BruteForce
+    answers queries faster.
+    """
+    balance = 0.75
+
+    def __init__(self, leaf_size=32):
+        """
+        :param leaf_size: Maximum number of samples in a bucket, unless they share the same coordinates.
+        """
+        super().__init__()
+        self.leaf_size = leaf_size
+        self._root = None
+        self._pending = []
+        self._stale = False
+        self._lock = Lock()
+
+    def init_index(self, data, metric):
+        if not isinstance(metric, (PMetric, MaxMetric)):
+            raise UnsupportedMetricError(self, metric)
+        super().init_index(data, metric)
+        self._root = self._build(arange(len(data))) if len(data) else None
+        self._pending = []
+        self._stale = False
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state['_root'] = None
+        state['_pending'] = []
+        state['_stale'] = True
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = Lock()
+
+    def add(self, row):
+        self._flush()
+        if not self._stale:
+            self._insert(row)
+
+    def _insert(self, row):
+        point = self.data.coordinates[row]
+        if self._root is None:
+            self._root = _Node(point.copy(), point.copy(), 1, rows=[row])
+            return
+        path = [self._root]
+        while path[-1].rows is None:
+            node = path[-1]
+            node.include(point)
+            path.append(node.left if point[node.dim] < node.split else node.right)
+        leaf = path[-1]
+        leaf.include(point)
+        leaf.rows.append(row)
+        for depth, node in enumerate(path):
+            if self._is_unbalanced(node) or (node is leaf and self._is_overfull(leaf)):
+                self._replace(path[depth - 1] if depth else None, node, self._build(array(self._rows(node))))
+                return
+
+    def add_many(self, rows):
+        with self._lock:
+            if not self._stale:
+                self._pending.extend(rows)
+
+    def _flush(self):
+        """
+        Indexes the samples added in batches or all samples of a restored tree. Queries of parallel threads wait for
+        the first one doing it.
+        """
+        if not self._pending and not self._stale:
+            return
+        with self._lock:
+            rows = self._pending
+            if not rows and not self._stale:
+                return
+            with self.instrumentation.stage('tree_build'):
+                if not self._stale and len(rows) < len(self.data) - len(rows):
+                    for row in rows:
+                        self._insert(row)
+                else:
+                    self._root = self._build(arange(len(self.data))) if len(self.data) else None
+            self._pending = []
+            self._stale = False
+
+    def remove(self, row):
+        self._flush()
+        point = self.data.coordinates[row]
+        node = self._root
+        node.count -= 1
+        while node.rows is None:
+            node = node.left if point[node.dim] < node.split else node.right
+            node.count -= 1
+        node.rows.remove(row)
+
+    def move(self, old_row, new_row):
+        self._flush()
+        rows = self._leaf(self.data.coordinates[new_row]).rows
+        rows[rows.index(old_row)] = new_row
+
+    def _leaf(self, point):
+        node = self._root
+        while node.rows is None:
+            node = node.left if point[node.dim] < node.split else node.right
+        return node
+
+    def _is_unbalanced(self, node):
+        return (node.rows is None and node.count > 2 * self.leaf_size and
+                max(node.left.count, node.right.count) > self.balance * node.count)
+
+    def _is_overfull(self, leaf):
+        return len(leaf.rows) > self.leaf_size and (leaf.upper > leaf.lower).any()
+
+    def _replace(self, parent, node, new_node):
+        if parent is None:
+            self._root = new_node
+        elif parent.left is node:
+            parent.left = new_node
+        else:
+            parent.right = new_node
+
+    @classmethod
+    def _rows(cls, node):
+        if node.rows is not None:
+            return node.rows
+        return cls._rows(node.left) + cls._rows(node.right)
+
+    def _build(self, rows):
+        coordinates = self.data.coordinates[rows]
+        lower = coordinates.min(axis=0)
+        upper = coordinates.max(axis=0)
+        spread = (upper - lower) * self.metric.weights
+        dim = argmax(spread)
+        if len(rows) <= self.leaf_size or spread[dim] <= 0:
+            return _Node(lower, upper, len(rows), rows=rows.tolist())
+        values = coordinates[:, dim]
+        split = partition(values, len(values) // 2)[len(values) // 2]
+        left = values < split
+        if not left.any():
+            split = values[values > split].min()
+            left = values < split
+        return _Node(lower, upper, len(rows), dim=dim, split=split,
+                     left=self._build(rows[left]), right=self._build(rows[~left]))
+
+    def query(self, candidate):
+        return TreeNeighbors(self, candidate.coordinates)
+
+    def nearest(self, point):
+        """
+        Generates the row indices and ranks (see Metric.rank_many) of all samples ordered by their distance to point.
+        """
+        self._flush()
+        if self._root is None:
+            return
+        coordinates = self.data.coordinates
+        tiebreak = count()
+        heap = [(self._bounds([self._root], point)[0], 0, next(tiebreak), self._root)]
+        while heap:
+            distance, _, key, node = heappop(heap)
+            if node is None:
+                yield key, distance
+            elif node.rows is not None:
+                self.instrumentation.count('samples_scanned', len(node.rows))
+                for row, row_distance in zip(node.rows, self.metric.rank_many(coordinates[node.rows], point).tolist()):
+                    heappush(heap, (row_distance, 1, row, None))
+            else:
+                children = [node.left, node.right]
+                for child, bound in zip(children, self._bounds(children, point).tolist()):
+                    heappush(heap, (bound, 0, next(tiebreak), child))
+
+    def _bounds(self, nodes, point):
+        closest = array([minimum(maximum(point, node.lower), node.upper) for node in nodes])
+        return self.metric.rank_many(closest, point)
+
+
+class _Node:
+    def __init__(self, lower, upper, size, rows=None, dim=None, split=None, left=None, right=None):
+        self.lower = lower
+        self.upper = upper
+        self.count = size
+        self.rows = rows
+        self.dim = dim
+        self.split = split
+        self.left = left
+        self.right = right
+
+    def include(self, point):
+        self.lower = minimum(self.lower, point)
+        self.upper = maximum(self.upper, point)
+        self.count += 1
+
+
+class TreeNeighbors:
+    """
+    Neighbors of a candidate found by a tree index. Further neighbors are only searched, when they are requested.
+    """
+    def __init__(self, index, point):
+        self._index = index
+        self._point = point
+        self._nearest = index.nearest(point)
+        self._order = []
+
+    def __len__(self):
+        return len(self._index.data)
+
+    def __getitem__(self, position):
+        self._fetch(len(self) if position < 0 else position + 1)
+        return self._order[position]
+
+    def __iter__(self):
+        position = 0
+        while self._fetch(position + 1):
+            yield self._order[position]
+            position += 1
+
+    def first(self, count):
+        self._fetch(count)
+        return array(self._order[:count], dtype=int)
+
+    def distance(self, indices):
+        return self._index.metric.calc_many(self._index.data.coordinates[indices], self._point)
+
+    def _fetch(self, count):
+        while len(self._order) < count:
+            row, _ = next(self._nearest, (None, None))
+            if row is None:
+                return False
+            self._order.append(row)
+        return True
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+
+from threading import Lock
+from time import perf_counter
+
+
+class Instrumentation:
+    """
+    Collects the time spent in the stages of the result recycler and counts its events.
+
+    Stages (may be nested, the time of a nested stage is included in the outer one):
+    conversion, hits, query, distances, sort, approach, affine_hull_search, affine_hull_solve, delaunay_build,
+    delaunay_insert, delaunay_location, nearest_neighbor, limit, add, eviction
+    Counters:
+    queries, samples_scanned, exact_hits, affine_independence_tests, linear_solves, delaunay_walk_steps,
+    delaunay_failures, nearest_neighbor_fallbacks, limit_clamps, limit_fixed_values, samples_added, samples_evicted
+
+    Hooks are called with (kind, name, value) for every finished stage (kind 'stage', value in seconds) and every
+    counted event (kind 'counter', value is the amount), e.g. to forward them to another metrics system.
+    Instrumentation is not part of snapshots, a loaded result recycler is not instrumented.
+    """
+    enabled = True
+
+    def __init__(self, hooks=None):
+        """
+        :param hooks: List of callables, which are called with (kind, name, value) for each event.
+        """
+        self.hooks = [] if hooks is None else list(hooks)
+        self.timings = {}
+        self.counters = {}
+        self._lock = Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def stage(self, name):
+        """
+        :return: Context manager measuring the time spent in the stage name.
+        """
+        return _Stage(self, name)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        for hook in self.hooks:
+            hook('counter', name, amount)
+
+    def record(self, name, seconds):
+        with self._lock:
+            calls, total = self.timings.get(name, (0, 0.0))
+            self.timings[name] = (calls + 1, total + seconds)
+        for hook in self.hooks:
+            hook('stage', name, seconds)
+
+    def report(self):
+        """
+        :return: Dict of the number of calls and the total seconds of each stage and the value of each counter.
+        """
+        with self._lock:
+            return {'stages': {name: {'calls': calls, 'seconds': total}
+                               for name, (calls, total) in self.timings.items()},
+                    'counters': dict(self.counters)}
+
+    def reset(self):
+        with self._lock:
+            self.timings = {}
+            self.counters = {}
+
+    def __reduce__(self):
+        return NoInstrumentation, ()
+
+
+class NoInstrumentation:
+    """
+    Disabled instrumentation, which ignores all events.
+    """
+    enabled = False
+
+    def stage(self, name):
+        return _NO_STAGE
+
+    def count(self, name, amount=1):
+        pass
+
+    def record(self, name, seconds):
+        pass
+
+
+class _Stage:
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        self._instrumentation.record(self._name, perf_counter() - self._start)
+
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+_NO_STAGE = _NoStage()
+DISABLED = NoInstrumentation()
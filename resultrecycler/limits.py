@@ -2,9 +2,10 @@
 
 import sys
 
-from numpy import array, ones
+from numpy import array, clip, count_nonzero, full, nan, ones, where
 
 from .converter.typecheck import TypeCheck
+from .instrumentation import DISABLED
 
 
 class DefaultValues:
@@ -25,11 +26,18 @@ class RawLimit:
 
 
 class Limit:
+    """
+    Bounds and fixed values of the results. The fixed values of all value keys are precompiled into a matrix with one
+    row per value key, padded with NaN, so a whole batch of results is limited by a few array operations.
+    """
+    instrumentation = DISABLED
+
     def __init__(self, raw_limit):
         self.value_keys = self._init_value_keys(raw_limit)
         self._init_bounds(raw_limit)
         self.fixed_values = self._init_fixed_values(raw_limit)
         self._adjust_bounds()
+        self._fixed_table = self._init_fixed_table(self.fixed_values)
 
     def _init_value_keys(self, raw_limit):
         if raw_limit.value_keys is not None:
@@ -87,6 +95,13 @@ class Limit:
                 ret[index].extend(raw_limit.individual_fixed_values[key])
         return ret
 
+    @classmethod
+    def _init_fixed_table(cls, fixed_values):
+        table = full((len(fixed_values), max([len(values) for values in fixed_values] + [0])), nan)
+        for index, values in enumerate(fixed_values):
+            table[index, :len(values)] = values
+        return table
+
     def _adjust_bounds(self):
         if self.default is None and self.minimum is not None and self.maximum is not None:
             self.default = self.minimum + (self.maximum - self.minimum) / 2.0
@@ -98,14 +113,33 @@ class Limit:
             self.maximum = ones(len(self.value_keys)) * DefaultValues.MAXIMUM
 
     def choose_values(self, approach_values, neighbor_values):
+        """
+        Takes the values of the closest sample, where they are fixed values, and clamps the result to the bounds.
+        :param approach_values: Values guessed by the approach. Overwritten by the result.
+        :param neighbor_values: Values of the closest sample.
+        :return: The limited values.
+        """
         if approach_values is None:
             return neighbor_values
-        ret = approach_values
-        for key in self.value_keys:
-            if neighbor_values is not None and neighbor_values[key] in self.fixed_values[key]:
-                ret[key] = neighbor_values[key]
-            if approach_values[key] < self.minimum[key]:
-                ret[key] = self.minimum[key]
-            if approach_values[key] > self.maximum[key]:
-                ret[key] = self.maximum[key]
-        return ret
+        return self.choose_values_many(approach_values, neighbor_values)
+
+    def choose_values_many(self, approach_values, neighbor_values):
+        """
+        Batched form of choose_values.
+        :param approach_values: Values guessed by the approach with one row per result. Overwritten by the results.
+        :param neighbor_values: Values of the closest samples with one row per result.
+        :return: The limited values.
+        """
+        values = approach_values
+        if neighbor_values is not None and self._fixed_table.shape[1]:
+            fixed_table = self._fixed_table
+            if fixed_table.dtype != neighbor_values.dtype:
+                # Values stored in a smaller type (see DtypePolicy) only match the fixed values rounded to this type.
+                fixed_table = fixed_table.astype(neighbor_values.dtype)
+            fixed = (neighbor_values[..., None] == fixed_table).any(axis=-1)
+            values = where(fixed, neighbor_values, approach_values)
+            self.instrumentation.count('limit_fixed_values', count_nonzero(fixed))
+        if self.instrumentation.enabled:
+            self.instrumentation.count('limit_clamps', count_nonzero((values < self.minimum) | (values > self.maximum)))
+        approach_values[...] = clip(values, self.minimum, self.maximum)
+        return approach_values
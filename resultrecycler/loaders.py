@@ -0,0 +1,280 @@
+#!/usr/bin/python
+
+import csv
+import json
+from itertools import islice
+from zipfile import ZipFile
+
+from numpy import array, column_stack, empty, float64, frombuffer, load, prod, stack
+from numpy.lib import format as npy_format
+
+
+class MissingColumnError(KeyError):
+    def __init__(self, column, source, *args, **kwargs):
+        message = 'Column `{}` not found in {}'.format(column, source)
+        super().__init__(message, *args, **kwargs)
+
+
+class Columns:
+    """
+    Maps the columns of a result archive to the fields of the samples.
+    Coordinates and values are given as a single column name (scalar layout), a sequence of column names (list layout,
+    read like ListConverter) or a dict of keys and column names (dict layout, read like DictConverter).
+    Jacobians and hessians are given as patterns of column names, which are formatted with the keys of a value and of
+    one (`{value}`, `{coordinate}`) or two coordinates (`{value}`, `{coordinate1}`, `{coordinate2}`). The keys of the
+    list and scalar layouts are the column names themselves. Hessian entries missing in the archive are taken from
+    their mirrored entry, so archives with only one triangle can be read. A pattern naming a column of the archive
+    without placeholders is used as a block with one derivative per row.
+    """
+    def __init__(self, coordinates, values, jacobians=None, hessians=None):
+        """
+        :param coordinates: Column name, sequence of column names or dict of keys and column names of the coordinates.
+        :param values: Column name, sequence of column names or dict of keys and column names of the values.
+        :param jacobians: Pattern of the column names of the jacobian entries.
+        :param hessians: Pattern of the column names of the hessian entries.
+        """
+        self.coordinates = coordinates
+        self.values = values
+        self.jacobians = jacobians
+        self.hessians = hessians
+        self._jacobian_names = None
+        self._hessian_names = None
+
+    def names(self, available, source):
+        """
+        Resolves the columns of the derivatives.
+        :param available: Column names of the archive.
+        :param source: Description of the archive for error messages.
+        :return: Names of all columns needed to build the samples.
+        """
+        self._jacobian_names = self._resolve(self.jacobians, available, self._jacobian_name, 1)
+        self._hessian_names = self._resolve(self.hessians, available, self._hessian_name, 2)
+        names = []
+        for field in (self.coordinates, self.values, self._jacobian_names, self._hessian_names):
+            names.extend(self._flat(field))
+        for name in names:
+            if name not in available:
+                raise MissingColumnError(name, source)
+        return list(dict.fromkeys(names))
+
+    def arrange(self, table):
+        """
+        :param table: Dict of column names and arrays with one row per sample.
+        :return: Coordinates, values, jacobians and hessians of the samples in the formats of add_data_many.
+        """
+        return (self._field(self.coordinates, table), self._field(self.values, table),
+                self._derivatives(self._jacobian_names, table), self._derivatives(self._hessian_names, table))
+
+    @classmethod
+    def _keys(cls, field):
+        """
+        :return: Keys of the field in the order of its converter.
+        """
+        if isinstance(field, str):
+            return field
+        if isinstance(field, dict):
+            return sorted(field)
+        return list(field)
+
+    def _resolve(self, pattern, available, name, coordinate_axes):
+        """
+        :return: The pattern, if it names a block, otherwise an object array with the column name of each entry of a
+         derivative. Its axes of scalar values or coordinates are dropped like in the formats of add_data.
+        """
+        if pattern is None or pattern in available:
+            return pattern
+        keys_v = self._keys(self.values)
+        keys_c = self._keys(self.coordinates)
+        names = empty((() if isinstance(keys_v, str) else (len(keys_v), )) +
+                      (() if isinstance(keys_c, str) else (len(keys_c), )) * coordinate_axes, dtype=object)
+        for position in range(names.size):
+            names.flat[position] = name(pattern, available, keys_v, keys_c, names.shape, position)
+        return names
+
+    @classmethod
+    def _unravel(cls, position, shape):
+        index = []
+        for dim in reversed(shape):
+            position, rest = divmod(position, dim)
+            index.insert(0, rest)
+        return index
+
+    @classmethod
+    def _pick(cls, keys, index):
+        if isinstance(keys, str):
+            return keys, index
+        return keys[index[0]], index[1:]
+
+    @classmethod
+    def _jacobian_name(cls, pattern, available, keys_v, keys_c, shape, position):
+        index = cls._unravel(position, shape)
+        key_v, index = cls._pick(keys_v, index)
+        key_c, _ = cls._pick(keys_c, index)
+        return pattern.format(value=key_v, coordinate=key_c)
+
+    @classmethod
+    def _hessian_name(cls, pattern, available, keys_v, keys_c, shape, position):
+        index = cls._unravel(position, shape)
+        key_v, index = cls._pick(keys_v, index)
+        key_1, index = cls._pick(keys_c, index)
+        key_2, _ = cls._pick(keys_c, index)
+        name = pattern.format(value=key_v, coordinate1=key_1, coordinate2=key_2)
+        mirrored = pattern.format(value=key_v, coordinate1=key_2, coordinate2=key_1)
+        return mirrored if name not in available and mirrored in available else name
+
+    @classmethod
+    def _flat(cls, field):
+        if field is None:
+            return []
+        if isinstance(field, str):
+            return [field]
+        if isinstance(field, dict):
+            return list(field.values())
+        if hasattr(field, 'flat'):
+            return list(field.flat)
+        return list(field)
+
+    @classmethod
+    def _field(cls, field, table):
+        if isinstance(field, str):
+            return table[field]
+        if isinstance(field, dict):
+            return {key: table[column] for key, column in field.items()}
+        return column_stack([table[column] for column in field])
+
+    @classmethod
+    def _derivatives(cls, names, table):
+        if names is None:
+            return None
+        if isinstance(names, str):
+            return table[names]
+        block = stack([table[name] for name in names.flat], axis=-1)
+        return block.reshape((len(block), ) + names.shape)
+
+
+class ResultReader:
+    """
+    Base class of the streaming loaders of result archives. Iterating over a reader yields the samples of the archive
+    in chunks of at most chunk_size samples, each as coordinates, values, jacobians and hessians in the formats of
+    add_data_many. Only the current chunk is held in memory.
+    """
+    chunk_size = 2 ** 12
+
+    def __init__(self, path, columns, chunk_size=None):
+        """
+        :param path: Path of the archive.
+        :param columns: Object of Columns mapping the columns of the archive to the fields of the samples.
+        :param chunk_size: Maximum number of samples per chunk.
+        """
+        self.path = path
+        self.columns = columns
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for table in self._tables():
+            yield self.columns.arrange(table)
+
+    def _tables(self):
+        """
+        Generates the chunks of the archive as dicts of column names and arrays with one row per sample.
+        """
+        raise NotImplementedError('Reading of {} is not implemented'.format(type(self).__name__))
+
+    def _table(self, names, rows):
+        block = array(rows, dtype=float64, ndmin=2)
+        return {name: block[:, position] for position, name in enumerate(names)}
+
+
+class CsvReader(ResultReader):
+    """
+    Reads a CSV file with a header row naming its columns.
+    """
+    def __init__(self, path, columns, chunk_size=None, delimiter=','):
+        super().__init__(path, columns, chunk_size)
+        self.delimiter = delimiter
+
+    def _tables(self):
+        with open(self.path, newline='') as file:
+            rows = csv.reader(file, delimiter=self.delimiter)
+            header = [name.strip() for name in next(rows)]
+            names = self.columns.names(header, self.path)
+            positions = [header.index(name) for name in names]
+            while True:
+                chunk = [[row[position] for position in positions] for row in islice(rows, self.chunk_size) if row]
+                if not chunk:
+                    return
+                yield self._table(names, chunk)
+
+
+class JsonlReader(ResultReader):
+    """
+    Reads a file with one JSON object per line, whose entries are the columns. An entry might be a (nested) list, which
+    is read as a block, e.g. the jacobian of the sample.
+    """
+    def _tables(self):
+        with open(self.path) as file:
+            records = (json.loads(line) for line in file if line.strip())
+            first = next(records, None)
+            if first is None:
+                return
+            names = self.columns.names(first, self.path)
+            chunk = [[first[name] for name in names]]
+            while True:
+                chunk.extend([record[name] for name in names]
+                             for record in islice(records, self.chunk_size - len(chunk)))
+                if not chunk:
+                    return
+                yield self._table(names, chunk)
+                chunk = []
+
+    def _table(self, names, rows):
+        """
+        Builds each column on its own, as entries might be lists holding a block like all coordinates of a sample.
+        """
+        return {name: array([row[position] for row in rows], dtype=float64) for position, name in enumerate(names)}
+
+
+class NpzReader(ResultReader):
+    """
+    Reads an archive written by numpy.savez or numpy.savez_compressed. Each array is a column with one entry per sample
+    or a block with one row per sample, e.g. all coordinates. The arrays are read row by row from the archive instead
+    of being loaded at once; arrays stored in fortran order are the exception.
+    """
+    def _tables(self):
+        with ZipFile(self.path) as archive:
+            available = [name[:-len('.npy')] for name in archive.namelist() if name.endswith('.npy')]
+            names = self.columns.names(available, self.path)
+            members = [archive.open(name + '.npy') for name in names]
+            try:
+                readers = [self._rows(member) for member in members]
+                while True:
+                    chunk = [next(reader) for reader in readers]
+                    if not len(chunk[0]):
+                        return
+                    yield dict(zip(names, chunk))
+            finally:
+                for member in members:
+                    member.close()
+
+    def _rows(self, member):
+        """
+        Generates chunks of rows of an array in the archive and empty chunks after its end.
+        """
+        version = npy_format.read_magic(member)
+        if version == (1, 0):
+            shape, fortran_order, dtype = npy_format.read_array_header_1_0(member)
+        else:
+            shape, fortran_order, dtype = npy_format.read_array_header_2_0(member)
+        if fortran_order or not shape:
+            member.seek(0)
+            block = load(member)
+            for start in range(0, len(block) if block.ndim else 0, self.chunk_size):
+                yield block[start:start + self.chunk_size]
+        else:
+            row_size = int(prod(shape[1:])) * dtype.itemsize
+            for start in range(0, shape[0], self.chunk_size):
+                count = min(self.chunk_size, shape[0] - start)
+                yield frombuffer(member.read(count * row_size), dtype=dtype).reshape((count, ) + shape[1:])
+        while True:
+            yield empty((0, ) + tuple(shape[1:]))
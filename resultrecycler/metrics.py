@@ -1,10 +1,9 @@
 #!/usr/bin/python
 
-from numpy import array
-from numpy.core.umath import cbrt
-from numpy.ma import sqrt
+from numpy import add, arange, array, asarray, cbrt, empty, float64, isnan, maximum, multiply, sqrt
 
 from .converter.typecheck import TypeCheck
+from .neighbors import Neighbors
 
 
 class Metric:
@@ -14,8 +13,14 @@ class Metric:
     or different weights for each coordinate.
     Includes also the implementation for distance calculation of this metric.
     The only thing, which needs to be overridden is the calc(self, a, b) method.
+    Overriding _calc_many(self, matrix, point) additionally allows to compute the distances to all samples at once.
+    Overriding rank_scaled(self, scaled_matrix, scaled_point) and root(self, ranks) as well allows to rank the samples
+    by a cheaper measure, which is monotone in the distance (e.g. the sum of the p-th powers of a p-norm), on
+    coordinates scaled by the weights in advance. The root is only taken for the distances an approach asks for.
     """
 
+    chunk_elements = 2 ** 16
+
     # TODO Weigths and Bounds dependent on config
     def __init__(self, weights_or_bounds=None):
         self._raw_weights = weights_or_bounds
@@ -26,21 +31,167 @@ class Metric:
             self.weights = 1
         else:
             if TypeCheck.is_scalar(self._raw_weights[config.coordinate_converter.keys[0]]):
-                self.weights = config.coordinate_converter.read(self._raw_weights)
+                self.weights = array(config.coordinate_converter.read(self._raw_weights), dtype=float64)
             else:
                 self.weights = array([1.0 / (self._raw_weights[key][1] - self._raw_weights[key][0])
                                       for key in config.coordinate_converter.keys])
             self.weights /= min(self.weights)
 
-    def calc_distances(self, new_sample, results):
-        for res in results:
-            res.current_distance = self.calc(res.coordinates, new_sample.coordinates)
-        results.sort()
+    def calc_distances(self, new_sample, data):
+        """
+        :param new_sample: The candidate, whose distance to all samples is evaluated.
+        :param data: The sample store.
+        :return: Neighbors of the candidate in the sample store.
+        """
+        if self.is_ranked():
+            return self.scaled_distances(self.scale(data.coordinates), new_sample)
+        return Neighbors(self.calc_many(data.coordinates, new_sample.coordinates))
+
+    def calc_distances_many(self, new_samples, data):
+        """
+        :param new_samples: The candidates of a batch query.
+        :param data: The sample store.
+        :return: List of the neighbors of each candidate in the sample store.
+        """
+        if self.is_ranked():
+            return self.scaled_distances_many(self.scale(data.coordinates), new_samples)
+        return self._neighbors_many(self.calc_pairwise(data.coordinates, new_samples.coordinates))
+
+    def scaled_distances(self, scaled_coordinates, new_sample):
+        """
+        Counterpart of calc_distances for ranked metrics, which takes the coordinates of the samples already scaled.
+        :param scaled_coordinates: Coordinates of all samples scaled by scale.
+        :param new_sample: The candidate, whose distance to all samples is evaluated.
+        :return: Neighbors of the candidate, ranked without taking the root.
+        """
+        return Neighbors(self.rank_scaled(scaled_coordinates, self.scale(new_sample.coordinates)), root=self.root)
+
+    def scaled_distances_many(self, scaled_coordinates, new_samples):
+        """
+        Counterpart of calc_distances_many for ranked metrics, which takes the coordinates of the samples already
+        scaled.
+        """
+        ranks = self._pairwise(self.rank_scaled, scaled_coordinates, self.scale(new_samples.coordinates))
+        return self._neighbors_many(ranks, self.root)
+
+    @classmethod
+    def _neighbors_many(cls, distances, root=None):
+        if not distances.size:
+            return [Neighbors(row, root=root) for row in distances]
+        nearest = distances.argmin(axis=1)
+        known = ~isnan(distances[arange(len(distances)), nearest])
+        return [Neighbors(row, nearest=row_nearest if row_known else None, root=root)
+                for row, row_nearest, row_known in zip(distances, nearest, known)]
+
+    def scale(self, coordinates):
+        """
+        :return: The coordinates multiplied by the weights in double precision.
+        """
+        return multiply(coordinates, self.weights, dtype=float64)
+
+    def is_weighted(self):
+        """
+        :return: Whether scale changes the coordinates, so ranking the unscaled coordinates would differ.
+        """
+        return type(self).scale is not Metric.scale or not (asarray(self.weights) == 1).all()
+
+    def rank_scaled(self, scaled_matrix, scaled_point):
+        """
+        Vectorized measure of the distance between each row of scaled_matrix and scaled_point, which orders the rows
+        like calc does and is turned into the distance by root.
+        """
+        raise NotImplementedError('Ranking of metric is not available')
+
+    def root(self, ranks):
+        """
+        :return: The distances belonging to the ranks of rank_scaled.
+        """
+        return ranks
+
+    def rank_many(self, matrix, point):
+        """
+        Ranks the rows of matrix by their distance to point. The ranks are the distances, if the metric is not ranked.
+        """
+        if self.is_ranked():
+            return self.rank_scaled(self.scale(matrix), self.scale(point))
+        return self.calc_many(matrix, point)
+
+    def is_ranked(self):
+        """
+        :return: Whether the metric ranks by rank_scaled. It has to be provided by the class, which provides the
+         vectorized calculation, so a metric overriding calc or _calc_many only is not ranked by its base class.
+        """
+        if not self._is_vectorized():
+            return False
+        mro = type(self).__mro__
+        ranking = next(cls for cls in mro if 'rank_scaled' in cls.__dict__)
+        calculation = next(cls for cls in mro if '_calc_many' in cls.__dict__)
+        return ranking is not Metric and mro.index(ranking) <= mro.index(calculation)
 
     def calc(self, a, b):
         """This method contains the actual distance calculation between a and b"""
         raise NotImplementedError('Calculation of metric needs to be specified')
 
+    def calc_many(self, matrix, point):
+        """
+        Calculates the distance between each row of matrix and point.
+        Falls back to calc for each row, if the metric does not provide a vectorized implementation matching its calc.
+        :param matrix: Coordinates with one row per sample.
+        :param point: Coordinates of a single point.
+        :return: Array of distances, one per row.
+        """
+        if self._is_vectorized():
+            return self._calc_many(matrix, point)
+        return array([self.calc(coordinates, point) for coordinates in matrix], dtype=float)
+
+    def calc_pairwise(self, matrix, points):
+        """
+        Calculates the distance between each row of matrix and each row of points.
+        The distances are computed by broadcasting in chunks of points, which keep the intermediate arrays smaller than
+        chunk_elements.
+        :param matrix: Coordinates with one row per sample.
+        :param points: Coordinates with one row per point.
+        :return: Array of distances with one row per point and one column per sample.
+        """
+        if not self._is_vectorized():
+            return array([self.calc_many(matrix, point) for point in points], dtype=float).reshape(len(points),
+                                                                                                  len(matrix))
+        return self._pairwise(self._calc_many, matrix, points)
+
+    def _pairwise(self, calculation, matrix, points):
+        chunk = max(1, self.chunk_elements // max(matrix.size, 1))
+        distances = empty((len(points), len(matrix)))
+        for start in range(0, len(points), chunk):
+            distances[start:start + chunk] = calculation(matrix, points[start:start + chunk, None, :])
+        return distances
+
+    def _is_vectorized(self):
+        for cls in type(self).__mro__:
+            if '_calc_many' in cls.__dict__:
+                return cls is not Metric
+            if 'calc' in cls.__dict__:
+                return False
+        return False
+
+    def _calc_many(self, matrix, point):
+        """Vectorized counterpart of calc: broadcasts point against the rows of matrix"""
+        raise NotImplementedError('Vectorized calculation of metric is not available')
+
+    def _rooted_ranks(self, matrix, point):
+        return self.root(self.rank_scaled(self.scale(matrix), self.scale(point)))
+
+    @classmethod
+    def _reduce_columns(cls, scaled_matrix, scaled_point, term, reduction=add):
+        """
+        Reduces the terms of the absolute differences of the scaled coordinates coordinate by coordinate.
+        Working on whole columns keeps the inner loops long, even for few coordinates, and sums up the coordinates in
+        the same order for single and batch queries.
+        """
+        result = term(abs(scaled_matrix[..., 0] - scaled_point[..., 0]))
+        for column in range(1, scaled_matrix.shape[-1]):
+            result = reduction(result, term(abs(scaled_matrix[..., column] - scaled_point[..., column])))
+        return result
+
 
 class PMetric(Metric):
     def __init__(self, norm, *args, **kwargs):
@@ -51,6 +202,15 @@ class PMetric(Metric):
     def calc(self, a, b):
         return sum((self.weights * abs(a - b)) ** self.norm) ** self.inv_norm
 
+    def _calc_many(self, matrix, point):
+        return self._rooted_ranks(matrix, point)
+
+    def rank_scaled(self, scaled_matrix, scaled_point):
+        return self._reduce_columns(scaled_matrix, scaled_point, lambda difference: difference ** self.norm)
+
+    def root(self, ranks):
+        return ranks ** self.inv_norm
+
 
 class SumMetric(PMetric):
     def __init__(self, *args, **kwargs):
@@ -59,6 +219,15 @@ class SumMetric(PMetric):
     def calc(self, a, b):
         return sum(self.weights * abs(a - b))
 
+    def _calc_many(self, matrix, point):
+        return self._rooted_ranks(matrix, point)
+
+    def rank_scaled(self, scaled_matrix, scaled_point):
+        return self._reduce_columns(scaled_matrix, scaled_point, lambda difference: difference)
+
+    def root(self, ranks):
+        return ranks
+
 
 class EuclidianMetric(PMetric):
     def __init__(self, *args, **kwargs):
@@ -67,6 +236,15 @@ class EuclidianMetric(PMetric):
     def calc(self, a, b):
         return sqrt(sum((self.weights * (a - b))**2))
 
+    def _calc_many(self, matrix, point):
+        return self._rooted_ranks(matrix, point)
+
+    def rank_scaled(self, scaled_matrix, scaled_point):
+        return self._reduce_columns(scaled_matrix, scaled_point, lambda difference: difference * difference)
+
+    def root(self, ranks):
+        return sqrt(ranks)
+
 
 class CubicMetric(PMetric):
     def __init__(self, *args, **kwargs):
@@ -75,7 +253,23 @@ class CubicMetric(PMetric):
     def calc(self, a, b):
         return cbrt(sum((self.weights * abs(a - b))**3))
 
+    def _calc_many(self, matrix, point):
+        return self._rooted_ranks(matrix, point)
+
+    def rank_scaled(self, scaled_matrix, scaled_point):
+        return self._reduce_columns(scaled_matrix, scaled_point,
+                                    lambda difference: difference * difference * difference)
+
+    def root(self, ranks):
+        return cbrt(ranks)
+
 
 class MaxMetric(Metric):
     def calc(self, a, b):
         return max(self.weights * abs(a - b))
+
+    def _calc_many(self, matrix, point):
+        return self._rooted_ranks(matrix, point)
+
+    def rank_scaled(self, scaled_matrix, scaled_point):
+        return self._reduce_columns(scaled_matrix, scaled_point, lambda difference: difference, maximum)
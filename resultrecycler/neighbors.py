@@ -0,0 +1,82 @@
+#!/usr/bin/python
+
+from numpy import argpartition, argsort, array, flatnonzero, isnan
+
+from .instrumentation import DISABLED
+
+
+class Neighbors:
+    """
+    Result of a distance query: the row indices of a sample store ordered by their distance to the candidate, closest
+    first. Samples with equal distance are ordered by their row index. The stored samples are not touched by a query.
+    The samples may be ordered by any measure, which is monotone in the distance (like the sum of the squared
+    differences of the euclidian metric), if its root is given to turn it into distances.
+
+    The order is evaluated lazily: only the requested number of closest samples is selected (by partitioning the
+    distances) and sorted, so approaches which need a few neighbors only do not pay for a full sort. Iterating expands
+    the sorted part in growing windows.
+    """
+    initial_window = 8
+    instrumentation = DISABLED
+
+    def __init__(self, distances, nearest=None, root=None):
+        """
+        :param distances: Distance (or monotone measure of the distance) of each stored sample to the candidate, indexed
+         by row.
+        :param nearest: Row index of the closest sample, if it is already known.
+        :param root: Function turning the measure into distances, if it is not the distance itself.
+        """
+        self.distances = distances
+        self._root = root
+        self._order = argsort(distances[:0]) if nearest is None else array([nearest])
+
+    def __len__(self):
+        return len(self.distances)
+
+    def __getitem__(self, position):
+        self._sort_first(len(self) if position < 0 else position + 1)
+        return self._order[position]
+
+    def __iter__(self):
+        position = 0
+        window = self.initial_window
+        while position < len(self):
+            self._sort_first(position + window)
+            yield from self._order[position:]
+            position = len(self._order)
+            window *= 2
+
+    def first(self, count):
+        """
+        :param count: Number of requested neighbors.
+        :return: Row indices of the `count` closest samples (or of all samples, if there are less), closest first.
+        """
+        self._sort_first(count)
+        return self._order[:count]
+
+    def distance(self, indices):
+        """
+        :param indices: Row indices of samples.
+        :return: Distances of these samples to the candidate.
+        """
+        if self._root is None:
+            return self.distances[indices]
+        return self._root(self.distances[indices])
+
+    def _sort_first(self, count):
+        count = min(count, len(self))
+        if count <= len(self._order):
+            return
+        with self.instrumentation.stage('sort'):
+            self._sort(count)
+
+    def _sort(self, count):
+        if count == len(self):
+            self._order = argsort(self.distances, kind='stable')
+            return
+        threshold = self.distances[argpartition(self.distances, count - 1)[count - 1]]
+        if isnan(threshold):
+            self._order = argsort(self.distances, kind='stable')
+            return
+        candidates = flatnonzero(self.distances <= threshold)
+        self._order = candidates[argsort(self.distances[candidates], kind='stable')]
@@ -1,24 +1,68 @@
 #!/usr/bin/python
 
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from os import makedirs, replace
+from os.path import join
+
+from numpy import concatenate, empty, load, ndarray, save, stack, tile
+
 from .approach import ApproachChooser, NearestNeighbor
 from .config import Config
-from .data import CandidateData, SampleData
+from .converter.typecheck import WrongDimensionError
+from .data import CandidateBatch, SampleBatch, SampleData
+from .eviction import OldestFirst
+from .index import BruteForce
+from .instrumentation import DISABLED
 from .limits import Limit, RawLimit
 from .metrics import EuclidianMetric
+from .store import SampleStore, SharedSampleStore
 
 
 class ResultRecycler:
-    def __init__(self, metric=None, approach_class=None, limit=None):
+    parallel_chunk_size = 64
+    ingest_chunk_size = 2 ** 16
+    snapshot_header = 'header.pickle'
+    snapshot_version = 2
+    snapshot_array_bytes = 2 ** 12
+
+    def __init__(self, metric=None, approach_class=None, limit=None, index=None, hits=None, capacity=None,
+                 eviction=None, instrumentation=None, packed_hessians=False, dtypes=None, lazy_derivatives=False):
         """
         :param metric: Object of metric to be used. EuclidianMetric will be used, if nothing else given.
+         The weights of the metric are bound to the data layout, so every result recycler needs its own metric object.
         :param approach_class: Class of approach to be used. Automatically choosen according to given data, if unset.
         :param limit: Limits to be taken into account.
+        :param index: Object of index to be used for neighbor queries, e.g. KDTree. All samples are scanned on every
+         query (BruteForce), if nothing else given.
+        :param hits: Object of HitIndex to answer candidates, which match already added coordinates, with the values of
+         the matching sample instead of a guess. Disabled, if nothing else given.
+        :param capacity: Maximum number of samples to be kept. Unlimited, if nothing else given.
+        :param eviction: Object of eviction policy choosing the samples to be removed, once more than capacity samples
+         were added. The samples added first are removed (OldestFirst), if nothing else given.
+        :param instrumentation: Object of Instrumentation collecting stage timings and counters. Disabled, if nothing
+         else given.
+        :param packed_hessians: Whether to store only the upper triangle of each hessian, which roughly halves the
+         memory of the hessians. Predictions are unchanged.
+        :param dtypes: Object of DtypePolicy with the floating point types the coordinates, values and derivatives are
+         stored in. Everything is stored in double precision, if nothing else given.
+        :param lazy_derivatives: Whether to convert jacobians and hessians only, when their sample is used as pivot of a
+         guess. Raw derivatives are kept until then, so they must not be modified after adding and format errors are
+         raised by the query using them. Derivatives given as arrays are always converted at once.
         """
         self._config = None
-        self._data = []
+        self._data = None
         self._metric = EuclidianMetric() if metric is None else metric
         self._approach_class = approach_class
-        self._limit = limit
+        self._limit = Limit(limit) if isinstance(limit, RawLimit) else limit
+        self._index = BruteForce() if index is None else index
+        self._hits = hits
+        self._capacity = capacity
+        self._eviction = OldestFirst() if eviction is None and capacity is not None else eviction
+        self._instrumentation = DISABLED if instrumentation is None else instrumentation
+        self._packed_hessians = packed_hessians
+        self._dtypes = dtypes
+        self._lazy_derivatives = lazy_derivatives
 
     def calculate(self, new_coordinates):
         """
@@ -27,16 +71,149 @@ class ResultRecycler:
          sample data.
         :return: A guess for the values in the same format as the sample data.
         """
+        self._sync()
         if not self._data:
             if self._limit is None:
                 raise Exception('no information about result structure was given')
             else:
                 return self._limit.default
-        candidate_coordinates = CandidateData(new_coordinates)
-        self._metric.calc_distances(candidate_coordinates, self._data)
-        approach_values = self._approach_class.guess(self._data, candidate_coordinates)
-        neighbor_values = self._nearest_neighbor_approach.guess(self._data)
-        return self._limit.choose_values(approach_values, neighbor_values)
+        instrumentation = self._instrumentation
+        instrumentation.count('queries')
+        with instrumentation.stage('conversion'):
+            candidate_coordinates = self._config.candidate(new_coordinates)
+        if self._hits is not None:
+            with instrumentation.stage('hits'):
+                row = self._hits.find(candidate_coordinates)
+            if row is not None:
+                instrumentation.count('exact_hits')
+                self._used([row])
+                values = self._data.values[row].copy()
+                with instrumentation.stage('limit'):
+                    return self._limit.choose_values(values, values)
+        with instrumentation.stage('query'):
+            neighbors = self._index.query(candidate_coordinates)
+        self._used([neighbors[0]])
+        with instrumentation.stage('approach'):
+            approach_values = self._approach_class.guess(self._data, neighbors, candidate_coordinates)
+        with instrumentation.stage('nearest_neighbor'):
+            neighbor_values = self._nearest_neighbor_approach.guess(self._data, neighbors)
+        with instrumentation.stage('limit'):
+            return self._limit.choose_values(approach_values, neighbor_values)
+
+    def calculate_many(self, candidates, executor=None):
+        """
+        Returns guesses for a batch of coordinates. Matches calling calculate for each of them, but computes the
+        distances of all candidates as one matrix operation and runs the approach in batched form.
+        :param candidates: List of coordinates in the same format as the coordinates in sample data, a 2-D array
+         with one row of coordinates per candidate or a batch returned by convert_candidates.
+        :param executor: Number of worker threads or a concurrent.futures executor. If given, the candidates are split
+         into chunks of parallel_chunk_size, which are evaluated in parallel. The result does not depend on it.
+        :return: The guesses for the values stacked in an array with one row per candidate. Empty for an empty batch.
+        """
+        self._sync()
+        if not self._data:
+            if self._limit is None:
+                raise Exception('no information about result structure was given')
+            else:
+                return tile(self._limit.default, (len(candidates), 1))
+        if not SampleBatch.length(candidates):
+            return empty((0, self._data.values.shape[1]))
+        self._instrumentation.count('queries', len(candidates))
+        with self._instrumentation.stage('conversion'):
+            if isinstance(candidates, CandidateBatch):
+                candidate_batch = candidates
+            else:
+                candidate_batch = self._config.candidates(candidates)
+        if executor is None or len(candidate_batch) <= self.parallel_chunk_size:
+            return self._calculate_batch(candidate_batch)
+        if isinstance(executor, int):
+            with ThreadPoolExecutor(executor) as pool:
+                return self._calculate_parallel(candidate_batch, pool)
+        return self._calculate_parallel(candidate_batch, executor)
+
+    def convert_candidates(self, candidates):
+        """
+        Converts the candidates of a batch query one by one, so malformed candidates can be told apart from the others,
+        e.g. to answer the queries of many clients in one batch. The batch is passed to calculate_many without being
+        converted again.
+        :param candidates: List of coordinates in the same format as the coordinates in sample data.
+        :return: The batch of the well-formed candidates and the error raised for each candidate (None for the
+         well-formed ones). The candidates are returned unchanged, as long as the result recycler is not configured.
+        """
+        if self._config is None:
+            return candidates, [None] * len(candidates)
+        shape = self._data.coordinates.shape[1:]
+        rows = []
+        errors = []
+        with self._instrumentation.stage('conversion'):
+            for candidate in candidates:
+                try:
+                    coordinates = self._config.candidate(candidate).coordinates
+                    if coordinates.shape != shape:
+                        raise WrongDimensionError('Candidate', 'coordinate', coordinates.shape, shape)
+                except Exception as error:
+                    errors.append(error)
+                else:
+                    rows.append(coordinates)
+                    errors.append(None)
+        coordinates = stack(rows) if rows else empty((0, ) + shape, dtype=self._data.coordinates.dtype)
+        return CandidateBatch.of(coordinates, self._config), errors
+
+    def _calculate_parallel(self, candidate_batch, executor):
+        parts = candidate_batch.split(self.parallel_chunk_size)
+        chunks = list(executor.map(self._calculate_chunk, parts))
+        for _, used in chunks:
+            for rows in used:
+                self._used(rows)
+        return concatenate([values for values, _ in chunks])
+
+    def _calculate_chunk(self, candidate_batch):
+        """
+        Evaluates a chunk of a parallel query without touching the eviction policy.
+        :return: The guesses and the rows used as pivots, which are passed to the eviction policy in chunk order.
+        """
+        used = []
+        return self._calculate_batch(candidate_batch, used.append), used
+
+    def _calculate_batch(self, candidate_batch, used=None):
+        """
+        :param used: Callable receiving the rows used as pivots. Passes them to the eviction policy, if nothing else
+         given.
+        """
+        used = self._used if used is None else used
+        if self._hits is None:
+            return self._calculate_guesses(candidate_batch, used)
+        with self._instrumentation.stage('hits'):
+            rows = self._hits.find_many(candidate_batch)
+        missed = rows < 0
+        if missed.all():
+            return self._calculate_guesses(candidate_batch, used)
+        self._instrumentation.count('exact_hits', int((~missed).sum()))
+        used(rows[~missed])
+        values = self._data.values[rows]
+        result = self._choose_values(values, values)
+        if missed.any():
+            result[missed] = self._calculate_guesses(candidate_batch.select(missed), used)
+        return result
+
+    def _calculate_guesses(self, candidate_batch, used):
+        instrumentation = self._instrumentation
+        with instrumentation.stage('query'):
+            neighbors = self._index.query_many(candidate_batch)
+        used(self._nearest_neighbor_approach.pivots(neighbors))
+        with instrumentation.stage('approach'):
+            approach_values = self._approach_class.guess_many(self._data, neighbors, candidate_batch)
+        with instrumentation.stage('nearest_neighbor'):
+            neighbor_values = self._nearest_neighbor_approach.guess_many(self._data, neighbors, candidate_batch)
+        return self._choose_values(approach_values, neighbor_values)
+
+    def _used(self, rows):
+        if self._eviction is not None:
+            self._eviction.used(rows)
+
+    def _choose_values(self, approach_values, neighbor_values):
+        with self._instrumentation.stage('limit'):
+            return self._limit.choose_values_many(approach_values, neighbor_values)
 
     def add_data(self, sample_data_or_coordinates, values=None, jacobian=None, hessian=None):
         """
@@ -55,15 +232,258 @@ class ResultRecycler:
         else:
             self._add_data(SampleData(sample_data_or_coordinates, values, jacobian, hessian))
 
+    def add_data_many(self, coordinates, values, jacobians=None, hessians=None):
+        """
+        Adds many sets of sample data at once. Matches calling add_data for each of them, but the samples are
+        converted, validated and stored in chunks of ingest_chunk_size instead of one by one.
+        Will complete the configuration of result recycler on first run, using the first sample.
+        :param coordinates: Coordinate data of all samples: a 2-D array with one row per sample, a sequence of
+         coordinates in the format of add_data or a dict of columns with one entry per key.
+        :param values: Value data of all samples, in one of the formats of coordinates.
+        :param jacobians: Jacobians of all samples: an array with one jacobian per sample or a sequence of jacobians in
+         the format of add_data.
+        :param hessians: Hessians of all samples, in one of the formats of jacobians.
+        """
+        fields = (coordinates, values, jacobians, hessians)
+        count = SampleBatch.length(coordinates)
+        if not count:
+            return
+        if self._data is None:
+            self._configure(SampleData(*[SampleBatch.row(field, 0) for field in fields]))
+        chunk_size = self.ingest_chunk_size
+        if self._capacity is not None:
+            chunk_size = max(1, min(chunk_size, self._capacity))
+        for start in range(0, count, chunk_size):
+            with self._instrumentation.stage('add'):
+                batch = self._config.samples(*[SampleBatch.rows(field, start, start + chunk_size) for field in fields])
+                self._sync()
+                with self._data.writing():
+                    self._sync(locked=True)
+                    rows = self._data.extend(batch)
+                for observer in self._observers():
+                    observer.add_many(rows)
+            self._instrumentation.count('samples_added', len(rows))
+            self._evict()
+
+    def add_data_stream(self, chunks):
+        """
+        Adds the samples of a streaming loader (e.g. CsvReader) chunk by chunk, so only one chunk is held in memory.
+        :param chunks: Iterable of coordinates, values, jacobians and hessians of consecutive samples in the formats of
+         add_data_many.
+        """
+        for coordinates, values, jacobians, hessians in chunks:
+            self.add_data_many(coordinates, values, jacobians, hessians)
+
     def _add_data(self, sample_data):
-        if not self._data:
+        if self._data is None:
             self._configure(sample_data)
-        self._data.append(self._config.data_class(sample_data))
+        with self._instrumentation.stage('add'):
+            sample = self._config.sample(sample_data)
+            self._sync()
+            with self._data.writing():
+                self._sync(locked=True)
+                row = self._data.append(sample)
+            for observer in self._observers():
+                observer.add(row)
+        self._instrumentation.count('samples_added')
+        self._evict()
+
+    def _sync(self, locked=False):
+        """
+        Informs the observers about the samples, which other processes added to a shared sample store. Adding samples
+        syncs once more inside the lock of the store, which then only covers the samples added meanwhile.
+        :param locked: Whether the lock of the store is held already.
+        """
+        if self._data is None:
+            return
+        rows = self._data.refresh(locked)
+        if len(rows):
+            for observer in self._observers():
+                observer.add_many(rows)
+
+    def share(self, capacity, lock=None):
+        """
+        Moves the samples into shared memory, so other processes can add samples and query the samples of all processes.
+        The result recycler is passed to the other processes, when they are started (e.g. as argument of
+        multiprocessing.Process or as initarg of multiprocessing.Pool). Each process works on its own copy of the
+        configuration, metric, approach and indices, which are updated with the samples of the other processes before
+        each query. Samples are never removed from shared memory, so capacity and eviction are not supported. Queries of
+        one process must not run in parallel threads, unless they are part of one calculate_many.
+        :param capacity: Maximum number of samples of all processes.
+        :param lock: multiprocessing lock guarding the addition of samples, which has to be created by the context of
+         the processes. A new lock of the default context, if nothing else given.
+        """
+        if self._data is None:
+            raise Exception('no information about result structure was given')
+        if self._capacity is not None:
+            raise ValueError('samples can not be evicted from shared memory')
+        self._data = SharedSampleStore.copy_of(self._data, self._config, capacity, lock)
+        for observer in self._observers():
+            observer.bind(self._data, self._metric)
+
+    def unshare(self):
+        """
+        Copies the samples in shared memory into memory of this process and detaches from the shared memory. Other
+        processes keep their samples. The shared memory is freed, once the process, which shared it, detached and all
+        other processes detached or exited.
+        """
+        if not isinstance(self._data, SharedSampleStore):
+            return
+        self._sync()
+        shared = self._data
+        self._data = shared.detached()
+        for observer in self._observers():
+            observer.bind(self._data, self._metric)
+        shared.close(unlink=shared.owner)
+
+    def _evict(self):
+        if self._capacity is None or len(self._data) <= self._capacity:
+            return
+        with self._instrumentation.stage('eviction'):
+            self._instrumentation.count('samples_evicted', len(self._data) - self._capacity)
+            self._remove_samples()
+
+    def _remove_samples(self):
+        while len(self._data) > self._capacity:
+            row = self._eviction.choose()
+            for observer in self._observers():
+                observer.remove(row)
+            moved = self._data.remove(row)
+            if moved is not None:
+                for observer in self._observers():
+                    observer.move(moved, row)
+
+    @property
+    def nbytes(self):
+        """
+        :return: Number of bytes of the stored samples and the arrays, which the index keeps next to them.
+        """
+        return 0 if self._data is None else self._data.nbytes + self._index.nbytes
+
+    def instrument(self, instrumentation=None):
+        """
+        Replaces the instrumentation of the result recycler and its approach, index and limit.
+        :param instrumentation: Object of Instrumentation. Disables the instrumentation, if nothing else given.
+        """
+        self._instrumentation = DISABLED if instrumentation is None else instrumentation
+        if self._data is not None:
+            self._instrument()
+
+    def _instrument(self):
+        for component in [self._approach_class, self._nearest_neighbor_approach, self._limit] + self._observers():
+            component.instrumentation = self._instrumentation
+
+    def _observers(self):
+        """
+        :return: The objects to be informed about added and removed samples.
+        """
+        observers = [observer for observer in (self._index, self._hits, self._eviction) if observer is not None]
+        if self._approach_class is not None and self._approach_class.observes_samples:
+            observers.append(self._approach_class)
+        return observers
+
+    def save(self, path):
+        """
+        Writes a snapshot of the result recycler to the directory path, which is created if necessary.
+        The blocks of the sample store are written as .npy files, everything else (configuration with the converters,
+        metric, approach, limit and index) is pickled into a small header. Arrays of at least snapshot_array_bytes
+        bytes in there (e.g. the stamps of an eviction policy) are written as .npy files next to the blocks. Indices
+        holding Python objects per sample (KDTree, HitIndex) are not written, but rebuilt on their first use.
+        :param path: Directory of the snapshot. A snapshot already stored there is replaced.
+        """
+        makedirs(path, exist_ok=True)
+        if self._data is not None:
+            self._data.save(path)
+        state = dict(self.__dict__)
+        del state['_data']
+        file_name = join(path, self.snapshot_header)
+        with open(file_name + '.tmp', 'wb') as header:
+            _ArrayPickler(header, path, self.snapshot_array_bytes).dump({'version': self.snapshot_version,
+                                                                         'state': state})
+        replace(file_name + '.tmp', file_name)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Restores a result recycler from a snapshot written by save. The header is unpickled, so only snapshots from
+        trusted sources should be loaded.
+        :param path: Directory of the snapshot.
+        :param mmap: Whether to map the sample blocks read-only into memory. Mapped blocks are not copied before more
+         samples are added, so startup does not depend on the number of samples and the page cache is shared between
+         processes loading the same snapshot. The arrays written next to the header are mapped copy-on-write.
+        :return: The restored result recycler.
+        """
+        with open(join(path, cls.snapshot_header), 'rb') as header:
+            snapshot = _ArrayUnpickler(header, path, mmap).load()
+        if snapshot['version'] != cls.snapshot_version:
+            raise Exception('unsupported snapshot version {}'.format(snapshot['version']))
+        state = snapshot['state']
+        state['_data'] = None if state['_config'] is None else SampleStore.load(state['_config'], path, mmap)
+        return cls._restored(state)
+
+    def __reduce_ex__(self, protocol):
+        """
+        Pickles the result recycler, e.g. for the transfer to other processes. The sample store is pickled as one
+        buffer per block, which is out-of-band with protocol 5:
+        `pickle.loads(pickle.dumps(recycler, 5, buffer_callback=buffers.append), buffers=buffers)`
+        Everything else (configuration with the converters, metric, approach, limit and indices) is pickled as it is
+        and the indices are bound to the restored store. KDTree and HitIndex rebuild their nodes and keys on first use.
+        """
+        return type(self)._restored, (dict(self.__dict__), )
+
+    @classmethod
+    def _restored(cls, state):
+        recycler = cls.__new__(cls)
+        recycler.__dict__.update(state)
+        if recycler._data is not None:
+            for observer in recycler._observers():
+                observer.bind(recycler._data, recycler._metric)
+        return recycler
 
     def _configure(self, sample_data):
-        self._config = Config(sample_data)
+        self._config = Config(sample_data, self._packed_hessians, self._dtypes, self._lazy_derivatives)
+        self._data = SampleStore(self._config)
         self._metric.init_weights(self._config)
+        self._index.init_index(self._data, self._metric)
+        if self._hits is not None:
+            self._hits.init_index(self._data, self._metric)
+        if self._eviction is not None:
+            self._eviction.init_policy(self._data, self._metric)
         self._approach_class = ApproachChooser.choose(self._config, self._approach_class)
+        if self._approach_class.observes_samples:
+            self._approach_class.init_index(self._data, self._metric)
         self._nearest_neighbor_approach = NearestNeighbor()
         if self._limit is None:
             self._limit = Limit(RawLimit(value_keys=self._config.value_converter.keys))
+        self._instrument()
+
+
+class _ArrayPickler(pickle.Pickler):
+    """
+    Pickles the header of a snapshot. Large arrays are saved as .npy files and only their file names are pickled.
+    """
+    def __init__(self, file, path, array_bytes):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._path = path
+        self._array_bytes = array_bytes
+        self._count = 0
+
+    def persistent_id(self, obj):
+        if not isinstance(obj, ndarray) or obj.dtype.hasobject or obj.nbytes < self._array_bytes:
+            return None
+        file_name = 'array{}.npy'.format(self._count)
+        self._count += 1
+        with open(join(self._path, file_name + '.tmp'), 'wb') as array_file:
+            save(array_file, obj)
+        replace(join(self._path, file_name + '.tmp'), join(self._path, file_name))
+        return file_name
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, file, path, mmap):
+        super().__init__(file)
+        self._path = path
+        self._mmap = mmap
+
+    def persistent_load(self, pid):
+        return load(join(self._path, pid), mmap_mode='c' if self._mmap else None)
@@ -0,0 +1,127 @@
+#!/usr/bin/python
+"""
+Serves a result recycler to the processes of a node on a unix domain socket:
+
+    python -m resultrecycler.serve /tmp/resultrecycler.sock [--load SNAPSHOT] [--save SNAPSHOT] [--batch-window SECONDS]
+
+Clients connect with ResultRecyclerClient.
+"""
+
+import signal
+from argparse import ArgumentParser
+from asyncio import CancelledError, IncompleteReadError, get_running_loop, run, start_unix_server
+from os import remove
+from os.path import exists
+
+from .async_recycler import AsyncResultRecycler
+from .client import Codec
+from .result_recycler import ResultRecycler
+
+
+class RecyclerServer:
+    """
+    Answers the requests of many clients with one result recycler. Queries of all clients arriving within the batch
+    window are evaluated together (see AsyncResultRecycler). The requests of each connection take effect in the order
+    they were received.
+    """
+    methods = ('calculate', 'calculate_many', 'add_data', 'add_data_many')
+
+    def __init__(self, path, recycler=None, batch_window=None, max_batch_size=None):
+        """
+        :param path: Path of the unix domain socket.
+        :param recycler: Object of ResultRecycler to be served. A default result recycler is used, if nothing else
+         given.
+        :param batch_window: Seconds to wait for further queries after the first one of a batch.
+        :param max_batch_size: Number of queries, after which a batch is evaluated without waiting.
+        """
+        self.path = path
+        self.recycler = AsyncResultRecycler(recycler, batch_window, max_batch_size)
+        self._server = None
+        self._closed = False
+        self._tasks = set()
+        self._writers = set()
+
+    async def start(self):
+        self._server = await start_unix_server(self._serve_connection, self.path)
+
+    async def serve_forever(self):
+        """
+        Serves until the server is closed or the process receives SIGINT or SIGTERM.
+        """
+        if self._server is None:
+            await self.start()
+        loop = get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, self._server.close)
+        try:
+            await self._server.serve_forever()
+        except CancelledError:
+            pass
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops accepting connections, closes the open ones and waits for the outstanding work of the result recycler.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        await self.recycler.close()
+        if exists(self.path):
+            remove(self.path)
+
+    async def _serve_connection(self, reader, writer):
+        loop = get_running_loop()
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    size = Codec.frame.unpack(await reader.readexactly(Codec.frame.size))[0]
+                    payload = await reader.readexactly(size)
+                except IncompleteReadError:
+                    return
+                task = loop.create_task(self._answer(payload, writer))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _answer(self, payload, writer):
+        request_id = None
+        try:
+            request_id, method, args = Codec.decode(payload)
+            if method not in self.methods:
+                raise AttributeError('Unknown method {}'.format(method))
+            answer = (request_id, True, await getattr(self.recycler, method)(*args))
+        except Exception as error:
+            answer = (request_id, False, '{}: {}'.format(type(error).__name__, error))
+        if not writer.is_closing():
+            writer.write(Codec.encode(answer))
+
+
+def main(args=None):
+    parser = ArgumentParser(prog='python -m resultrecycler.serve', description='Serves a result recycler on a unix '
+                                                                               'domain socket.')
+    parser.add_argument('socket', help='path of the unix domain socket')
+    parser.add_argument('--load', help='snapshot directory to start from (see ResultRecycler.save)')
+    parser.add_argument('--batch-window', type=float, default=AsyncResultRecycler.batch_window,
+                        help='seconds to wait for further queries of a batch')
+    parser.add_argument('--max-batch-size', type=int, default=AsyncResultRecycler.max_batch_size,
+                        help='number of queries evaluated at most in one batch')
+    parser.add_argument('--save', help='snapshot directory written at shutdown')
+    options = parser.parse_args(args)
+    recycler = ResultRecycler.load(options.load) if options.load else ResultRecycler()
+    server = RecyclerServer(options.socket, recycler, options.batch_window, options.max_batch_size)
+    run(server.serve_forever())
+    if options.save:
+        recycler.save(options.save)
+
+
+if __name__ == '__main__':
+    main()
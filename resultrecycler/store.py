@@ -0,0 +1,421 @@
+#!/usr/bin/python
+
+from contextlib import nullcontext
+from multiprocessing import Lock
+from multiprocessing.shared_memory import SharedMemory
+from os import getpid, replace
+from os.path import join
+from pickle import PickleBuffer
+
+from numpy import arange, ascontiguousarray, atleast_1d, empty, frombuffer, int64, load, ndarray, prod, save
+
+from .data import RawDerivatives
+
+
+class SampleStore:
+    """
+    Columnar storage for sample data.
+    Coordinates, values and (if available) jacobians and hessians of all samples are kept in contiguous blocks with
+    one row per sample. The blocks grow with amortized doubling, so adding a sample does not copy the whole history.
+    Approaches address samples by their row index.
+    With lazy derivatives, the raw jacobians and hessians are kept next to their blocks and converted into them, when
+    their rows are accessed for the first time.
+    """
+    initial_capacity = 16
+
+    def __init__(self, config, capacity=None):
+        """
+        :param config: Completed configuration of the result recycler, which defines the shape of each row.
+        :param capacity: Number of rows to be allocated in advance.
+        """
+        self._size = 0
+        self._capacity = self.initial_capacity if capacity is None else max(capacity, 1)
+        self._shapes = self._init_shapes(config)
+        self.packed_hessians = config.hessian_converter is not None and config.hessian_converter.packed
+        dtypes = self._init_dtypes(config)
+        self._blocks = {field: empty((self._capacity, ) + shape, dtype=dtypes[field])
+                        for field, shape in self._shapes.items()}
+        self._readers = self._init_readers(config)
+        self._pending = {field: empty(self._capacity, dtype=object) for field in self._readers}
+
+    @classmethod
+    def _init_shapes(cls, config):
+        shapes = {'coordinates': (config.coordinate_converter.dim, ),
+                  'values': (config.value_converter.dim, )}
+        if config.jacobian_converter is not None:
+            shapes['jacobian'] = config.jacobian_converter.jac_shape
+        if config.hessian_converter is not None:
+            shapes['hessian'] = config.hessian_converter.hess_shape
+        return shapes
+
+    @classmethod
+    def _init_dtypes(cls, config):
+        dtypes = {'coordinates': config.coordinate_converter.dtype, 'values': config.value_converter.dtype}
+        if config.jacobian_converter is not None:
+            dtypes['jacobian'] = dtypes['hessian'] = config.jacobian_converter.dtype
+        return dtypes
+
+    @classmethod
+    def _init_readers(cls, config):
+        readers = {}
+        if config.lazy_derivatives and config.jacobian_converter is not None:
+            readers['jacobian'] = config.jacobian_converter.read_jac
+        if config.lazy_derivatives and config.hessian_converter is not None:
+            readers['hessian'] = config.hessian_converter.read_hess
+        return readers
+
+    @property
+    def nbytes(self):
+        """
+        :return: Number of bytes of the filled rows of all blocks.
+        """
+        return sum(block[:self._size].nbytes for block in self._blocks.values())
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def coordinates(self):
+        return self._blocks['coordinates'][:self._size]
+
+    @property
+    def values(self):
+        return self._blocks['values'][:self._size]
+
+    @property
+    def jacobians(self):
+        return self._block('jacobian')
+
+    @property
+    def hessians(self):
+        return self._block('hessian')
+
+    def _block(self, field):
+        if field not in self._blocks:
+            return None
+        if field in self._pending:
+            return PendingBlock(self, field)
+        return self._blocks[field][:self._size]
+
+    def converted(self, field, rows):
+        """
+        Converts the raw derivatives of the given rows, which were not converted yet.
+        :param field: 'jacobian' or 'hessian'.
+        :param rows: Row index, array of row indices or slice.
+        :return: The converted derivatives of the rows.
+        """
+        pending = self._pending[field]
+        for row in (arange(self._size)[rows] if isinstance(rows, slice) else atleast_1d(rows)):
+            raw = pending[row]
+            if raw is not None:
+                self._blocks[field][row] = self._readers[field](raw)
+                pending[row] = None
+        return self._blocks[field][:self._size][rows]
+
+    def _write(self, field, rows, value):
+        if isinstance(value, RawDerivatives):
+            self._pending[field][rows] = value.raws
+            return
+        self._blocks[field][rows] = value
+        if field in self._pending:
+            self._pending[field][rows] = None
+
+    def append(self, sample):
+        """
+        Copies a converted sample (ValueData, JacobianData or HessianData) into the blocks.
+        :param sample: The converted sample.
+        :return: The row index of the new sample.
+        """
+        if self._size == self._capacity:
+            self._grow(2 * self._capacity)
+        row = self._size
+        for field in self._blocks:
+            self._write(field, slice(row, row + 1), getattr(sample, field))
+        self._size += 1
+        return row
+
+    def extend(self, batch):
+        """
+        Copies converted samples (SampleBatch) into the blocks.
+        :param batch: The converted samples.
+        :return: The row indices of the new samples.
+        """
+        start = self._size
+        stop = start + len(batch)
+        if stop > self._capacity:
+            self._grow(max(2 * self._capacity, stop))
+        for field in self._blocks:
+            self._write(field, slice(start, stop), getattr(batch, field))
+        self._size = stop
+        return range(start, stop)
+
+    def remove(self, row):
+        """
+        Removes a sample by moving the last sample into its row.
+        :param row: The row index of the removed sample.
+        :return: The former row index of the moved sample, None if the last sample was removed.
+        """
+        last = self._size - 1
+        if row != last:
+            if not all(block.flags.writeable for block in self._blocks.values()):
+                self._grow(self._capacity)
+            for block in self._blocks.values():
+                block[row] = block[last]
+            for pending in self._pending.values():
+                pending[row] = pending[last]
+        for pending in self._pending.values():
+            pending[last] = None
+        self._size = last
+        return None if row == last else last
+
+    def refresh(self, locked=False):
+        """
+        :param locked: Whether the caller entered writing already.
+        :return: Row indices of the samples added by other processes since the last refresh, which became visible now.
+        """
+        return range(self._size, self._size)
+
+    def writing(self):
+        """
+        :return: Context manager, which has to be entered for adding samples.
+        """
+        return nullcontext()
+
+    def _grow(self, capacity):
+        for field, block in self._blocks.items():
+            new_block = empty((capacity, ) + self._shapes[field], dtype=block.dtype)
+            new_block[:self._size] = block[:self._size]
+            self._blocks[field] = new_block
+        for field, pending in self._pending.items():
+            new_pending = empty(capacity, dtype=object)
+            new_pending[:self._size] = pending[:self._size]
+            self._pending[field] = new_pending
+        self._capacity = capacity
+
+    def save(self, path):
+        """
+        Writes the filled rows of each block to <path>/<field>.npy.
+        Files are replaced instead of overwritten, so stores mapping the previous files stay intact.
+        Pending derivatives are converted before.
+        """
+        for field in self._pending:
+            self.converted(field, slice(None))
+        for field, block in self._blocks.items():
+            file_name = join(path, field + '.npy')
+            with open(file_name + '.tmp', 'wb') as block_file:
+                save(block_file, block[:self._size])
+            replace(file_name + '.tmp', file_name)
+
+    def __reduce_ex__(self, protocol):
+        """
+        Pickles the filled rows of each block as one buffer instead of element by element. With protocol 5 the buffers
+        are PickleBuffers, which can be transferred out-of-band. Pending derivatives are converted before.
+        The restored blocks share the memory of the buffers and are copied before the store is modified, like mapped
+        blocks.
+        """
+        for field in self._pending:
+            self.converted(field, slice(None))
+        state = dict(self.__dict__)
+        state['_blocks'] = {field: (self._buffer(block[:self._size], protocol), block.dtype)
+                            for field, block in self._blocks.items()}
+        state['_pending'] = list(self._pending)
+        return type(self)._restored, (state, )
+
+    @classmethod
+    def _buffer(cls, block, protocol):
+        block = ascontiguousarray(block)
+        return PickleBuffer(block) if protocol >= 5 else block
+
+    @classmethod
+    def _restored(cls, state):
+        store = cls.__new__(cls)
+        store.__dict__.update(state)
+        store._capacity = max(store._size, 1)
+        store._blocks = {field: frombuffer(buffer, dtype=dtype).reshape((-1, ) + store._shapes[field]) if store._size
+                         else empty((1, ) + store._shapes[field], dtype=dtype)
+                         for field, (buffer, dtype) in state['_blocks'].items()}
+        store._pending = {field: empty(store._capacity, dtype=object) for field in state['_pending']}
+        return store
+
+    @classmethod
+    def load(cls, config, path, mmap=True):
+        """
+        :param config: Configuration of the result recycler, which saved the store.
+        :param path: Directory of the saved blocks.
+        :param mmap: Whether to map the blocks read-only into memory instead of reading them.
+        :return: Sample store with the saved samples.
+        """
+        store = cls(config, capacity=1)
+        blocks = {field: load(join(path, field + '.npy'), mmap_mode='r' if mmap else None)
+                  for field in store._shapes}
+        size = len(blocks['coordinates'])
+        if size:
+            store._blocks = blocks
+            store._pending = {field: empty(size, dtype=object) for field in store._pending}
+            store._size = store._capacity = size
+        return store
+
+
+class PendingBlock:
+    """
+    Block of derivatives with lazy conversion. Indexing converts the raw derivatives of the selected rows first.
+    """
+    def __init__(self, store, field):
+        self._store = store
+        self._field = field
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, rows):
+        return self._store.converted(self._field, rows)
+
+
+class SharedSampleStore(SampleStore):
+    """
+    Sample store in shared memory, to which many processes add samples and all of them query.
+    The blocks are allocated for a fixed capacity in one shared memory segment, which starts with the number of
+    committed samples. Samples are written under a lock (see writing) behind the committed ones and committed
+    afterwards, so every process reads a consistent prefix of the samples from the shared memory without copying. The
+    samples of other processes become visible to a process, when it refreshes the store. Samples are never removed.
+    Pickling the store transfers the name of the segment and the lock, so the store is attached by processes, which it
+    is passed to when they are started.
+    """
+    alignment = 64
+
+    def __init__(self, config, capacity, lock=None, name=None):
+        """
+        :param config: Completed configuration of the result recycler, which defines the shape of each row.
+        :param capacity: Maximum number of samples.
+        :param lock: multiprocessing lock guarding the writes. A new lock is created, if nothing else given.
+        :param name: Name of the shared memory segment to be attached. A new segment is created, if nothing else given.
+        """
+        if config.lazy_derivatives:
+            raise Exception('lazy derivatives can not be stored in shared memory')
+        super().__init__(config, capacity=1)
+        self._config = config
+        self._capacity = capacity
+        self._lock = Lock() if lock is None else lock
+        offsets, size = self._offsets(capacity)
+        self._memory = SharedMemory(name, create=True, size=size) if name is None else self._attach(name)
+        self._creator = getpid() if name is None else None
+        self._committed = ndarray(1, dtype=int64, buffer=self._memory.buf)
+        self._blocks = {field: ndarray((capacity, ) + self._shapes[field], dtype=block.dtype, buffer=self._memory.buf,
+                                       offset=offsets[field])
+                        for field, block in self._blocks.items()}
+
+    @classmethod
+    def _attach(cls, name):
+        """
+        Attached segments are not tracked, so they outlive processes exiting before the one, which created them.
+        """
+        try:
+            return SharedMemory(name, track=False)
+        except TypeError:
+            return SharedMemory(name)
+
+    def _offsets(self, capacity):
+        offsets = {}
+        size = self.alignment
+        for field, block in self._blocks.items():
+            offsets[field] = size
+            size += -(-capacity * int(prod(self._shapes[field])) * block.itemsize // self.alignment) * self.alignment
+        return offsets, size
+
+    @classmethod
+    def copy_of(cls, store, config, capacity, lock=None):
+        """
+        :param store: Sample store, whose samples are copied into a new shared memory segment.
+        :return: The shared sample store.
+        """
+        if len(store) > capacity:
+            raise OverflowError('Shared sample store is full with {} samples'.format(capacity))
+        shared = cls(config, capacity, lock)
+        for field, block in shared._blocks.items():
+            block[:len(store)] = store._blocks[field][:len(store)]
+        shared._size = len(store)
+        shared._committed[0] = shared._size
+        return shared
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def owner(self):
+        """
+        :return: Whether this process created the shared memory segment. Forked processes are no owners.
+        """
+        return self._creator == getpid()
+
+    def extend(self, batch):
+        rows = super().extend(batch)
+        self._committed[0] = self._size
+        return rows
+
+    def append(self, sample):
+        row = super().append(sample)
+        self._committed[0] = self._size
+        return row
+
+    def refresh(self, locked=False):
+        """
+        The number of committed samples is read under the lock of the writers, so all rows committed before it are
+        visible to this process.
+        """
+        if locked:
+            committed = int(self._committed[0])
+        else:
+            with self._lock:
+                committed = int(self._committed[0])
+        rows = range(self._size, committed)
+        self._size = committed
+        return rows
+
+    def writing(self):
+        """
+        Adding samples locks the store and requires, that the store was refreshed inside the lock, so the new samples
+        are written behind the committed ones.
+        """
+        return self._lock
+
+    def remove(self, row):
+        raise ValueError('samples can not be removed from shared memory')
+
+    def _grow(self, capacity):
+        raise OverflowError('Shared sample store is full with {} samples'.format(self._capacity))
+
+    def __reduce_ex__(self, protocol):
+        return type(self)._attached, (self._config, self._capacity, self._lock, self.name, self._size)
+
+    @classmethod
+    def _attached(cls, config, capacity, lock, name, size):
+        store = cls(config, capacity, lock, name)
+        store._size = size
+        return store
+
+    def detached(self):
+        """
+        :return: Sample store in memory of this process with a copy of the visible samples.
+        """
+        store = SampleStore(self._config, capacity=max(self._size, 1))
+        for field, block in self._blocks.items():
+            store._blocks[field][:self._size] = block[:self._size]
+        store._size = self._size
+        return store
+
+    def close(self, unlink=False):
+        """
+        Detaches the store from the shared memory. The store can not be used afterwards.
+        :param unlink: Whether to free the segment, once all processes detached. Should be done by the process, which
+         created it.
+        """
+        self._blocks = {}
+        self._committed = None
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
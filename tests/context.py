@@ -6,8 +6,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import resultrecycler as rr
 import resultrecycler.approach as rr_approach
+import resultrecycler.approach.delaunay as rr_approach_delaunay
 import resultrecycler.config as rr_config
 import resultrecycler.converter.typecheck as rr_converter_typecheck
 import resultrecycler.converter.vector as rr_converter_vector
 import resultrecycler.converter.derivative as rr_converter_derivate
+import resultrecycler.index as rr_index
 import resultrecycler.limits as rr_limits
+import resultrecycler.neighbors as rr_neighbors
+import resultrecycler.store as rr_store
+import resultrecycler.loaders as rr_loaders
+import resultrecycler.client as rr_client
+import resultrecycler.serve as rr_serve
@@ -3,15 +3,31 @@
 from unittest import TextTestRunner
 
 from tests.test_approaches import ApproachTestSuite
+from tests.test_async import AsyncResultRecyclerTestSuite
+from tests.test_eviction import EvictionTestSuite
+from tests.test_index import IndexTestSuite
+from tests.test_instrumentation import InstrumentationTestSuite
 from tests.test_jacobian_converter import JacobianConverterTestSuite
 from tests.test_limit import LimitImportTestSuite
+from tests.test_loaders import LoaderTestSuite
 from tests.test_metrics import MetricTestSuite
+from tests.test_neighbors import NeighborsTestSuite
 from tests.test_resultrecycler import ResultRecyclerTestSuite
+from tests.test_serve import ServerTestSuite
+from tests.test_store import SampleStoreTestSuite
 from tests.test_vector_converter import VectorConverterTestSuite
 
 TextTestRunner().run(VectorConverterTestSuite())
 TextTestRunner().run(JacobianConverterTestSuite())
 TextTestRunner().run(MetricTestSuite())
+TextTestRunner().run(NeighborsTestSuite())
+TextTestRunner().run(SampleStoreTestSuite())
 TextTestRunner().run(ApproachTestSuite())
+TextTestRunner().run(IndexTestSuite())
+TextTestRunner().run(EvictionTestSuite())
 TextTestRunner().run(LimitImportTestSuite())
 TextTestRunner().run(ResultRecyclerTestSuite())
+TextTestRunner().run(InstrumentationTestSuite())
+TextTestRunner().run(AsyncResultRecyclerTestSuite())
+TextTestRunner().run(LoaderTestSuite())
+TextTestRunner().run(ServerTestSuite())
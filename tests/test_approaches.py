@@ -1,11 +1,16 @@
 #!/usr/bin/python
 
+import pickle
 from unittest import TestCase, TestSuite, defaultTestLoader
-from numpy import array, testing
+from numpy import array, linspace, meshgrid, stack, testing
+from numpy.linalg import det
+from numpy.random import default_rng
 
 from tests.context import rr
 from tests.context import rr_approach
+from tests.context import rr_approach_delaunay
 from tests.context import rr_config
+from tests.context import rr_store
 
 
 class TestApproach(TestCase):
@@ -14,15 +19,15 @@ class TestApproach(TestCase):
         scalar_sample_data_base = [rr.SampleData(1, 2, 3, 4)]
         scalar_sample_data_ext = [rr.SampleData(1.4, 2.2, 3.6, 4.8)]
         cls.scalar_config = rr_config.Config(scalar_sample_data_base[0])
-        cls.scalar_data_1 = [cls.scalar_config.data_class(raw) for raw in scalar_sample_data_base]
-        cls.scalar_data_2 = [cls.scalar_config.data_class(raw) for raw in scalar_sample_data_ext]
-        cls.scalar_data_2.extend(cls.scalar_data_1)
+        cls.scalar_data_1 = cls.init_store(cls.scalar_config, scalar_sample_data_base)
+        cls.scalar_data_2 = cls.init_store(cls.scalar_config, scalar_sample_data_ext + scalar_sample_data_base)
 
-        cls.scalar_candidate = cls.scalar_config.candidate_class(1.5)
+        cls.scalar_candidate = cls.scalar_config.candidate(1.5)
+        cls.scalar_candidates = cls.scalar_config.candidates([1.5, 1.5])
         metric = rr.EuclidianMetric()
         metric.init_weights(cls.scalar_config)
-        metric.calc_distances(cls.scalar_candidate, cls.scalar_data_1)
-        metric.calc_distances(cls.scalar_candidate, cls.scalar_data_2)
+        cls.scalar_neighbors_1 = metric.calc_distances(cls.scalar_candidate, cls.scalar_data_1)
+        cls.scalar_neighbors_2 = metric.calc_distances(cls.scalar_candidate, cls.scalar_data_2)
 
         vector_sample_data_base = [rr.SampleData([1, 1], [2, 2],
                                            [[2, 3], [4, 5]],
@@ -31,14 +36,21 @@ class TestApproach(TestCase):
                                           [[2.2, 3.4], [-1.5, -2.1]],
                                           [[[0.3, -1.1], [-1.1, 2.4]], [[5, 3], [3, 2]]])]
         cls.vector_config = rr_config.Config(vector_sample_data_base[0])
-        cls.vector_data_1 = [cls.vector_config.data_class(raw) for raw in vector_sample_data_base]
-        cls.vector_data_2 = [cls.vector_config.data_class(raw) for raw in vector_sample_data_ext]
-        cls.vector_data_2.extend(cls.vector_data_1)
-        cls.vector_candidate = cls.vector_config.candidate_class([1.5, 2])
+        cls.vector_data_1 = cls.init_store(cls.vector_config, vector_sample_data_base)
+        cls.vector_data_2 = cls.init_store(cls.vector_config, vector_sample_data_ext + vector_sample_data_base)
+        cls.vector_candidate = cls.vector_config.candidate([1.5, 2])
+        cls.vector_candidates = cls.vector_config.candidates([[1.5, 2], [1.5, 2]])
         metric = rr.EuclidianMetric()
         metric.init_weights(cls.vector_config)
-        metric.calc_distances(cls.vector_candidate, cls.vector_data_1)
-        metric.calc_distances(cls.vector_candidate, cls.vector_data_2)
+        cls.vector_neighbors_1 = metric.calc_distances(cls.vector_candidate, cls.vector_data_1)
+        cls.vector_neighbors_2 = metric.calc_distances(cls.vector_candidate, cls.vector_data_2)
+
+    @classmethod
+    def init_store(cls, config, raw_data):
+        store = rr_store.SampleStore(config)
+        for raw in raw_data:
+            store.append(config.sample(raw))
+        return store
 
     @classmethod
     def init(cls, approach_class, scalar_result_1, scalar_result_2, vector_result_1, vector_result_2):
@@ -54,44 +66,249 @@ class TestApproach(TestCase):
         self.scalar_approach = self.approach_class()
         self.vector_approach = self.approach_class()
 
-    def _evaluate_result(self, approach, data, candidate, exp):
-        res = approach.guess(data, candidate)
+    def _evaluate_result(self, approach, data, neighbors, candidate, exp):
+        res = approach.guess(data, neighbors, candidate)
         testing.assert_array_almost_equal(res, exp, 6,
                                           "{}: Wrong result: {} instead of {}".format(self.name, res, exp))
 
     def test_correct_scalar_result_1(self):
-        self._evaluate_result(self.scalar_approach, self.scalar_data_1, self.scalar_candidate, self.scalar_result_1)
+        self._evaluate_result(self.scalar_approach, self.scalar_data_1, self.scalar_neighbors_1,
+                              self.scalar_candidate, self.scalar_result_1)
 
     def test_correct_scalar_result_2(self):
-        self._evaluate_result(self.scalar_approach, self.scalar_data_2, self.scalar_candidate, self.scalar_result_2)
+        self._evaluate_result(self.scalar_approach, self.scalar_data_2, self.scalar_neighbors_2,
+                              self.scalar_candidate, self.scalar_result_2)
 
     def test_correct_vector_result_1(self):
-        self._evaluate_result(self.vector_approach, self.vector_data_1, self.vector_candidate, self.vector_result_1)
+        self._evaluate_result(self.vector_approach, self.vector_data_1, self.vector_neighbors_1,
+                              self.vector_candidate, self.vector_result_1)
 
     def test_correct_vector_result_2(self):
-        self._evaluate_result(self.vector_approach, self.vector_data_2, self.vector_candidate, self.vector_result_2)
+        self._evaluate_result(self.vector_approach, self.vector_data_2, self.vector_neighbors_2,
+                              self.vector_candidate, self.vector_result_2)
+
+    def _evaluate_batch_result(self, approach, data, neighbors, candidates, exp):
+        res = approach.guess_many(data, [neighbors] * len(candidates), candidates)
+        testing.assert_array_almost_equal(res, array([exp] * len(candidates)), 6,
+                                          "{}: Wrong batch result: {} instead of {}".format(self.name, res, exp))
+
+    def test_correct_scalar_batch_result(self):
+        self._evaluate_batch_result(self.scalar_approach, self.scalar_data_2, self.scalar_neighbors_2,
+                                    self.scalar_candidates, self.scalar_result_2)
+
+    def test_correct_vector_batch_result(self):
+        self._evaluate_batch_result(self.vector_approach, self.vector_data_2, self.vector_neighbors_2,
+                                    self.vector_candidates, self.vector_result_2)
 
     def test_correct_scalar_dim(self):
-        result = len(self.scalar_approach.guess(self.scalar_data_2, self.scalar_candidate))
+        result = len(self.scalar_approach.guess(self.scalar_data_2, self.scalar_neighbors_2, self.scalar_candidate))
         expected = self.scalar_config.value_converter.dim
         self.assertEqual(result, expected, 'wrong dimension: {} instead of {}'.format(result, expected))
 
     def test_correct_vector_dim(self):
-        result = len(self.vector_approach.guess(self.vector_data_2, self.vector_candidate))
+        result = len(self.vector_approach.guess(self.vector_data_2, self.vector_neighbors_2, self.vector_candidate))
         expected = self.vector_config.value_converter.dim
         self.assertEqual(result, expected, 'wrong dimension: {} instead of {}'.format(result, expected))
 
     def test_correct_scalar_type(self):
-        result = type(self.scalar_approach.guess(self.scalar_data_2, self.scalar_candidate))
+        result = type(self.scalar_approach.guess(self.scalar_data_2, self.scalar_neighbors_2, self.scalar_candidate))
         expected = type(array([0]))
         self.assertEqual(result, expected, 'wrong type: {} instead of {}'.format(result, expected))
 
     def test_correct_vector_type(self):
-        result = type(self.vector_approach.guess(self.vector_data_2, self.vector_candidate))
+        result = type(self.vector_approach.guess(self.vector_data_2, self.vector_neighbors_2, self.vector_candidate))
         expected = type(array([0]))
         self.assertEqual(result, expected, 'wrong type: {} instead of {}'.format(result, expected))
 
 
+class AffineBaseTest(TestCase):
+    def setUp(self):
+        rng = default_rng(5)
+        self.points = rng.random((4, 3))
+        self.base = rr_approach.affinehull.AffineBase()
+        for point in self.points:
+            self.base.add(point)
+
+    def test_dimension(self):
+        self.assertEqual(len(self.base), 4, 'AffineBase: Wrong number of points: {}'.format(len(self.base)))
+
+    def test_coefficients(self):
+        for candidate in (array([0.2, 0.4, 0.8]), self.points[2], array([-3, 5, 0.5])):
+            coefficients = self.base.affine_coefficients(candidate)
+            testing.assert_array_almost_equal(coefficients.dot(self.points), candidate, 10,
+                                              'AffineBase: Wrong affine coefficients {}'.format(coefficients))
+            self.assertAlmostEqual(coefficients.sum(), 1, 10, 'AffineBase: Coefficients do not sum up to 1')
+
+    def test_dependent(self):
+        base = rr_approach.affinehull.AffineBase()
+        base.add(self.points[0])
+        base.add(self.points[1])
+        self.assertTrue(base.is_affine_dependent(0.25 * self.points[0] + 0.75 * self.points[1]),
+                        'AffineBase: Point on line not dependent')
+        self.assertTrue(base.is_affine_independent(self.points[2]), 'AffineBase: Point off line not independent')
+
+
+class PackedHessianTest(TestCase):
+    def setUp(self):
+        rng = default_rng(13)
+        self.coordinates = rng.random((30, 6))
+        self.values = rng.random((30, 3))
+        self.jacobians = rng.random((30, 3, 6))
+        self.hessians = rng.random((30, 3, 6, 6))
+        self.candidates = rng.random((10, 6))
+
+    def _recycler(self, hessians, packed_hessians):
+        recycler = rr.ResultRecycler(approach_class=rr.SecondDerivative, packed_hessians=packed_hessians)
+        recycler.add_data_many(self.coordinates, self.values, self.jacobians, hessians)
+        return recycler
+
+    def test_predictions(self):
+        for hessians in (self.hessians, self.hessians + self.hessians.transpose(0, 1, 3, 2)):
+            full = self._recycler(hessians, False)
+            packed = self._recycler(hessians, True)
+            testing.assert_allclose(packed.calculate_many(self.candidates), full.calculate_many(self.candidates),
+                                    rtol=1e-12, err_msg='Packed hessians: Wrong batch results')
+            for candidate in self.candidates:
+                testing.assert_allclose(packed.calculate(candidate), full.calculate(candidate), rtol=1e-12,
+                                        err_msg='Packed hessians: Wrong result')
+
+    def test_layout(self):
+        hessians = self.hessians + self.hessians.transpose(0, 1, 3, 2)
+        packed = self._recycler(hessians, True)
+        self.assertEqual(packed._data.hessians.shape, (30, 3, 21), 'Packed hessians: Wrong shape')
+        testing.assert_array_equal(packed._data.hessians[:, :, :6], hessians[:, :, 0, :],
+                                   'Packed hessians: First row of upper triangle not stored')
+        packed.add_data(self.candidates[0], self.values[0], self.jacobians[0], hessians[0])
+        testing.assert_array_equal(packed._data.hessians[-1], packed._data.hessians[0],
+                                   'Packed hessians: Single sample packed differently')
+
+
+class DelaunayHullTest(TestCase):
+    def setUp(self):
+        self.rng = default_rng(31)
+
+    def _recycler(self, coordinates, values, **kwargs):
+        recycler = rr.ResultRecycler(approach_class=rr.DelaunayHull, **kwargs)
+        recycler.add_data_many(coordinates, values)
+        return recycler
+
+    def test_empty_circumspheres(self):
+        for dim in (2, 3):
+            points = self.rng.random((120, dim))
+            triangulation = rr_approach_delaunay.DelaunayTriangulation(dim, [0.5] * dim, 1)
+            for point in points:
+                triangulation.insert(point)
+            simplices = triangulation._alive[:triangulation._simplex_count].nonzero()[0]
+            volumes = 0
+            for simplex in simplices:
+                corners = triangulation.corners(simplex)
+                distances = ((points - triangulation._center[simplex]) ** 2).sum(axis=1)
+                inside = (distances < triangulation._radius[simplex] * (1 - 1e-8)).nonzero()[0] + dim + 1
+                self.assertEqual(set(inside.tolist()) - set(corners.tolist()), set())
+                volumes += 1 / abs(det(triangulation._inverse[simplex]))
+            corners = triangulation._points[:dim + 1]
+            self.assertAlmostEqual(volumes / abs(det(corners[:-1] - corners[-1])), 1)
+
+    def test_linear_values(self):
+        for dim in (1, 2, 3, 4):
+            coordinates = self.rng.random((60, dim))
+            candidates = 0.3 + 0.4 * self.rng.random((10, dim))
+            recycler = self._recycler(coordinates, coordinates.sum(axis=1) * 2 + 1)
+            testing.assert_array_almost_equal(recycler.calculate_many(candidates).ravel(),
+                                              candidates.sum(axis=1) * 2 + 1)
+            self.assertIsNotNone(recycler._approach_class._triangulation)
+
+    def test_grid(self):
+        axis = linspace(0, 1, 6)
+        coordinates = stack(meshgrid(axis, axis, axis), axis=-1).reshape(-1, 3)
+        recycler = self._recycler(coordinates, coordinates @ [1, -2, 3])
+        for candidate in self.rng.random((10, 3)):
+            testing.assert_array_almost_equal(recycler.calculate(candidate), [candidate @ [1, -2, 3]])
+
+    def test_outside_hull(self):
+        coordinates = self.rng.random((30, 2))
+        values = self.rng.random(30)
+        recycler = self._recycler(coordinates, values)
+        instrumentation = rr.Instrumentation()
+        recycler.instrument(instrumentation)
+        nearest = ((coordinates - [3, -1]) ** 2).sum(axis=1).argmin()
+        testing.assert_array_almost_equal(recycler.calculate([3, -1]), [values[nearest]])
+        self.assertEqual(instrumentation.report()['counters']['nearest_neighbor_fallbacks'], 1)
+
+    def test_matches_affine_hull_in_triangle(self):
+        coordinates = array([[0, 0], [1, 0], [0, 1]])
+        values = array([[1, 2], [3, 0], [-1, 5]])
+        candidate = [0.2, 0.3]
+        testing.assert_array_almost_equal(self._recycler(coordinates, values).calculate(candidate),
+                                          self._affine_hull(coordinates, values).calculate(candidate))
+
+    def _affine_hull(self, coordinates, values):
+        recycler = rr.ResultRecycler(approach_class=rr.AffineHull)
+        recycler.add_data_many(coordinates, values)
+        return recycler
+
+    def test_eviction(self):
+        coordinates = self.rng.random((50, 2))
+        values = coordinates @ [2, 1]
+        recycler = rr.ResultRecycler(approach_class=rr.DelaunayHull, capacity=20)
+        for sample in range(len(coordinates)):
+            recycler.add_data(coordinates[sample], values[sample])
+        kept = rr.ResultRecycler(approach_class=rr.DelaunayHull)
+        kept.add_data_many(recycler._data.coordinates, recycler._data.values)
+        candidates = self.rng.random((20, 2))
+        testing.assert_array_almost_equal(recycler.calculate_many(candidates), kept.calculate_many(candidates))
+
+    def test_parallel(self):
+        coordinates = self.rng.random((1000, 2))
+        values = self.rng.random(1000)
+        candidates = self.rng.random((400, 2))
+        serial = self._recycler(coordinates, values).calculate_many(candidates)
+        for _ in range(3):
+            recycler = self._recycler(coordinates, values)
+            recycler.parallel_chunk_size = 16
+            testing.assert_array_equal(recycler.calculate_many(candidates, executor=8), serial)
+
+    def test_failed_insertion(self):
+        coordinates = self.rng.random((40, 2))
+        recycler = self._recycler(coordinates, coordinates @ [1, 2])
+        instrumentation = rr.Instrumentation()
+        recycler.instrument(instrumentation)
+        approach = recycler._approach_class
+        recycler.calculate([0.5, 0.5])
+
+        def degenerate(point):
+            raise rr_approach_delaunay.DegenerateSimplexError()
+
+        approach._triangulation.insert = degenerate
+        recycler.add_data([0.5, 0.5], 1.5)
+        self.assertEqual(instrumentation.report()['counters']['delaunay_failures'], 1)
+        recycler.add_data([0.25, 0.5], 1.25)
+        testing.assert_array_almost_equal(recycler.calculate([0.3, 0.4]), [1.1])
+        self.assertIsNotNone(approach._triangulation)
+        self.assertEqual(len(approach._triangulation), 42 + 3)
+        self.assertNotIn('affine_hull_search', instrumentation.report()['stages'])
+
+    def test_pickle(self):
+        coordinates = self.rng.random((40, 2))
+        recycler = pickle.loads(pickle.dumps(self._recycler(coordinates, coordinates @ [1, 1])))
+        self.assertIs(recycler._approach_class.data, recycler._data)
+        recycler.add_data([0.5, 0.25], 0.75)
+        testing.assert_array_almost_equal(recycler.calculate([0.4, 0.3]), [0.7])
+
+    def test_many_coordinates(self):
+        coordinates = self.rng.random((40, 5))
+        values = self.rng.random(40)
+        candidates = self.rng.random((5, 5))
+        testing.assert_array_almost_equal(self._recycler(coordinates, values).calculate_many(candidates),
+                                          self._affine_hull(coordinates, values).calculate_many(candidates))
+
+    def test_unbound(self):
+        approach = rr.DelaunayHull()
+        TestApproach.init_data()
+        testing.assert_array_almost_equal(approach.guess(TestApproach.vector_data_2, TestApproach.vector_neighbors_2,
+                                                         TestApproach.vector_candidate), [3, -1])
+
+
 class ApproachTestSuite(TestSuite):
     def __init__(self, single_test=None):
         TestSuite.__init__(self)
@@ -117,6 +334,10 @@ class ApproachTestSuite(TestSuite):
 
         for test in approach_tests:
             self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(AffineBaseTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(PackedHessianTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(DelaunayHullTest))
 
     def add_test(self, test):
         class CurrentTestApproach(TestApproach):
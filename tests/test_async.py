@@ -0,0 +1,100 @@
+#!/usr/bin/python
+
+from asyncio import gather, run
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import testing
+from numpy.random import default_rng
+
+from tests.context import rr
+
+
+class CountingRecycler(rr.ResultRecycler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def calculate_many(self, candidates, executor=None):
+        self.batches.append(len(candidates))
+        return super().calculate_many(candidates, executor)
+
+
+class AsyncResultRecyclerTest(TestCase):
+    def setUp(self):
+        rng = default_rng(19)
+        self.coordinates = rng.random((40, 3))
+        self.values = self.coordinates.sum(axis=1, keepdims=True)
+        self.candidates = rng.random((12, 3))
+        self.reference = rr.ResultRecycler(hits=rr.HitIndex())
+        self.reference.add_data_many(self.coordinates, self.values)
+
+    def _recycler(self, **kwargs):
+        recycler = CountingRecycler(hits=rr.HitIndex())
+        recycler.add_data_many(self.coordinates, self.values)
+        return rr.AsyncResultRecycler(recycler, **kwargs)
+
+    def test_batching(self):
+        async def queries():
+            async with self._recycler(batch_window=0.05) as recycler:
+                results = await gather(*[recycler.calculate(candidate.tolist()) for candidate in self.candidates])
+            return recycler, results
+
+        recycler, results = run(queries())
+        self.assertEqual(recycler.recycler.batches, [len(self.candidates)])
+        for candidate, result in zip(self.candidates, results):
+            testing.assert_array_almost_equal(result, self.reference.calculate(candidate.tolist()))
+
+    def test_max_batch_size(self):
+        async def queries():
+            async with self._recycler(batch_window=10, max_batch_size=5) as recycler:
+                await gather(*[recycler.calculate(candidate.tolist()) for candidate in self.candidates[:10]])
+            return recycler
+
+        self.assertEqual(run(queries()).recycler.batches, [5, 5])
+
+    def test_order(self):
+        new_coordinates = [0.5, 0.5, 0.5]
+
+        async def operations():
+            async with self._recycler(batch_window=0.05) as recycler:
+                return await gather(recycler.calculate(new_coordinates), recycler.add_data(new_coordinates, [7.0]),
+                                    recycler.calculate(new_coordinates))
+
+        before, _, after = run(operations())
+        testing.assert_array_almost_equal(before, self.reference.calculate(new_coordinates))
+        testing.assert_array_equal(after, [7.0])
+
+    def test_error_isolation(self):
+        async def queries():
+            async with self._recycler(batch_window=0.05) as recycler:
+                return await gather(recycler.calculate([0.1, 0.2, 0.3]), recycler.calculate([0.1, 0.2]),
+                                    return_exceptions=True)
+
+        result, error = run(queries())
+        testing.assert_array_almost_equal(result, self.reference.calculate([0.1, 0.2, 0.3]))
+        self.assertIsInstance(error, Exception)
+
+    def test_error_side_effects(self):
+        async def queries():
+            async with self._recycler(batch_window=0.05) as recycler:
+                await gather(recycler.calculate(self.coordinates[0].tolist()), recycler.calculate([0.1, 0.2]),
+                             recycler.calculate(self.candidates[0].tolist()), return_exceptions=True)
+            return recycler.recycler
+
+        recycler = run(queries())
+        self.assertEqual(recycler.batches, [2])
+        self.assertEqual((recycler._hits.hits, recycler._hits.misses), (1, 1))
+
+    def test_bulk(self):
+        async def bulk():
+            async with rr.AsyncResultRecycler(rr.ResultRecycler(hits=rr.HitIndex())) as recycler:
+                await recycler.add_data_many(self.coordinates, self.values)
+                return await recycler.calculate_many(self.candidates)
+
+        testing.assert_array_almost_equal(run(bulk()), self.reference.calculate_many(self.candidates))
+
+
+class AsyncResultRecyclerTestSuite(TestSuite):
+    def __init__(self):
+        super().__init__()
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(AsyncResultRecyclerTest))
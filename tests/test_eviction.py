@@ -0,0 +1,152 @@
+#!/usr/bin/python
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import array, inf, testing
+from numpy.random import default_rng
+
+from tests.context import rr
+
+
+class EvictionTest(TestCase):
+    @classmethod
+    def init(cls, name, policy_class, index_class, coordinates, capacity=40):
+        cls.name = name
+        cls.policy_class = policy_class
+        cls.index_class = index_class
+        cls.coordinates = coordinates
+        cls.capacity = capacity
+
+    def setUp(self):
+        self.values = self.coordinates.sum(axis=1, keepdims=True)
+        self.candidates = default_rng(3).random((20, self.coordinates.shape[1]))
+        self.recycler = self._recycler()
+
+    def _recycler(self):
+        return rr.ResultRecycler(index=self.index_class(), hits=rr.HitIndex(), capacity=self.capacity,
+                                 eviction=self.policy_class())
+
+    def _kept(self, recycler):
+        return {tuple(row) for row in recycler._data.coordinates.tolist()}
+
+    def _assert_consistent(self, recycler):
+        self.assertEqual(len(recycler._data), min(self.capacity, len(self.coordinates)),
+                         '{}: Wrong number of samples'.format(self.name))
+        testing.assert_array_equal(recycler._data.values, recycler._data.coordinates.sum(axis=1, keepdims=True),
+                                   '{}: Values separated from their coordinates'.format(self.name))
+        reference = rr.ResultRecycler()
+        reference.add_data_many(recycler._data.coordinates, recycler._data.values)
+        for candidate in self.candidates.tolist():
+            res = list(recycler._index.query(recycler._config.candidate(candidate)))
+            exp = list(reference._index.query(reference._config.candidate(candidate)))
+            self.assertEqual(res, exp, '{}: Index out of date'.format(self.name))
+        rows = recycler._hits.find_many(recycler._config.candidates(recycler._data.coordinates))
+        self.assertGreaterEqual(rows.min(), 0, '{}: Hit index out of date'.format(self.name))
+        testing.assert_array_equal(recycler._data.coordinates[rows], recycler._data.coordinates,
+                                   '{}: Hit index out of date'.format(self.name))
+
+    def test_add_data(self):
+        for coordinates, values in zip(self.coordinates.tolist(), self.values.tolist()):
+            self.recycler.add_data(coordinates, values)
+        self._assert_consistent(self.recycler)
+
+    def test_add_data_many(self):
+        self.recycler.add_data_many(self.coordinates[:30], self.values[:30])
+        self.recycler.add_data_many(self.coordinates[30:], self.values[30:])
+        self._assert_consistent(self.recycler)
+
+    def test_snapshot(self):
+        self.recycler.add_data_many(self.coordinates[:50], self.values[:50])
+        with TemporaryDirectory() as directory:
+            self.recycler.save(directory)
+            loaded = rr.ResultRecycler.load(directory)
+            loaded.add_data_many(self.coordinates[50:], self.values[50:])
+            self.recycler.add_data_many(self.coordinates[50:], self.values[50:])
+            self._assert_consistent(loaded)
+            self.assertEqual(self._kept(loaded), self._kept(self.recycler),
+                             '{}: Wrong samples kept after loading'.format(self.name))
+
+
+class PolicyTest(TestCase):
+    def setUp(self):
+        self.coordinates = default_rng(17).random((100, 2))
+
+    def test_oldest_first(self):
+        recycler = rr.ResultRecycler(capacity=30)
+        for coordinates in self.coordinates.tolist():
+            recycler.add_data(coordinates, [0.0])
+        self.assertEqual({tuple(row) for row in recycler._data.coordinates.tolist()},
+                         {tuple(row) for row in self.coordinates[-30:].tolist()}, 'Wrong samples kept')
+
+    def test_least_recently_used(self):
+        recycler = rr.ResultRecycler(capacity=30, eviction=rr.LeastRecentlyUsed())
+        kept = self.coordinates[0].tolist()
+        for coordinates in self.coordinates.tolist():
+            recycler.add_data(coordinates, [0.0])
+            recycler.calculate(kept)
+        recycler.calculate_many([kept])
+        self.assertIn(tuple(kept), {tuple(row) for row in recycler._data.coordinates.tolist()},
+                      'Used sample was removed')
+        self.assertEqual(len(recycler._data), 30, 'Wrong number of samples')
+
+    def test_least_recently_used_parallel(self):
+        candidates = default_rng(18).random((40, 2))
+        recyclers = []
+        for _ in range(2):
+            recycler = rr.ResultRecycler(capacity=90, eviction=rr.LeastRecentlyUsed(), hits=rr.HitIndex())
+            recycler.parallel_chunk_size = 4
+            recycler.add_data_many(self.coordinates[:60], self.coordinates[:60, :1])
+            recyclers.append(recycler)
+        parallel, serial = recyclers
+        parallel.calculate_many(list(self.coordinates[:20:3]) + list(candidates), executor=8)
+        for start in range(0, 47, 4):
+            serial.calculate_many((list(self.coordinates[:20:3]) + list(candidates))[start:start + 4])
+        testing.assert_array_equal(parallel._eviction._stamps[:60], serial._eviction._stamps[:60],
+                                   'Pivots not passed to the policy in chunk order')
+
+    def test_density_thinning(self):
+        metric = rr.EuclidianMetric()
+        recycler = rr.ResultRecycler(metric=metric, capacity=30, eviction=rr.DensityThinning())
+        expected = set()
+        for coordinates in self.coordinates.tolist():
+            recycler.add_data(coordinates, [0.0])
+            expected.add(tuple(coordinates))
+            kept = {tuple(row) for row in recycler._data.coordinates.tolist()}
+            if len(expected) > 30:
+                points = array(sorted(expected))
+                distances = array([metric.calc_many(points, point) for point in points])
+                distances[range(len(points)), range(len(points))] = inf
+                pair = {tuple(points[row]) for row in divmod(int(distances.argmin()), len(points))}
+                self.assertEqual(len(expected - kept), 1, 'Wrong number of samples removed')
+                self.assertLessEqual(expected - kept, pair, 'Removed sample is not of the closest pair')
+            expected = kept
+
+
+class EvictionTestSuite(TestSuite):
+    def __init__(self, single_test=None):
+        super().__init__()
+
+        rng = default_rng(23)
+        uniform = rng.random((120, 3))
+        grid = rng.integers(0, 5, (120, 2)).astype(float)
+
+        eviction_tests = [single_test] if single_test is not None else [
+            {'name': '{}{}{}'.format(policy.__name__, index.__name__, data_name), 'policy_class': policy,
+             'index_class': index, 'coordinates': data}
+            for policy in (rr.OldestFirst, rr.LeastRecentlyUsed, rr.DensityThinning)
+            for index in (rr.BruteForce, rr.KDTree)
+            for data_name, data in (('Uniform', uniform), ('Grid', grid))
+        ]
+
+        for test in eviction_tests:
+            self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(PolicyTest))
+
+    def add_test(self, test):
+        class CurrentEvictionTest(EvictionTest):
+            pass
+
+        CurrentEvictionTest.init(**test)
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(CurrentEvictionTest))
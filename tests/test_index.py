@@ -0,0 +1,252 @@
+#!/usr/bin/python
+
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import array, floor, testing
+from numpy.random import default_rng
+
+from tests.context import rr
+from tests.context import rr_index
+from tests.context import rr_limits
+
+
+class IndexTest(TestCase):
+    @classmethod
+    def init(cls, name, metric, coordinates, candidates, leaf_size=4):
+        cls.name = name
+        cls.metric = metric
+        cls.coordinates = coordinates
+        cls.candidates = candidates
+        cls.leaf_size = leaf_size
+
+    def setUp(self):
+        self.brute_force = rr.ResultRecycler(metric=self.metric)
+        self.kd_tree = rr.ResultRecycler(metric=self.metric, index=rr.KDTree(self.leaf_size))
+        for coordinates in self.coordinates:
+            self.brute_force.add_data(list(coordinates), float(sum(coordinates)))
+            self.kd_tree.add_data(list(coordinates), float(sum(coordinates)))
+
+    def _neighbors(self, recycler, candidate):
+        return recycler._index.query(recycler._config.candidate(list(candidate)))
+
+    def test_order(self):
+        for candidate in self.candidates:
+            res = array(list(self._neighbors(self.kd_tree, candidate)))
+            exp = array(list(self._neighbors(self.brute_force, candidate)))
+            testing.assert_array_equal(res, exp, '{}: Wrong neighbor order for {}'.format(self.name, candidate))
+
+    def test_first(self):
+        for candidate in self.candidates:
+            for count in (1, 3, len(self.coordinates) + 1):
+                res = self._neighbors(self.kd_tree, candidate).first(count)
+                exp = self._neighbors(self.brute_force, candidate).first(count)
+                testing.assert_array_equal(res, exp, '{}: Wrong first {} neighbors'.format(self.name, count))
+
+    def test_batches(self):
+        kd_tree = rr.ResultRecycler(metric=self.metric, index=rr.KDTree(self.leaf_size))
+        kd_tree.ingest_chunk_size = 20
+        split = 2 * len(self.coordinates) // 3
+        for start, stop in ((0, split), (split, len(self.coordinates))):
+            kd_tree.add_data_many(self.coordinates[start:stop], self.coordinates[start:stop].sum(axis=1))
+            self.assertEqual(len(kd_tree._index._pending), stop - start, '{}: Batch indexed early'.format(self.name))
+            self.assertEqual(len(list(self._neighbors(kd_tree, self.candidates[0]))), stop,
+                             '{}: Batch not indexed'.format(self.name))
+        for candidate in self.candidates:
+            res = array(list(self._neighbors(kd_tree, candidate)))
+            exp = array(list(self._neighbors(self.brute_force, candidate)))
+            testing.assert_array_equal(res, exp, '{}: Wrong neighbor order after batches'.format(self.name))
+
+    def test_distance(self):
+        for candidate in self.candidates:
+            kd_neighbors = self._neighbors(self.kd_tree, candidate)
+            brute_force_neighbors = self._neighbors(self.brute_force, candidate)
+            indices = brute_force_neighbors.first(5)
+            testing.assert_array_equal(kd_neighbors.distance(indices), brute_force_neighbors.distance(indices),
+                                       '{}: Wrong distances'.format(self.name))
+
+    def test_results(self):
+        for candidate in self.candidates:
+            res = self.kd_tree.calculate(list(candidate))
+            exp = self.brute_force.calculate(list(candidate))
+            testing.assert_array_equal(res, exp, '{}: Wrong result for {}'.format(self.name, candidate))
+
+    def test_calculate_many(self):
+        exp = array([self.brute_force.calculate(list(candidate)) for candidate in self.candidates])
+        for recycler in (self.brute_force, self.kd_tree):
+            res = recycler.calculate_many(self.candidates)
+            testing.assert_array_almost_equal(res, exp, err_msg='{}: Wrong batch result'.format(self.name))
+
+    def test_calculate_many_parallel(self):
+        for recycler in (self.brute_force, self.kd_tree):
+            exp = recycler.calculate_many(self.candidates)
+            recycler.parallel_chunk_size = 3
+            with ThreadPoolExecutor(4) as executor:
+                for workers in (2, executor):
+                    res = recycler.calculate_many(self.candidates, workers)
+                    testing.assert_array_equal(res, exp, '{}: Wrong parallel batch result'.format(self.name))
+
+
+class UnsupportedMetricTest(TestCase):
+    class CustomMetric(rr.Metric):
+        def calc(self, a, b):
+            return sum(abs(a - b))
+
+    def test_unsupported_metric(self):
+        recycler = rr.ResultRecycler(metric=self.CustomMetric(), index=rr.KDTree())
+        self.assertRaises(rr_index.UnsupportedMetricError, recycler.add_data, [1, 2], 3)
+
+
+class ScaledCoordinatesTest(TestCase):
+    class CustomMetric(rr.Metric):
+        def calc(self, a, b):
+            return sum(abs(a - b) * self.weights)
+
+    def setUp(self):
+        rng = default_rng(17)
+        self.coordinates = rng.random((50, 3))
+        self.candidates = rng.random((5, 3))
+
+    def _recycler(self, metric, **kwargs):
+        recycler = rr.ResultRecycler(metric=metric, **kwargs)
+        recycler.add_data_many(self.coordinates[:30], self.coordinates[:30].sum(axis=1))
+        recycler.calculate_many(self.candidates)
+        for coordinates in self.coordinates[30:].tolist():
+            recycler.add_data(coordinates, sum(coordinates))
+        return recycler
+
+    def _distances(self, recycler):
+        return array([sorted(neighbors.distance(neighbors.first(10)))
+                      for neighbors in recycler._index.query_many(recycler._config.candidates(self.candidates))])
+
+    def test_unranked_metric(self):
+        weights = [2.6, 0.65, 1.3]
+        custom = self._recycler(self.CustomMetric(weights))
+        ranked = self._recycler(rr.SumMetric(weights))
+        self.assertIsNone(custom._index._scaled)
+        testing.assert_array_almost_equal(self._distances(custom), self._distances(ranked))
+
+    def test_eviction(self):
+        evicting = self._recycler(rr.EuclidianMetric([2.6, 0.65, 1.3]), capacity=20)
+        rows = len(evicting._data)
+        testing.assert_array_equal(evicting._index._scaled[:rows],
+                                   evicting._metric.scale(evicting._data.coordinates),
+                                   'Scaled coordinates out of sync after eviction')
+
+    def test_unweighted(self):
+        recycler = self._recycler(rr.SumMetric())
+        self.assertIsNone(recycler._index._scaled, 'Unweighted coordinates copied')
+        self.assertEqual(recycler.nbytes, recycler._data.nbytes)
+        testing.assert_array_almost_equal(self._distances(recycler),
+                                          self._distances(self._recycler(self.CustomMetric())))
+        weighted = self._recycler(rr.EuclidianMetric([2.6, 0.65, 1.3]))
+        self.assertGreater(weighted.nbytes, weighted._data.nbytes, 'Scaled coordinates not counted')
+
+    def test_lazy(self):
+        recycler = self._recycler(rr.EuclidianMetric([2.6, 0.65, 1.3]))
+        copied = pickle.loads(pickle.dumps(recycler))
+        self.assertIsNone(copied._index._scaled, 'Scaled coordinates built before the first query')
+        testing.assert_array_equal(copied.calculate_many(self.candidates), recycler.calculate_many(self.candidates))
+        testing.assert_array_equal(copied._index._scaled[:len(copied._data)], recycler._index._scaled[:50])
+
+
+class HitIndexTest(TestCase):
+    def setUp(self):
+        rng = default_rng(13)
+        self.coordinates = rng.random((30, 2))
+        self.values = rng.random((30, 2))
+        self.plain = rr.ResultRecycler()
+        self.plain.add_data_many(self.coordinates, self.values)
+
+    def _recycler(self, tolerance=None, **kwargs):
+        recycler = rr.ResultRecycler(hits=rr.HitIndex(tolerance), **kwargs)
+        recycler.add_data_many(self.coordinates[:20], self.values[:20])
+        for coordinates, values in zip(self.coordinates[20:].tolist(), self.values[20:].tolist()):
+            recycler.add_data(coordinates, values)
+        return recycler
+
+    def test_exact(self):
+        recycler = self._recycler()
+        for row in (0, 25):
+            testing.assert_array_equal(recycler.calculate(self.coordinates[row].tolist()), self.values[row],
+                                       'Wrong value of hit {}'.format(row))
+        candidate = (self.coordinates[0] + 1e-9).tolist()
+        testing.assert_array_equal(recycler.calculate(candidate), self.plain.calculate(candidate), 'Wrong miss')
+        self.assertEqual((recycler._hits.hits, recycler._hits.misses), (2, 1), 'Wrong counters')
+
+    def test_quantized(self):
+        recycler = self._recycler(tolerance=0.5)
+        cells = floor(self.coordinates / 0.5)
+        for row in (3, 24):
+            first = (cells == cells[row]).all(axis=1).argmax()
+            candidate = (cells[row] * 0.5 + 0.25).tolist()
+            testing.assert_array_equal(recycler.calculate(candidate), self.values[first],
+                                       'Wrong quantized hit for {}'.format(row))
+
+    def test_signed_zero(self):
+        recycler = rr.ResultRecycler(hits=rr.HitIndex())
+        recycler.add_data([0.0, 1.0], [2.0])
+        recycler.add_data([1.0, 0.0], [3.0])
+        testing.assert_array_equal(recycler.calculate([-0.0, 1.0]), [2.0], 'Signed zero missed')
+
+    def test_limit(self):
+        limit = rr_limits.Limit(rr.RawLimit(maximum=0.5, value_keys=2))
+        recycler = self._recycler(limit=limit)
+        testing.assert_array_equal(recycler.calculate(self.coordinates[4].tolist()), self.values[4].clip(None, 0.5),
+                                   'Limit ignored on hit')
+
+    def test_calculate_many(self):
+        recycler = self._recycler()
+        candidates = array([self.coordinates[5], [2.0, 2.0], self.coordinates[27], [-1.0, 0.5]])
+        exp = array([self.values[5], self.plain.calculate([2.0, 2.0]), self.values[27],
+                     self.plain.calculate([-1.0, 0.5])])
+        testing.assert_array_equal(recycler.calculate_many(candidates), exp, 'Wrong batch with hits')
+        self.assertEqual((recycler._hits.hits, recycler._hits.misses), (2, 2), 'Wrong counters')
+        recycler._hits.reset_counters()
+        self.assertEqual((recycler._hits.hits, recycler._hits.misses), (0, 0), 'Counters not reset')
+
+
+class IndexTestSuite(TestSuite):
+    def __init__(self, single_test=None):
+        super().__init__()
+
+        rng = default_rng(11)
+        uniform = rng.random((300, 3))
+        grid = rng.integers(0, 4, (200, 2)).astype(float)
+        clustered = rng.normal(0, 1, (300, 4)) * array([1, 10, 0.1, 1])
+        ordered = array([[i, i % 7] for i in range(200)], dtype=float)
+        weights = [2.6, 0.65, 1.3]
+
+        index_tests = [single_test] if single_test is not None else [
+            {'name': 'Euclidian', 'metric': rr.EuclidianMetric(), 'coordinates': uniform,
+             'candidates': rng.random((10, 3))},
+            {'name': 'WeightedSum', 'metric': rr.SumMetric(weights), 'coordinates': uniform,
+             'candidates': rng.random((10, 3))},
+            {'name': 'WeightedCubic', 'metric': rr.CubicMetric(weights), 'coordinates': uniform,
+             'candidates': rng.random((10, 3))},
+            {'name': 'WeightedMax', 'metric': rr.MaxMetric(weights), 'coordinates': uniform,
+             'candidates': rng.random((10, 3))},
+            {'name': 'P4', 'metric': rr.PMetric(4), 'coordinates': clustered,
+             'candidates': rng.normal(0, 1, (10, 4))},
+            {'name': 'GridTies', 'metric': rr.EuclidianMetric(), 'coordinates': grid,
+             'candidates': rng.integers(0, 4, (10, 2)).astype(float)},
+            {'name': 'GridTiesMax', 'metric': rr.MaxMetric(), 'coordinates': grid,
+             'candidates': rng.integers(-1, 5, (10, 2)).astype(float), 'leaf_size': 1},
+            {'name': 'OrderedInsertion', 'metric': rr.EuclidianMetric(), 'coordinates': ordered,
+             'candidates': array([[0, 0], [100.5, 3], [250, 1]], dtype=float)},
+        ]
+
+        for test in index_tests:
+            self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(UnsupportedMetricTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(ScaledCoordinatesTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(HitIndexTest))
+
+    def add_test(self, test):
+        class CurrentIndexTest(IndexTest):
+            pass
+
+        CurrentIndexTest.init(**test)
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(CurrentIndexTest))
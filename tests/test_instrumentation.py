@@ -0,0 +1,97 @@
+#!/usr/bin/python
+
+from tempfile import TemporaryDirectory
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import testing
+from numpy.random import default_rng
+
+from tests.context import rr
+
+
+class InstrumentationTest(TestCase):
+    def setUp(self):
+        rng = default_rng(11)
+        self.coordinates = rng.random((40, 3))
+        self.values = self.coordinates.sum(axis=1, keepdims=True)
+        self.candidates = rng.random((10, 3))
+
+    def _recycler(self, **kwargs):
+        recycler = rr.ResultRecycler(approach_class=rr.AffineHull, hits=rr.HitIndex(), **kwargs)
+        recycler.add_data_many(self.coordinates, self.values)
+        return recycler
+
+    def test_stages_and_counters(self):
+        instrumentation = rr.Instrumentation()
+        recycler = self._recycler(instrumentation=instrumentation)
+        recycler.calculate(self.candidates[0])
+        recycler.calculate_many(self.candidates[1:])
+        recycler.calculate(self.coordinates[0])
+        report = instrumentation.report()
+        for stage in ('add', 'conversion', 'hits', 'query', 'distances', 'approach', 'affine_hull_search',
+                      'affine_hull_solve', 'nearest_neighbor', 'limit'):
+            self.assertIn(stage, report['stages'])
+            self.assertGreaterEqual(report['stages'][stage]['seconds'], 0)
+        self.assertEqual(report['stages']['add']['calls'], 1)
+        self.assertEqual(report['counters']['samples_added'], len(self.coordinates))
+        self.assertEqual(report['counters']['queries'], len(self.candidates) + 1)
+        self.assertEqual(report['counters']['exact_hits'], 1)
+        self.assertEqual(report['counters']['samples_scanned'], len(self.coordinates) * len(self.candidates))
+        self.assertEqual(report['counters']['linear_solves'], len(self.candidates))
+        self.assertGreaterEqual(report['counters']['affine_independence_tests'], 4 * len(self.candidates))
+
+    def test_eviction(self):
+        instrumentation = rr.Instrumentation()
+        self._recycler(capacity=30, instrumentation=instrumentation)
+        self.assertEqual(instrumentation.report()['counters']['samples_evicted'], 10)
+        self.assertIn('eviction', instrumentation.report()['stages'])
+
+    def test_hooks(self):
+        events = []
+        instrumentation = rr.Instrumentation(hooks=[lambda *event: events.append(event)])
+        recycler = self._recycler(instrumentation=instrumentation)
+        recycler.calculate(self.candidates[0])
+        self.assertIn(('counter', 'queries', 1), events)
+        self.assertTrue(any(kind == 'stage' and name == 'query' for kind, name, _ in events))
+
+    def test_disabled(self):
+        recycler = self._recycler()
+        reference = self._recycler(instrumentation=rr.Instrumentation())
+        testing.assert_array_equal(recycler.calculate_many(self.candidates), reference.calculate_many(self.candidates))
+        self.assertFalse(recycler._instrumentation.enabled)
+
+    def test_instrument_later(self):
+        recycler = self._recycler()
+        instrumentation = rr.Instrumentation()
+        recycler.instrument(instrumentation)
+        recycler.calculate(self.candidates[0])
+        self.assertEqual(instrumentation.report()['counters']['queries'], 1)
+        self.assertEqual(instrumentation.report()['counters']['samples_scanned'], len(self.coordinates))
+        recycler.instrument()
+        recycler.calculate(self.candidates[0])
+        self.assertEqual(instrumentation.report()['counters']['queries'], 1)
+
+    def test_reset(self):
+        instrumentation = rr.Instrumentation()
+        recycler = self._recycler(instrumentation=instrumentation)
+        recycler.calculate(self.candidates[0])
+        instrumentation.reset()
+        self.assertEqual(instrumentation.report(), {'stages': {}, 'counters': {}})
+
+    def test_snapshot(self):
+        instrumentation = rr.Instrumentation()
+        recycler = self._recycler(instrumentation=instrumentation)
+        with TemporaryDirectory() as directory:
+            recycler.save(directory)
+            loaded = rr.ResultRecycler.load(directory, mmap=False)
+        self.assertFalse(loaded._instrumentation.enabled)
+        counters = dict(instrumentation.report()['counters'])
+        testing.assert_array_equal(loaded.calculate_many(self.candidates), recycler.calculate_many(self.candidates))
+        self.assertEqual(instrumentation.report()['counters']['queries'],
+                         counters.get('queries', 0) + len(self.candidates))
+
+
+class InstrumentationTestSuite(TestSuite):
+    def __init__(self):
+        super().__init__()
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(InstrumentationTest))
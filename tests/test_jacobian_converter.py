@@ -87,6 +87,15 @@ class DerivativeConverterTest(TestCase):
         exp = self.shape_hess
         self.assertEqual(res, exp, '{}: Wrong hessian shape: {} instead of {}'.format(self.name, res, exp))
 
+    def test_read_many(self):
+        for field, reader, exp in (('jacobian', self.converter.read_jac_many, self.conv_jac),
+                                   ('hessian', self.converter.read_hess_many, self.conv_hess)):
+            exp = array([exp] * 3)
+            for data in ([getattr(self.sample_data, field)] * 3, exp):
+                res = reader(data)
+                testing.assert_array_equal(res, exp, '{}: Wrong {} import of many: {} instead of {}'.format(
+                    self.name, field, res, exp))
+
 
 class JacobianConverterTestSuite(TestSuite):
     def __init__(self, single_test=None):
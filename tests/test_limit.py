@@ -2,6 +2,9 @@
 
 from unittest import TestCase, TestSuite, defaultTestLoader
 
+from numpy import array, float32, testing
+from numpy.random import default_rng
+
 from .context import rr
 from .context import rr_limits as rl
 
@@ -64,6 +67,33 @@ class TestLimitImport(TestCase):
             for fixed in individuals:
                 self.checkMultiValueCorrect(fixed, self.limit.fixed_values, key, 'Individual in Fixed')
 
+    def reference_values(self, approach_values, neighbor_values):
+        ret = approach_values.copy()
+        for index in range(len(self.limit.value_keys)):
+            if neighbor_values[index] in self.limit.fixed_values[index]:
+                ret[index] = neighbor_values[index]
+            if ret[index] < self.limit.minimum[index]:
+                ret[index] = self.limit.minimum[index]
+            if ret[index] > self.limit.maximum[index]:
+                ret[index] = self.limit.maximum[index]
+        return ret
+
+    def test_choose_values(self):
+        rng = default_rng(5)
+        fixed = sorted({value for values in self.limit.fixed_values for value in values})
+        approach_values = rng.uniform(0, 7, (50, len(self.limit.value_keys)))
+        neighbor_values = rng.choice(fixed + [0.5, 3.25], (50, len(self.limit.value_keys)))
+        expected = array([self.reference_values(approach_row, neighbor_row)
+                          for approach_row, neighbor_row in zip(approach_values, neighbor_values)])
+        for row in range(len(expected)):
+            testing.assert_array_equal(self.limit.choose_values(approach_values[row].copy(), neighbor_values[row]),
+                                       expected[row], '{}: Wrong limited values'.format(self.name))
+        testing.assert_array_equal(self.limit.choose_values_many(approach_values.copy(), neighbor_values), expected,
+                                   '{}: Wrong limited batch'.format(self.name))
+        testing.assert_allclose(self.limit.choose_values_many(approach_values, neighbor_values.astype(float32)),
+                                expected, rtol=1e-6,
+                                err_msg='{}: Wrong limited batch of float32 values'.format(self.name))
+
 
 class TestSameLimitImport(TestLimitImport):
     @classmethod
@@ -89,6 +119,17 @@ class TestScalarLimitImport(TestLimitImport):
         cls.individual = [[5, 5.5]]
 
 
+class StorageDtypeTest(TestCase):
+    def test_fixed_value(self):
+        for dtype in ('float64', 'float32', 'float16'):
+            recycler = rr.ResultRecycler(limit=rr.RawLimit(common_fixed_values=[0.1], value_keys=1),
+                                         dtypes=rr.DtypePolicy(values=dtype))
+            recycler.add_data(0, 0.1)
+            recycler.add_data(1, 0.42)
+            testing.assert_array_equal(recycler.calculate(0.4), array([0.1], dtype=dtype),
+                                       'Fixed value ignored for {} values'.format(dtype))
+
+
 class LimitImportTestSuite(TestSuite):
     def __init__(self):
         TestSuite.__init__(self)
@@ -143,8 +184,7 @@ class LimitImportTestSuite(TestSuite):
 
         for test in scalar_tests:
             self.add_test(test, TestScalarLimitImport)
-
-        # TODO: Tests für Chooser
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(StorageDtypeTest))
 
     def add_test(self, test, base_class):
         class CurrentTestLimitImport(base_class):
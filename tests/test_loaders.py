@@ -0,0 +1,124 @@
+#!/usr/bin/python
+
+import json
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import asfortranarray, savez, savez_compressed, testing
+from numpy.random import default_rng
+
+from tests.context import rr
+from tests.context import rr_loaders
+
+
+class LoaderTest(TestCase):
+    def setUp(self):
+        rng = default_rng(23)
+        self.coordinates = rng.random((25, 2))
+        self.values = rng.random((25, 2))
+        self.jacobians = rng.random((25, 2, 2))
+        hessians = rng.random((25, 2, 2, 2))
+        self.hessians = (hessians + hessians.transpose(0, 1, 3, 2)) / 2
+        self.candidates = rng.random((6, 2))
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _records(self):
+        records = []
+        for sample in range(len(self.coordinates)):
+            record = {'x{}'.format(c): self.coordinates[sample, c] for c in range(2)}
+            for v in range(2):
+                record['v{}'.format(v)] = self.values[sample, v]
+                for c in range(2):
+                    record['dv{}_dx{}'.format(v, c)] = self.jacobians[sample, v, c]
+                    for c2 in range(c, 2):
+                        record['d2v{}_dx{}_dx{}'.format(v, c, c2)] = self.hessians[sample, v, c, c2]
+            records.append(record)
+        return records
+
+    def _csv(self):
+        path = join(self.directory.name, 'results.csv')
+        records = self._records()
+        with open(path, 'w') as file:
+            file.write(','.join(records[0]) + '\n')
+            for record in records:
+                file.write(','.join(repr(float(value)) for value in record.values()) + '\n')
+        return path
+
+    def _reference(self, values=None, jacobians=None, hessians=None):
+        recycler = rr.ResultRecycler()
+        recycler.add_data_many(self.coordinates, self.values if values is None else values, jacobians, hessians)
+        return recycler.calculate_many(self.candidates)
+
+    def _loaded(self, reader, candidates=None):
+        recycler = rr.ResultRecycler()
+        recycler.add_data_stream(reader)
+        self.assertEqual(len(recycler._data), len(self.coordinates))
+        return recycler.calculate_many(self.candidates if candidates is None else candidates)
+
+    def test_csv_list_layout(self):
+        columns = rr.Columns(['x0', 'x1'], ['v0', 'v1'], 'd{value}_d{coordinate}',
+                             'd2{value}_d{coordinate1}_d{coordinate2}')
+        reader = rr.CsvReader(self._csv(), columns, chunk_size=7)
+        self.assertEqual([len(chunk[0]) for chunk in reader], [7, 7, 7, 4])
+        testing.assert_array_almost_equal(self._loaded(reader), self._reference(None, self.jacobians, self.hessians))
+
+    def test_csv_dict_layout(self):
+        columns = rr.Columns({'b': 'x1', 'a': 'x0'}, {'q': 'v0', 'r': 'v1'})
+        candidates = [{'a': a, 'b': b} for a, b in self.candidates.tolist()]
+        testing.assert_array_almost_equal(self._loaded(rr.CsvReader(self._csv(), columns, chunk_size=10), candidates),
+                                          self._reference())
+
+    def test_jsonl(self):
+        path = join(self.directory.name, 'results.jsonl')
+        with open(path, 'w') as file:
+            for record in self._records():
+                file.write(json.dumps(record) + '\n\n')
+        columns = rr.Columns(['x0', 'x1'], 'v1', 'dv1_d{coordinate}')
+        reader = rr.JsonlReader(path, columns, chunk_size=10)
+        self.assertEqual([len(chunk[0]) for chunk in reader], [10, 10, 5])
+        testing.assert_array_almost_equal(self._loaded(reader),
+                                          self._reference(self.values[:, 1], self.jacobians[:, 1]))
+
+    def test_jsonl_blocks(self):
+        path = join(self.directory.name, 'results.jsonl')
+        with open(path, 'w') as file:
+            for sample in range(len(self.coordinates)):
+                file.write(json.dumps({'coordinates': self.coordinates[sample].tolist(),
+                                       'values': self.values[sample].tolist(),
+                                       'jacobians': self.jacobians[sample].tolist(),
+                                       'hessians': self.hessians[sample].tolist()}) + '\n')
+        reader = rr.JsonlReader(path, rr.Columns('coordinates', 'values', 'jacobians', 'hessians'), chunk_size=10)
+        self.assertEqual([chunk[2].shape for chunk in reader], [(10, 2, 2), (10, 2, 2), (5, 2, 2)])
+        testing.assert_array_almost_equal(self._loaded(reader), self._reference(None, self.jacobians, self.hessians))
+
+    def test_npz(self):
+        for save in (savez, savez_compressed):
+            path = join(self.directory.name, 'results.npz')
+            save(path, coordinates=self.coordinates, values=asfortranarray(self.values), jacobians=self.jacobians)
+            columns = rr.Columns('coordinates', 'values', 'jacobians')
+            reader = rr.NpzReader(path, columns, chunk_size=8)
+            self.assertEqual([len(chunk[0]) for chunk in reader], [8, 8, 8, 1])
+            testing.assert_array_almost_equal(self._loaded(reader), self._reference(None, self.jacobians))
+
+    def test_npz_columns(self):
+        path = join(self.directory.name, 'results.npz')
+        savez(path, **{name: self.coordinates[:, c] for c, name in enumerate(('x0', 'x1'))}, values=self.values)
+        columns = rr.Columns({'a': 'x0', 'b': 'x1'}, 'values')
+        candidates = [{'a': a, 'b': b} for a, b in self.candidates.tolist()]
+        testing.assert_array_almost_equal(self._loaded(rr.NpzReader(path, columns), candidates), self._reference())
+
+    def test_missing_column(self):
+        columns = rr.Columns(['x0', 'x2'], ['v0'])
+        self.assertRaises(rr_loaders.MissingColumnError, list, rr.CsvReader(self._csv(), columns))
+        columns = rr.Columns(['x0', 'x1'], ['v0'], 'dv0/d{coordinate}')
+        self.assertRaises(rr_loaders.MissingColumnError, list, rr.CsvReader(self._csv(), columns))
+
+
+class LoaderTestSuite(TestSuite):
+    def __init__(self):
+        super().__init__()
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(LoaderTest))
@@ -1,7 +1,7 @@
 #!/usr/bin/python
 
 from unittest import TestCase, TestSuite, defaultTestLoader
-from numpy import array
+from numpy import array, testing
 
 from tests.context import rr
 from tests.context import rr_converter_vector
@@ -64,6 +64,23 @@ class TestMetricSkeleton(TestCase):
         exp = self.distance
         self.assertAlmostEqual(exp, res, msg="{}: Wrong normal distance: {} instead of {}".format(self.name, res, exp))
 
+    def test_calc_many(self):
+        matrix = array([self.a, self.b, self.c])
+        res = self.metric.calc_many(matrix, self.b)
+        exp = array([self.metric.calc(row, self.b) for row in matrix])
+        testing.assert_array_almost_equal(res, exp, err_msg="{}: Wrong vectorized distances: {} instead of {}".format(
+            self.name, res, exp))
+
+    def test_rank_many(self):
+        matrix = array([self.a, self.b, self.c])
+        ranks = self.metric.rank_many(matrix, self.b)
+        res = self.metric.root(ranks)
+        exp = self.metric.calc_many(matrix, self.b)
+        testing.assert_array_almost_equal(res, exp, err_msg="{}: Wrong rooted ranks: {} instead of {}".format(
+            self.name, res, exp))
+        testing.assert_array_equal(ranks.argsort(kind='stable'), exp.argsort(kind='stable'),
+                                   "{}: Ranks ordered unlike distances".format(self.name))
+
     def test_inverted(self):
         res = self.metric.calc(-self.a, -self.b)
         exp = self.distance
@@ -71,6 +88,23 @@ class TestMetricSkeleton(TestCase):
             self.name, res, exp))
 
 
+class MetricFallbackTest(TestCase):
+    class CustomMetric(rr.EuclidianMetric):
+        def calc(self, a, b):
+            return sum(abs(a - b) ** 0.5)
+
+    def setUp(self):
+        self.metric = self.CustomMetric()
+        self.metric.init_weights(MockConfig())
+
+    def test_fallback(self):
+        matrix = array([[-1.0, 5.5], [2.0, 1.5], [2.0, 4.0]])
+        point = array([2.0, 1.5])
+        res = self.metric.calc_many(matrix, point)
+        exp = array([self.metric.calc(row, point) for row in matrix])
+        testing.assert_array_equal(res, exp, "Custom metric not used for distances: {} instead of {}".format(res, exp))
+
+
 class MetricTestSuite(TestSuite):
     def __init__(self, single_test=None):
         TestSuite.__init__(self)
@@ -89,6 +123,8 @@ class MetricTestSuite(TestSuite):
 
         for test in metric_tests:
             self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(MetricFallbackTest))
 
     def add_test(self, test):
         class TestUnweightedMetric(TestMetricSkeleton):
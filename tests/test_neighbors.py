@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import array, argsort, sqrt, testing
+from numpy.random import default_rng
+
+from tests.context import rr_neighbors
+
+
+class NeighborsTest(TestCase):
+    @classmethod
+    def init(cls, name, distances):
+        cls.name = name
+        cls.distances = array(distances, dtype=float)
+        cls.expected_order = argsort(cls.distances, kind='stable')
+
+    def setUp(self):
+        self.neighbors = rr_neighbors.Neighbors(self.distances)
+
+    def test_nearest(self):
+        res = self.neighbors[0]
+        exp = self.expected_order[0]
+        self.assertEqual(res, exp, '{}: Wrong nearest neighbor: {} instead of {}'.format(self.name, res, exp))
+
+    def test_first(self):
+        for count in (1, 2, 5, len(self.distances), len(self.distances) + 3):
+            res = self.neighbors.first(count)
+            exp = self.expected_order[:count]
+            testing.assert_array_equal(res, exp, '{}: Wrong first {} neighbors'.format(self.name, count))
+
+    def test_iteration(self):
+        res = array(list(self.neighbors))
+        testing.assert_array_equal(res, self.expected_order, '{}: Wrong iteration order'.format(self.name))
+
+    def test_iteration_after_first(self):
+        self.neighbors.first(3)
+        res = array(list(self.neighbors))
+        testing.assert_array_equal(res, self.expected_order, '{}: Wrong iteration order'.format(self.name))
+
+
+class RootTest(TestCase):
+    def test_distance(self):
+        squares = array([9.0, 1.0, 4.0])
+        neighbors = rr_neighbors.Neighbors(squares, root=sqrt)
+        testing.assert_array_equal(list(neighbors), [1, 2, 0], 'Wrong order of ranked neighbors')
+        testing.assert_array_equal(neighbors.distance([0, 1]), [3.0, 1.0], 'Wrong rooted distances')
+
+
+class NeighborsTestSuite(TestSuite):
+    def __init__(self, single_test=None):
+        super().__init__()
+
+        rng = default_rng(7)
+        neighbors_tests = [single_test] if single_test is not None else [
+            {'name': 'Single', 'distances': [0.5]},
+            {'name': 'Distinct', 'distances': [3, 1, 4, 1.5, 9, 2.6, 5.3, 5.8]},
+            {'name': 'Ties', 'distances': [2, 1, 2, 1, 2, 0, 1, 2, 0, 2, 1]},
+            {'name': 'Random', 'distances': rng.random(1000)},
+            {'name': 'RandomTies', 'distances': rng.integers(0, 20, 1000)},
+        ]
+
+        for test in neighbors_tests:
+            self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(RootTest))
+
+    def add_test(self, test):
+        class CurrentNeighborsTest(NeighborsTest):
+            pass
+
+        CurrentNeighborsTest.init(**test)
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(CurrentNeighborsTest))
@@ -1,10 +1,16 @@
 #!/usr/bin/python
 
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from os.path import getsize, join
+from tempfile import TemporaryDirectory
 from unittest import TestCase, TestSuite, defaultTestLoader
 
-from numpy import array, testing
-from converter.typecheck import TypeCheck
-from data import SampleData
+from numpy import array, concatenate, float32, memmap, shares_memory, testing
+from numpy.random import default_rng
+from resultrecycler.approach.chooser import InsuffientDataException
+from resultrecycler.converter.typecheck import TypeCheck, UnsupportedTypeError, WrongDimensionError
+from resultrecycler.data import SampleData
 
 from .context import rr
 
@@ -35,6 +41,436 @@ class ResultRecyclerTest(TestCase):
             testing.assert_array_almost_equal(res, exp,
                                               err_msg='{}: Wrong result: {} instead of {}'.format(self.name, res, exp))
 
+    def test_calculate_many(self):
+        for dat in self.datas:
+            if dat is not None:
+                self.rr.add_data(dat)
+        res = self.rr.calculate_many(self.candidates)
+        exp = array([self.rr.calculate(cand) for cand in self.candidates])
+        testing.assert_array_almost_equal(res, exp, err_msg='{}: Wrong batch result: {} instead of {}'.format(
+            self.name, res, exp))
+        empty = self.rr.calculate_many([])
+        self.assertEqual(empty.shape, (0, res.shape[1]), '{}: Wrong result of an empty batch'.format(self.name))
+
+
+class IsolationTest(TestCase):
+    def setUp(self):
+        self.scalar_samples = [SampleData(1, 2, 3), SampleData(1.8, 4, 1), SampleData(3, 1, 0.5)]
+        self.scalar_candidates = [2, 1.2, 2.9]
+        self.dict_samples = [SampleData({'a': 1, 'b': 1}, [2, 3]), SampleData({'a': 2, 'b': 0}, [1, 0]),
+                             SampleData({'a': 0, 'b': 3}, [4, 2])]
+        self.dict_candidates = [{'a': 1.5, 'b': 0.5}, {'a': 0.2, 'b': 2.5}, {'a': 2, 'b': 2}]
+        self.scalar_results = self._separate(self.scalar_samples, self.scalar_candidates)
+        self.dict_results = self._separate(self.dict_samples, self.dict_candidates)
+
+    @classmethod
+    def _separate(cls, samples, candidates):
+        recycler = rr.ResultRecycler()
+        results = []
+        for sample, candidate in zip(samples, candidates):
+            recycler.add_data(sample)
+            results.append(recycler.calculate(candidate))
+        return results
+
+    def test_interleaved(self):
+        scalar_recycler = rr.ResultRecycler()
+        dict_recycler = rr.ResultRecycler()
+        for step in range(len(self.scalar_samples)):
+            scalar_recycler.add_data(self.scalar_samples[step])
+            dict_recycler.add_data(self.dict_samples[step])
+            testing.assert_array_almost_equal(scalar_recycler.calculate(self.scalar_candidates[step]),
+                                              self.scalar_results[step], err_msg='Scalar recycler influenced')
+            testing.assert_array_almost_equal(dict_recycler.calculate(self.dict_candidates[step]),
+                                              self.dict_results[step], err_msg='Dict recycler influenced')
+
+    def test_concurrent(self):
+        scalar_recycler = rr.ResultRecycler()
+        dict_recycler = rr.ResultRecycler()
+        for scalar_sample, dict_sample in zip(self.scalar_samples, self.dict_samples):
+            scalar_recycler.add_data(scalar_sample)
+            dict_recycler.add_data(dict_sample)
+        queries = [(scalar_recycler, candidate) for candidate in self.scalar_candidates] * 50
+        queries += [(dict_recycler, candidate) for candidate in self.dict_candidates] * 50
+        expected = [recycler.calculate(candidate) for recycler, candidate in queries]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda query: query[0].calculate(query[1]), queries))
+        for res, exp in zip(results, expected):
+            testing.assert_array_equal(res, exp, 'Concurrent query differs: {} instead of {}'.format(res, exp))
+
+
+class ApproachChoiceTest(TestCase):
+    def test_given_approach(self):
+        recycler = rr.ResultRecycler(approach_class=rr.NearestNeighbor)
+        recycler.add_data([1, 2], {'x': 3, 'y': 4})
+        recycler.add_data([2, 2], {'x': 5, 'y': 6})
+        testing.assert_array_equal(recycler.calculate([1.2, 2]), [3, 4], 'Wrong result of given approach')
+
+    def test_insufficient_data(self):
+        recycler = rr.ResultRecycler(approach_class=rr.FirstDerivative)
+        self.assertRaises(InsuffientDataException, recycler.add_data, [1, 2], 3)
+
+    def test_given_limit(self):
+        recycler = rr.ResultRecycler(approach_class=rr.AffineHull, limit=rr.RawLimit(0, 1, value_keys=2))
+        recycler.add_data_many([[0.], [1.]], [[0.2, 0.4], [0.6, 0.9]])
+        testing.assert_array_equal(recycler.calculate([3.]), [1, 1], 'Wrong result of given limit')
+        testing.assert_array_equal(recycler.calculate_many([[-1.], [0.5]]), [[0, 0], [0.4, 0.65]],
+                                   'Wrong results of given limit')
+
+
+class BulkIngestionTest(TestCase):
+    def setUp(self):
+        rng = default_rng(5)
+        self.coordinates = rng.random((40, 3))
+        self.values = rng.random((40, 2))
+        self.jacobians = rng.random((40, 2, 3))
+        self.hessians = rng.random((40, 2, 3, 3))
+        self.candidates = rng.random((10, 3))
+
+    def _assert_equal(self, res, exp, name):
+        for field in ('coordinates', 'values', 'jacobians', 'hessians'):
+            res_block = getattr(res._data, field)
+            exp_block = getattr(exp._data, field)
+            if exp_block is None:
+                self.assertIsNone(res_block, '{}: Unexpected {} block'.format(name, field))
+            else:
+                testing.assert_array_equal(res_block, exp_block, '{}: Wrong {} block'.format(name, field))
+        testing.assert_array_equal(res.calculate_many(self.candidates), exp.calculate_many(self.candidates),
+                                   '{}: Wrong results'.format(name))
+
+    def test_arrays(self):
+        exp = rr.ResultRecycler()
+        for sample in zip(self.coordinates, self.values, self.jacobians, self.hessians):
+            exp.add_data(*[field.tolist() for field in sample])
+        res = rr.ResultRecycler()
+        res.add_data_many(self.coordinates, self.values, self.jacobians, self.hessians)
+        self._assert_equal(res, exp, 'Arrays')
+        res = rr.ResultRecycler()
+        res.add_data_many(self.coordinates.tolist(), self.values.tolist(), self.jacobians.tolist(),
+                          self.hessians.tolist())
+        self._assert_equal(res, exp, 'Lists')
+
+    def test_dicts(self):
+        coordinates = [{'a': row[0], 'b': row[1], 'c': row[2]} for row in self.coordinates.tolist()]
+        jacobians = [[{'a': line[0], 'b': line[1], 'c': line[2]} for line in row] for row in self.jacobians.tolist()]
+        exp = rr.ResultRecycler()
+        for sample in zip(coordinates, self.values.tolist(), jacobians):
+            exp.add_data(*sample)
+        res = rr.ResultRecycler()
+        res.add_data_many(coordinates, self.values, jacobians)
+        self._assert_equal(res, exp, 'Dicts')
+        res = rr.ResultRecycler()
+        res.add_data_many({key: self.coordinates[:, column] for column, key in enumerate('abc')}, self.values,
+                          self.jacobians)
+        self._assert_equal(res, exp, 'Columns')
+
+    def test_dict_values(self):
+        values = [{'x': row[0], 'y': row[1]} for row in self.values.tolist()]
+        exp = rr.ResultRecycler()
+        for sample in zip(self.coordinates.tolist(), values):
+            exp.add_data(*sample)
+        for layout in (values, {'x': self.values[:, 0], 'y': self.values[:, 1]}):
+            res = rr.ResultRecycler()
+            res.add_data_many(self.coordinates, layout)
+            self._assert_equal(res, exp, 'DictValues')
+
+    def test_scalars(self):
+        exp = rr.ResultRecycler()
+        for sample in zip(self.coordinates[:, 0].tolist(), self.values[:, 0].tolist()):
+            exp.add_data(*sample)
+        res = rr.ResultRecycler()
+        res.add_data_many(self.coordinates[:, 0], self.values[:, 0])
+        self.candidates = self.candidates[:, 0]
+        self._assert_equal(res, exp, 'Scalars')
+
+    def test_chunks(self):
+        exp = rr.ResultRecycler()
+        exp.add_data_many(self.coordinates, self.values)
+        for index in (None, rr.KDTree(4)):
+            res = rr.ResultRecycler(index=index)
+            res.ingest_chunk_size = 7
+            res.add_data_many(self.coordinates[:5], self.values[:5])
+            res.add_data_many(self.coordinates[5:], self.values[5:])
+            self._assert_equal(res, exp, 'Chunks')
+
+    def test_wrong_dimension(self):
+        recycler = rr.ResultRecycler()
+        recycler.add_data_many(self.coordinates, self.values, self.jacobians)
+        self.assertRaises(WrongDimensionError, recycler.add_data_many, self.coordinates[:, :2], self.values,
+                          self.jacobians)
+        self.assertRaises(WrongDimensionError, recycler.add_data_many, self.coordinates, self.values[:5],
+                          self.jacobians)
+        self.assertRaises(WrongDimensionError, recycler.add_data_many, self.coordinates, self.values,
+                          self.hessians)
+        self.assertRaises(AttributeError, recycler.add_data_many, self.coordinates, self.values)
+        self.assertEqual(len(recycler._data), len(self.coordinates), 'Rejected samples were stored')
+
+
+class ConvertCandidatesTest(TestCase):
+    def test_malformed(self):
+        rng = default_rng(7)
+        coordinates = rng.random((20, 2))
+        recycler = rr.ResultRecycler()
+        recycler.add_data_many(coordinates, coordinates.sum(axis=1))
+        candidates = rng.random((3, 2)).tolist()
+        batch, errors = recycler.convert_candidates([candidates[0], [0.1, 0.2, 0.3], candidates[1], 'a', candidates[2]])
+        self.assertEqual([error is None for error in errors], [True, False, True, False, True])
+        self.assertIsInstance(errors[1], WrongDimensionError)
+        testing.assert_array_equal(recycler.calculate_many(batch), recycler.calculate_many(candidates))
+        batch, _ = recycler.convert_candidates([[0.1]])
+        self.assertEqual(recycler.calculate_many(batch).shape, (0, 1))
+
+
+class PickleTest(TestCase):
+    def setUp(self):
+        rng = default_rng(29)
+        self.coordinates = rng.random((50, 3))
+        self.values = rng.random((50, 2))
+        self.jacobians = rng.random((50, 2, 3))
+        self.candidates = rng.random((10, 3))
+
+    def _recycler(self, **kwargs):
+        recycler = rr.ResultRecycler(**kwargs)
+        recycler.add_data_many(self.coordinates[:40], self.values[:40], self.jacobians[:40])
+        return recycler
+
+    def _compare(self, recycler, restored):
+        testing.assert_array_equal(restored.calculate_many(self.candidates), recycler.calculate_many(self.candidates),
+                                   'Wrong results after unpickling')
+        for sample in zip(self.coordinates[40:].tolist(), self.values[40:].tolist(), self.jacobians[40:].tolist()):
+            recycler.add_data(*sample)
+            restored.add_data(*sample)
+        testing.assert_array_equal(restored.calculate_many(self.candidates), recycler.calculate_many(self.candidates),
+                                   'Wrong results after adding to an unpickled recycler')
+
+    def test_out_of_band(self):
+        for kwargs in ({}, {'index': rr.KDTree(4), 'hits': rr.HitIndex(), 'capacity': 45,
+                            'eviction': rr.DensityThinning()}):
+            recycler = self._recycler(**kwargs)
+            buffers = []
+            header = pickle.dumps(recycler, 5, buffer_callback=buffers.append)
+            stored = [buffer for buffer in buffers
+                      if any(shares_memory(buffer.raw(), block) for block in recycler._data._blocks.values())]
+            self.assertEqual(len(stored), len(recycler._data._blocks), 'Blocks are not transferred out-of-band')
+            restored = pickle.loads(header, buffers=[bytes(buffer) if buffer in stored else buffer
+                                                     for buffer in buffers])
+            self.assertFalse(restored._data.coordinates.flags.writeable, 'Read-only buffers were copied')
+            self._compare(recycler, restored)
+
+    def test_in_band(self):
+        recycler = self._recycler(dtypes=rr.DtypePolicy(float32, float32, float32))
+        self._compare(recycler, pickle.loads(pickle.dumps(recycler, 4)))
+
+    def test_lazy_derivatives(self):
+        recycler = rr.ResultRecycler(lazy_derivatives=True)
+        recycler.add_data_many(self.coordinates[:40].tolist(), self.values[:40].tolist(),
+                               self.jacobians[:40].tolist())
+        restored = pickle.loads(pickle.dumps(recycler, 5))
+        testing.assert_array_equal(restored._data.jacobians[:], self.jacobians[:40], 'Wrong jacobians')
+        self._compare(recycler, restored)
+
+    def test_empty(self):
+        restored = pickle.loads(pickle.dumps(rr.ResultRecycler(), 5))
+        restored.add_data_many(self.coordinates, self.values)
+        self.assertEqual(len(restored._data), len(self.coordinates))
+
+
+class SnapshotTest(TestCase):
+    def setUp(self):
+        rng = default_rng(7)
+        self.coordinates = rng.random((50, 3))
+        self.values = rng.random((50, 2))
+        self.jacobians = rng.random((50, 2, 3))
+        self.candidates = rng.random((10, 3))
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _round_trip(self, recycler, mmap=True):
+        recycler.save(self.directory.name)
+        return rr.ResultRecycler.load(self.directory.name, mmap)
+
+    def test_results(self):
+        for index in (None, rr.KDTree(4)):
+            recycler = rr.ResultRecycler(metric=rr.PMetric(3, [1.0, 2.0, 4.0]), index=index)
+            recycler.add_data_many(self.coordinates, self.values, self.jacobians)
+            for mmap in (True, False):
+                loaded = self._round_trip(recycler, mmap)
+                testing.assert_array_equal(loaded._data.jacobians, recycler._data.jacobians, 'Wrong jacobians')
+                testing.assert_array_equal(loaded.calculate_many(self.candidates),
+                                           recycler.calculate_many(self.candidates), 'Wrong results after loading')
+
+    def test_mapped(self):
+        recycler = rr.ResultRecycler()
+        recycler.add_data_many(self.coordinates, self.values)
+        loaded = self._round_trip(recycler)
+        self.assertIsInstance(loaded._data.coordinates.base, memmap, 'Coordinates are not mapped')
+        self.assertFalse(loaded._data.values.flags.writeable, 'Mapped values are writeable')
+
+    def test_add_after_load(self):
+        recycler = rr.ResultRecycler(index=rr.KDTree(4))
+        recycler.add_data_many(self.coordinates[:40], self.values[:40])
+        loaded = self._round_trip(recycler)
+        for sample in zip(self.coordinates[40:].tolist(), self.values[40:].tolist()):
+            recycler.add_data(*sample)
+            loaded.add_data(*sample)
+        testing.assert_array_equal(loaded.calculate_many(self.candidates), recycler.calculate_many(self.candidates),
+                                   'Wrong results after adding to a loaded recycler')
+        loaded.save(self.directory.name)
+        self.assertEqual(len(rr.ResultRecycler.load(self.directory.name)._data), len(self.coordinates),
+                         'Wrong number of samples after saving again')
+
+    def test_dict_layout(self):
+        recycler = rr.ResultRecycler(metric=rr.MaxMetric({'a': 2.0, 'b': 1.0}))
+        for coordinates, value in zip(self.coordinates.tolist(), self.values[:, 0].tolist()):
+            recycler.add_data({'a': coordinates[0], 'b': coordinates[1]}, [value])
+        loaded = self._round_trip(recycler)
+        for candidate in self.candidates.tolist():
+            candidate = {'a': candidate[0], 'b': candidate[1]}
+            testing.assert_array_equal(loaded.calculate(candidate), recycler.calculate(candidate),
+                                       'Wrong result after loading for {}'.format(candidate))
+
+    def test_observers(self):
+        coordinates = default_rng(8).random((2000, 3))
+        recycler = rr.ResultRecycler(index=rr.KDTree(4), hits=rr.HitIndex(), capacity=4000,
+                                     eviction=rr.LeastRecentlyUsed())
+        recycler.add_data_many(coordinates, coordinates.sum(axis=1))
+        recycler.calculate_many(concatenate([self.candidates, coordinates[:5]]))
+        loaded = self._round_trip(recycler)
+        self.assertLess(getsize(join(self.directory.name, recycler.snapshot_header)), recycler.snapshot_array_bytes,
+                        'Header grows with the number of samples')
+        self.assertIsInstance(loaded._eviction._stamps, memmap, 'Stamps are not mapped')
+        self.assertIsNone(loaded._index._root, 'Tree was pickled')
+        self.assertIsNone(loaded._hits._rows, 'Keys were pickled')
+        loaded._hits.reset_counters()
+        testing.assert_array_equal(loaded.calculate_many(concatenate([self.candidates, coordinates[:5]])),
+                                   recycler.calculate_many(concatenate([self.candidates, coordinates[:5]])),
+                                   'Wrong results after loading')
+        self.assertEqual(loaded._hits.hits, 5, 'Hits not found after loading')
+        testing.assert_array_equal(loaded._eviction._stamps[:2000], recycler._eviction._stamps[:2000],
+                                   'Wrong stamps after loading')
+
+    def test_empty(self):
+        loaded = self._round_trip(rr.ResultRecycler())
+        loaded.add_data_many(self.coordinates, self.values)
+        testing.assert_array_equal(loaded._data.values, self.values, 'Wrong values after loading an empty recycler')
+
+
+class DtypeTest(TestCase):
+    def setUp(self):
+        rng = default_rng(17)
+        self.coordinates = rng.random((60, 3))
+        self.values = rng.random((60, 2))
+        self.jacobians = rng.random((60, 2, 3))
+        self.hessians = rng.random((60, 2, 3, 3))
+        self.candidates = rng.random((10, 3))
+
+    def _recycler(self, dtypes=None, index=None):
+        recycler = rr.ResultRecycler(approach_class=rr.SecondDerivative, index=index, hits=rr.HitIndex(),
+                                     dtypes=dtypes)
+        recycler.add_data_many(self.coordinates, self.values, self.jacobians, self.hessians)
+        return recycler
+
+    def test_storage(self):
+        recycler = self._recycler(rr.DtypePolicy(coordinates='float32', derivatives='float16'))
+        self.assertEqual(recycler._data.coordinates.dtype, 'float32', 'Wrong dtype of coordinates')
+        self.assertEqual(recycler._data.values.dtype, 'float64', 'Wrong dtype of values')
+        self.assertEqual(recycler._data.jacobians.dtype, 'float16', 'Wrong dtype of jacobians')
+        self.assertEqual(recycler._data.hessians.dtype, 'float16', 'Wrong dtype of hessians')
+        recycler.add_data(self.candidates[0], self.values[0], self.jacobians[0], self.hessians[0])
+        self.assertEqual(recycler._data.hessians.dtype, 'float16', 'Wrong dtype of hessians after growing')
+        self.assertLess(recycler.nbytes, self._recycler().nbytes, 'No memory saved')
+
+    def test_results(self):
+        reference = self._recycler()
+        for index in (rr.BruteForce, rr.KDTree):
+            recycler = self._recycler(rr.DtypePolicy('float32', 'float32', 'float32'), index())
+            results = recycler.calculate_many(self.candidates)
+            self.assertEqual(results.dtype, 'float64', 'Taylor polynomial not evaluated in double precision')
+            testing.assert_allclose(results, reference.calculate_many(self.candidates), rtol=1e-5,
+                                    err_msg='Wrong results of single precision storage')
+            testing.assert_array_equal(recycler.calculate(self.coordinates[4]), recycler._data.values[4],
+                                       'Stored coordinates not found again')
+
+    def test_invalid(self):
+        self.assertRaises(UnsupportedTypeError, rr.DtypePolicy, coordinates=int)
+
+
+class LazyDerivativeTest(TestCase):
+    def setUp(self):
+        rng = default_rng(19)
+        self.keys = ('a', 'b', 'c')
+        self.coordinates = rng.random((30, 3))
+        self.values = rng.random((30, 2))
+        self.jacobians = rng.random((30, 2, 3))
+        self.hessians = rng.random((30, 2, 3, 3))
+        self.candidates = rng.random((8, 3))
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _keyed(self, position):
+        return ({key: value for key, value in zip(self.keys, self.coordinates[position])},
+                self.values[position].tolist(),
+                [{key: value for key, value in zip(self.keys, line)} for line in self.jacobians[position]],
+                [{(key_1, key_2): matrix[index_1, index_2] for index_1, key_1 in enumerate(self.keys)
+                  for index_2, key_2 in enumerate(self.keys)} for matrix in self.hessians[position]])
+
+    def _recycler(self, lazy, **kwargs):
+        recycler = rr.ResultRecycler(approach_class=rr.SecondDerivative, lazy_derivatives=lazy, **kwargs)
+        for position in range(len(self.coordinates)):
+            recycler.add_data(*self._keyed(position))
+        return recycler
+
+    def _candidates(self):
+        return [{key: value for key, value in zip(self.keys, candidate)} for candidate in self.candidates.tolist()]
+
+    def _pending(self, recycler):
+        return sum(raw is not None for raw in recycler._data._pending['hessian'][:len(recycler._data)])
+
+    def test_results(self):
+        eager = self._recycler(False)
+        lazy = self._recycler(True)
+        self.assertEqual(self._pending(lazy), len(self.coordinates), 'Derivatives converted while adding')
+        for candidate in self._candidates():
+            testing.assert_array_equal(lazy.calculate(candidate), eager.calculate(candidate),
+                                       'Wrong result of lazy derivatives')
+        testing.assert_array_equal(lazy.calculate_many(self.candidates), eager.calculate_many(self.candidates),
+                                   'Wrong batch result of lazy derivatives')
+        self.assertLess(self._pending(lazy), len(self.coordinates), 'Pivot derivatives not converted')
+        self.assertGreater(self._pending(lazy), 0, 'Derivatives converted without being used')
+
+    def test_bulk(self):
+        samples = [self._keyed(position) for position in range(len(self.coordinates))]
+        eager = self._recycler(False)
+        lazy = rr.ResultRecycler(approach_class=rr.SecondDerivative, lazy_derivatives=True)
+        lazy.add_data_many(*[list(field) for field in zip(*samples)])
+        self.assertEqual(self._pending(lazy), len(self.coordinates), 'Derivatives converted while adding')
+        testing.assert_array_equal(lazy.calculate_many(self.candidates), eager.calculate_many(self.candidates),
+                                   'Wrong batch result of lazy derivatives')
+
+    def test_eviction(self):
+        eager = self._recycler(False, capacity=10)
+        lazy = self._recycler(True, capacity=10)
+        testing.assert_array_equal(lazy.calculate_many(self.candidates), eager.calculate_many(self.candidates),
+                                   'Wrong result of lazy derivatives after eviction')
+
+    def test_snapshot(self):
+        recycler = self._recycler(True)
+        recycler.save(self.directory.name)
+        loaded = rr.ResultRecycler.load(self.directory.name)
+        testing.assert_array_equal(loaded._data.hessians[:], self.hessians, 'Pending hessians not saved')
+        loaded.add_data(*self._keyed(0))
+        testing.assert_array_equal(loaded.calculate_many(self.candidates), recycler.calculate_many(self.candidates),
+                                   'Wrong results after loading lazy derivatives')
+
+    def test_late_error(self):
+        recycler = self._recycler(True)
+        coordinates, values, jacobian, hessian = self._keyed(0)
+        recycler.add_data({'a': 5, 'b': 5, 'c': 5}, values, jacobian, [{}, {}])
+        self.assertRaises(KeyError, recycler.calculate, {'a': 5, 'b': 5, 'c': 5})
+
 
 class ResultRecyclerTestSuite(TestSuite):
     def __init__(self, single_test=None):
@@ -58,6 +494,15 @@ class ResultRecyclerTestSuite(TestSuite):
 
         for test in converter_tests:
             self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(IsolationTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(ApproachChoiceTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(BulkIngestionTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(ConvertCandidatesTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(PickleTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(SnapshotTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(DtypeTest))
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(LazyDerivativeTest))
 
     def add_test(self, test):
         class CurrentResultRecyclerTest(ResultRecyclerTest):
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+
+from asyncio import new_event_loop, run_coroutine_threadsafe
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists, join
+from tempfile import TemporaryDirectory
+from threading import Barrier, Thread
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import array, testing
+from numpy.random import default_rng
+
+from tests.context import rr
+from tests.context import rr_client
+from tests.context import rr_serve
+
+
+class CountingRecycler(rr.ResultRecycler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def calculate_many(self, candidates, executor=None):
+        self.batches.append(len(candidates))
+        return super().calculate_many(candidates, executor)
+
+
+class CodecTest(TestCase):
+    def test_round_trip(self):
+        message = (3, 'add_data', [{'a': 1.5, 'b': -2}, [1, 2.5], ({('a', 'b'): 0.5}, None), 'text',
+                                   array([[1.0, 2.0], [3.0, 4.0]], dtype='float32'), array(7)])
+        encoded = rr_client.Codec.encode(message)
+        size = rr_client.Codec.frame.unpack(encoded[:rr_client.Codec.frame.size])[0]
+        self.assertEqual(size, len(encoded) - rr_client.Codec.frame.size)
+        decoded = rr_client.Codec.decode(encoded[rr_client.Codec.frame.size:])
+        self.assertEqual(decoded[:2], message[:2])
+        self.assertEqual(decoded[2][:4], message[2][:4])
+        testing.assert_array_equal(decoded[2][4], message[2][4])
+        self.assertEqual(decoded[2][4].dtype, message[2][4].dtype)
+        self.assertEqual(decoded[2][5].shape, ())
+
+    def test_unsupported(self):
+        self.assertRaises(TypeError, rr_client.Codec.encode, {1, 2})
+        self.assertRaises(TypeError, rr_client.Codec.encode, array(['a']))
+
+
+class ServerTest(TestCase):
+    def setUp(self):
+        rng = default_rng(37)
+        self.coordinates = rng.random((40, 3))
+        self.values = rng.random((40, 2))
+        self.candidates = rng.random((16, 3))
+        self.reference = rr.ResultRecycler()
+        self.reference.add_data_many(self.coordinates, self.values)
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, 'recycler.sock')
+        self.recycler = CountingRecycler()
+        self.server = rr_serve.RecyclerServer(self.path, self.recycler, batch_window=0.05)
+        self.loop = new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever)
+        self.thread.start()
+        run_coroutine_threadsafe(self.server.start(), self.loop).result()
+
+    def tearDown(self):
+        run_coroutine_threadsafe(self.server.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.assertFalse(exists(self.path), 'Socket not removed')
+        self.directory.cleanup()
+
+    def test_results(self):
+        with rr.ResultRecyclerClient(self.path) as client:
+            client.add_data_many(self.coordinates[:30], self.values[:30])
+            for sample in zip(self.coordinates[30:].tolist(), self.values[30:].tolist()):
+                client.add_data(rr.SampleData(*sample))
+            testing.assert_array_equal(client.calculate(self.candidates[0].tolist()),
+                                       self.reference.calculate(self.candidates[0].tolist()), 'Wrong result')
+            testing.assert_array_equal(client.calculate_many(self.candidates),
+                                       self.reference.calculate_many(self.candidates), 'Wrong batch result')
+
+    def test_batching(self):
+        self.recycler.add_data_many(self.coordinates, self.values)
+        barrier = Barrier(len(self.candidates))
+
+        def query(candidate):
+            with rr.ResultRecyclerClient(self.path, timeout=10) as client:
+                barrier.wait()
+                return client.calculate(candidate.tolist())
+
+        with ThreadPoolExecutor(len(self.candidates)) as executor:
+            results = list(executor.map(query, self.candidates))
+        testing.assert_array_almost_equal(results, self.reference.calculate_many(self.candidates))
+        self.assertLess(len(self.recycler.batches), len(self.candidates), 'Queries were not batched')
+
+    def test_errors(self):
+        with rr.ResultRecyclerClient(self.path) as client:
+            self.assertRaises(rr_client.RemoteError, client.calculate, [0.5, 0.5, 0.5])
+            client.add_data([0.5, 0.5, 0.5], [1.0, 2.0])
+            self.assertRaises(rr_client.RemoteError, client.calculate, [0.5, 0.5])
+            self.assertRaises(rr_client.RemoteError, client._call, 'save', self.directory.name)
+            testing.assert_array_equal(client.calculate([0.5, 0.5, 0.5]), [1.0, 2.0])
+
+
+class ServerTestSuite(TestSuite):
+    def __init__(self):
+        super().__init__()
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(CodecTest))
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(ServerTest))
@@ -0,0 +1,160 @@
+#!/usr/bin/python
+
+from multiprocessing import get_all_start_methods, get_context
+from threading import Thread
+from unittest import TestCase, TestSuite, defaultTestLoader
+
+from numpy import array, flatnonzero, testing
+from numpy.random import default_rng
+
+from tests.context import rr
+from tests.context import rr_config
+from tests.context import rr_store
+
+
+class SampleStoreTest(TestCase):
+    @classmethod
+    def init(cls, name, sample_data):
+        cls.name = name
+        cls.sample_data = [rr.SampleData(*raw) for raw in sample_data]
+
+    def setUp(self):
+        self.config = rr_config.Config(self.sample_data[0])
+        self.store = rr_store.SampleStore(self.config, capacity=1)
+        for raw in self.sample_data:
+            self.store.append(self.config.sample(raw))
+        self.converted = [self.config.sample(raw) for raw in self.sample_data]
+
+    def test_length(self):
+        res = len(self.store)
+        exp = len(self.sample_data)
+        self.assertEqual(res, exp, '{}: Wrong length: {} instead of {}'.format(self.name, res, exp))
+
+    def test_capacity(self):
+        self.assertGreaterEqual(self.store.capacity, len(self.store), '{}: Capacity {} below length {}'.format(
+            self.name, self.store.capacity, len(self.store)))
+
+    def test_rows(self):
+        for field, block in (('coordinates', self.store.coordinates), ('values', self.store.values),
+                             ('jacobian', self.store.jacobians), ('hessian', self.store.hessians)):
+            if not hasattr(self.converted[0], field):
+                self.assertIsNone(block, '{}: Unexpected {} block'.format(self.name, field))
+                continue
+            exp = array([getattr(sample, field) for sample in self.converted])
+            testing.assert_array_equal(block, exp, '{}: Wrong {} block'.format(self.name, field))
+
+    def test_remove(self):
+        for row, moved in ((0, len(self.converted) - 1), (len(self.converted) - 2, None)):
+            res = self.store.remove(row)
+            self.assertEqual(res, moved, '{}: Wrong moved row: {} instead of {}'.format(self.name, res, moved))
+            self.converted[row] = self.converted[-1]
+            del self.converted[-1]
+        testing.assert_array_equal(self.store.values, array([sample.values for sample in self.converted]),
+                                   '{}: Wrong values after removal'.format(self.name))
+
+
+def add_shared(recycler, coordinates, values):
+    for sample in zip(coordinates.tolist(), values.tolist()):
+        recycler.add_data(*sample)
+    recycler.unshare()
+
+
+class SharedSampleStoreTest(TestCase):
+    def setUp(self):
+        rng = default_rng(31)
+        self.coordinates = rng.random((100, 3))
+        self.values = rng.random((100, 2))
+        self.candidates = rng.random((10, 3))
+        self.recycler = rr.ResultRecycler(index=rr.KDTree(4), hits=rr.HitIndex())
+        self.recycler.add_data_many(self.coordinates[:20], self.values[:20])
+        self.recycler.share(100)
+
+    def tearDown(self):
+        self.recycler.unshare()
+
+    def _reference(self, order):
+        reference = rr.ResultRecycler()
+        reference.add_data_many(self.coordinates[order], self.values[order])
+        return reference.calculate_many(self.candidates)
+
+    def test_attached(self):
+        store = self.recycler._data
+        attached = rr_store.SharedSampleStore(store._config, 100, store._lock, store.name)
+        self.assertEqual(len(attached.refresh()), 20)
+        testing.assert_array_equal(attached.coordinates, self.coordinates[:20], 'Wrong shared coordinates')
+        with attached.writing():
+            attached.append(self.recycler._config.sample(rr.SampleData(self.coordinates[20].tolist(),
+                                                                       self.values[20].tolist())))
+        testing.assert_array_equal(self.recycler.calculate_many(self.candidates), self._reference(range(21)),
+                                   'Samples of the attached store are not used')
+        attached.close()
+
+    def test_refresh_locked(self):
+        store = self.recycler._data
+        attached = rr_store.SharedSampleStore(store._config, 100, store._lock, store.name)
+        refreshed = []
+        with store.writing():
+            reader = Thread(target=lambda: refreshed.append(attached.refresh()))
+            reader.start()
+            store.append(self.recycler._config.sample(rr.SampleData(self.coordinates[20].tolist(),
+                                                                    self.values[20].tolist())))
+            reader.join(0.1)
+            self.assertTrue(reader.is_alive(), 'Refreshed while samples are written')
+        reader.join()
+        self.assertEqual(refreshed, [range(0, 21)], 'Wrong refreshed rows')
+        attached.close()
+
+    def test_processes(self):
+        context = get_context('fork' if 'fork' in get_all_start_methods() else 'spawn')
+        workers = [context.Process(target=add_shared, args=(self.recycler, self.coordinates[start:start + 30],
+                                                            self.values[start:start + 30]))
+                   for start in (20, 50)]
+        for worker in workers:
+            worker.start()
+        add_shared_rows = self.recycler.calculate_many(self.candidates)
+        for sample in zip(self.coordinates[80:].tolist(), self.values[80:].tolist()):
+            self.recycler.add_data(*sample)
+        for worker in workers:
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(add_shared_rows.shape, (10, 2))
+        results = self.recycler.calculate_many(self.candidates)
+        self.assertEqual(len(self.recycler._data), 100)
+        order = [int(flatnonzero((self.coordinates == row).all(axis=1))[0]) for row in self.recycler._data.coordinates]
+        self.assertEqual(sorted(order), list(range(100)))
+        testing.assert_array_equal(results, self._reference(order), 'Wrong results of the combined samples')
+
+    def test_limits(self):
+        self.assertRaisesRegex(ValueError, 'can not be removed', self.recycler._data.remove, 0)
+        self.recycler.add_data_many(self.coordinates[20:], self.values[20:])
+        self.assertRaises(OverflowError, self.recycler.add_data, [0.5, 0.5, 0.5], [1, 1])
+        evicting = rr.ResultRecycler(capacity=10)
+        evicting.add_data([0.5, 0.5, 0.5], [1, 1])
+        self.assertRaisesRegex(ValueError, 'can not be evicted', evicting.share, 10)
+
+
+class SampleStoreTestSuite(TestSuite):
+    def __init__(self, single_test=None):
+        super().__init__()
+
+        store_tests = [single_test] if single_test is not None else [
+            {'name': 'ScalarValues', 'sample_data': [(1, 2), (1.5, 3), (2, 4), (4, 1)]},
+            {'name': 'ScalarHessian', 'sample_data': [(1, 2, 3, 4), (1.8, 4, 1, 2), (2, 1, 1, 1)]},
+            {'name': 'VectorJacobian', 'sample_data': [([1, 1], [2, 2, 2], [[1, 2], [3, 4], [5, 6]]),
+                                                       ([0, 1], [1, 2, 3], [[2, 2], [3, 3], [4, 4]]),
+                                                       ([2, 1], [3, 2, 1], [[3, 2], [1, 4], [5, 0]])]},
+            {'name': 'DictValues', 'sample_data': [({'a': 1, 'b': 2}, {'x': 3}), ({'a': 2, 'b': 0}, {'x': 1}),
+                                                   ({'a': 0, 'b': 5}, {'x': 2})]},
+        ]
+
+        for test in store_tests:
+            self.add_test(test)
+        if single_test is None:
+            self.addTest(defaultTestLoader.loadTestsFromTestCase(SharedSampleStoreTest))
+
+    def add_test(self, test):
+        class CurrentSampleStoreTest(SampleStoreTest):
+            pass
+
+        CurrentSampleStoreTest.init(**test)
+        self.addTest(defaultTestLoader.loadTestsFromTestCase(CurrentSampleStoreTest))
@@ -35,6 +35,11 @@ class VectorConverterTest(TestCase):
         exp = self.conv_data
         testing.assert_array_equal(res, exp, '{}: Wrong raw import: {} instead of {}'.format(self.name, res, exp))
 
+    def test_read_many(self):
+        res = self.converter.read_many([self.sample_data] * 3)
+        exp = array([self.conv_data] * 3)
+        testing.assert_array_equal(res, exp, '{}: Wrong import of many: {} instead of {}'.format(self.name, res, exp))
+
     def test_back_conversion_data(self):
         res = self.converter.export(self.conv_data)
         exp = self.sample_data